@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests served here are resolved against ASYNC_ROOT_URLCONF, so the hot
+read endpoints run as async views (see recipeApp.async_views).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
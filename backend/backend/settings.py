@@ -129,10 +129,99 @@ INSTALLED_APPS += [
     'corsheaders',
 ]
 
-MIDDLEWARE += [
-
+MIDDLEWARE = [
+    # Outermost, so request latency covers every other middleware (see recipeApp.metrics)
+    'recipeApp.middleware.MetricsMiddleware',
+    *MIDDLEWARE,
+    'recipeApp.middleware.QueryBudgetMiddleware',
+    'recipeApp.middleware.AsyncRoutesMiddleware',
 ]
 
+# URLconf for requests served through backend/asgi.py: the hot read routes
+# run as async views (see recipeApp.async_views)
+ASYNC_ROOT_URLCONF = 'backend.urls_async'
+
+# Per-request SQL query budget (see recipeApp.middleware.QueryBudgetMiddleware)
+QUERY_BUDGET = {
+    'MAX_QUERIES': 20,
+    'HEADERS': DEBUG,
+}
+
+# The shared tier of the anonymous response cache (see recipeApp.response_cache)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+}
+
+# Read sessions from the cache and fall back to the database on a miss
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Resolved users are cached too (see recipeApp.auth.CachedModelBackend)
+AUTHENTICATION_BACKENDS = ['recipeApp.auth.CachedModelBackend']
+USER_CACHE = {
+    'ALIAS': 'sessions',
+    'TTL': 60,
+}
+
+RESPONSE_CACHE = {
+    'ENABLED': True,
+    'ALIAS': 'responses',
+    'LOCAL_MAX_ENTRIES': 512,   # per-process LRU size
+    'LOCAL_TTL': 10,            # seconds an entry lives in the per-process tier
+    'SHARED_TTL': 300,          # seconds an entry lives in the shared tier
+    'GENERATION_TTL': 1,        # how stale a worker's view of the counters may be
+}
+
+# Readiness probe, run in the background once per interval (see recipeApp.health)
+HEALTH_CHECK = {
+    'INTERVAL': 5,              # seconds between probes in each process
+    'STALE_AFTER': 30,          # a probe result older than this means not ready
+    'CACHES': ['responses'],    # cache aliases probed alongside the database
+}
+
+# Live grocery list updates over server-sent events (see recipeApp.events).
+# Under WSGI every open stream holds a worker thread, so each process serves
+# only a few at once; serve backend.asgi, where a waiting stream costs no
+# thread, to have many open.
+GROCERY_EVENTS = {
+    'BROKER': 'recipeApp.events.InProcessBroker',  # fan-out within this process only
+    'OPTIONS': {},              # keyword arguments for the broker
+    'HEARTBEAT': 15,            # seconds between keep-alive comments; under nginx's 30s read timeout
+    'MAX_STREAM_SECONDS': 300,  # clients reconnect after this
+    'BUFFER': 100,              # undelivered events per stream before it is told to resync
+    'MAX_THREAD_STREAMS': 2,    # WSGI streams per process; more get 503 + Retry-After
+}
+
+# Sync feed for offline clients (see recipeApp.changes). Clients whose
+# cursor is older than the retention window have to sync from scratch.
+CHANGE_FEED = {
+    'TOMBSTONE_RETENTION_DAYS': 30,
+    'PAGE_SIZE': 1000,          # rows and tombstones per sync response
+}
+
+# Who may scrape /metrics (see recipeApp.metrics): direct connections from
+# these networks, or any request with "Authorization: Bearer <TOKEN>"
+METRICS = {
+    'ALLOWED_NETWORKS': ['127.0.0.1/32', '::1/128'],
+    'TOKEN': None,
+}
+
+# Password hashing runs through a per-process gate (see recipeApp.hashing)
+PASSWORD_HASHING = {
+    'MAX_CONCURRENCY': None,    # hashes in flight per process; None = CPU count
+    'QUEUE_TIMEOUT': 2.0,       # seconds to wait for a slot before answering 503
+}
+
 AUTH_USER_MODEL = 'auth.User'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -141,8 +230,13 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Auth views throttle before hashing any password (see recipeApp.throttling)
+    'DEFAULT_THROTTLE_RATES': {
+        'auth_ip': '30/min',
+        'auth_username': '10/min',
+    },
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'recipeApp.renderers.FastJSONRenderer',  # Same bytes as JSONRenderer, via orjson when installed
         'rest_framework.renderers.BrowsableAPIRenderer',  # Ensure Browsable API is enabled
     ],
 }
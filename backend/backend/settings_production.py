@@ -3,6 +3,7 @@ Production settings for PantryToStore Django backend
 """
 import os
 from .settings import *
+from recipeApp.pooled_postgresql import pool_options
 
 # Security Settings
 DEBUG = False
@@ -28,9 +29,31 @@ DATABASES = {
         'OPTIONS': {
             'sslmode': 'require',
         },
+        # Ping a reused connection before handing it to a request, so one
+        # RDS dropped while idle is replaced instead of failing the request
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Connection reuse. The TLS handshake to RDS is a large share of a cheap
+# request, so connections are not opened per request:
+# - DB_POOL=1: each worker process shares a psycopg 3 pool of
+#   DB_POOL_MAX_SIZE connections (defaults to the gunicorn thread count)
+#   between its threads; a request waits at most DB_POOL_TIMEOUT seconds for
+#   one. With DB_MAX_CONNECTIONS set, gunicorn refuses to start when every
+#   worker's full pool wouldn't fit in Postgres.
+# - otherwise every thread keeps its own connection for DB_CONN_MAX_AGE
+#   seconds.
+# Invalid combinations raise ImproperlyConfigured here, at startup.
+_db_pool = pool_options(os.environ, threads=int(os.environ.get('GUNICORN_THREADS', '4')))
+if _db_pool:
+    DATABASES['default']['ENGINE'] = 'recipeApp.pooled_postgresql'
+    DATABASES['default']['OPTIONS']['pool'] = _db_pool
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+DATABASE_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', '0')) or None
+
 # Static files (CSS, JavaScript, Images) - Use S3
 STATIC_URL = f"https://{os.environ.get('S3_BUCKET_NAME')}.s3.amazonaws.com/static/"
 STATIC_ROOT = '/tmp/static/'  # Temporary for collectstatic
@@ -117,5 +140,67 @@ CACHES = {
     }
 }
 
-# Session storage - use database
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
\ No newline at end of file
+# Shared tier of the anonymous response cache, plus sessions and resolved
+# users. Point REDIS_URL at Redis (or anything speaking its protocol) so
+# hits skip Postgres; without it responses share the database cache table.
+if os.environ.get('REDIS_URL'):
+    CACHES['responses'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+    CACHES['sessions'] = CACHES['responses']
+else:
+    CACHES['responses'] = CACHES['default']
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    }
+
+# Half of each gthread worker's threads may hold event streams; the rest
+# keep serving ordinary requests (no limit applies under backend.asgi)
+GROCERY_EVENTS = {
+    **GROCERY_EVENTS,
+    'MAX_THREAD_STREAMS': max(int(os.environ.get('GUNICORN_THREADS', '4')) // 2, 1),
+}
+
+# Likewise for password hashing: a burst of logins may hold at most half of
+# a worker's threads, so the other requests it serves never queue behind it
+PASSWORD_HASHING = {
+    **PASSWORD_HASHING,
+    'MAX_CONCURRENCY': max(int(os.environ.get('GUNICORN_THREADS', '4')) // 2, 1),
+}
+
+# Grocery list events must reach streams held by every worker; without
+# REDIS_URL gunicorn only starts with WEB_CONCURRENCY=1
+if os.environ.get('REDIS_URL'):
+    GROCERY_EVENTS = {
+        **GROCERY_EVENTS,
+        'BROKER': 'recipeApp.events.RedisBroker',
+        'OPTIONS': {'url': os.environ['REDIS_URL']},
+    }
+
+# nginx sits in front of Django; trust one X-Forwarded-For hop for throttling
+REST_FRAMEWORK = {**REST_FRAMEWORK, 'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '1'))}
+
+# gunicorn listens on every interface, so /metrics answers only the
+# networks and token given here (loopback and no token by default)
+METRICS = {
+    'ALLOWED_NETWORKS': [
+        network.strip() for network in os.environ.get('METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128').split(',')
+        if network.strip()
+    ],
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,
+}
+
+# Query budget - keep logging over-budget requests, but don't expose timings
+QUERY_BUDGET = {**QUERY_BUDGET, 'HEADERS': False}
+
+# Session storage - cached_db when Redis is available. A per-process cache
+# would keep a logged-out session alive in the other workers, so without a
+# shared cache sessions stay in the database and only users are cached,
+# per process and for a shorter time.
+if os.environ.get('REDIS_URL'):
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    USER_CACHE = {**USER_CACHE, 'TTL': 15}
\ No newline at end of file
@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from recipeApp.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('recipeApp.urls')),  # API endpoints with /api/ prefix
     path('api-auth/', include('rest_framework.urls')),  # DRF login/logout for browsable API
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape target; not proxied by nginx
 ]
@@ -0,0 +1,14 @@
+"""
+URL configuration used for requests served through backend/asgi.py.
+
+Same as backend.urls, except the hot read routes listed in
+recipeApp.async_urls are matched first so they run as async views.
+"""
+from django.urls import path, include
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', include('recipeApp.async_urls')),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+"""
+API load benchmark: every route in recipeApp/urls.py, as JSON.
+
+Starts gunicorn (gunicorn.conf.py) against the local database, or uses
+--url to target a running server. Each route in SCENARIOS is then driven by
+--concurrency keep-alive clients for --duration seconds. Results go to
+stdout (or --output) as JSON with requests/s, p50/p95/p99 latency and a
+count of each response status per route. On SQLite, concurrent writes fail
+with "database is locked" (500s); benchmark write routes against Postgres.
+Authenticated routes log each client in as a synthetic user; if none
+exist, `manage.py generate_data --prefix bench` runs first.
+
+Pass --baseline with an earlier result to flag regressions: a route whose
+throughput dropped, or whose p95 rose, by more than --max-regression
+(default 20%) is reported, and the exit status is 1.
+
+    python benchmark_api.py --output before.json
+    git checkout my-branch
+    python benchmark_api.py --baseline before.json --output after.json
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from http.client import HTTPConnection, HTTPException
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.urls import URLPattern, URLResolver
+
+from benchmark_server import HERE, MODES, wait_until_ready
+from recipeApp import urls as api_urls
+from recipeApp.synthetic import DEFAULT_PASSWORD
+
+PREFIX = 'bench'
+# Latency rises below this many milliseconds are noise, not regressions
+NOISE_MS = 1.0
+
+# name, method, path, body, authenticated. Names are url names from
+# recipeApp/urls.py; a suffix after a space distinguishes extra methods on
+# the same route. Paths are formatted with each client's ids from fixtures().
+SCENARIOS = [
+    ('api-root', 'GET', '/api/', None, True),
+    ('health-check', 'GET', '/api/health/', None, False),
+    ('health-live', 'GET', '/api/health/live/', None, False),
+    ('health-ready', 'GET', '/api/health/ready/', None, False),
+    ('csrf-token', 'GET', '/api/auth/csrf-token/', None, False),
+    ('register', 'POST', '/api/auth/register/', 'register', False),
+    ('login', 'POST', '/api/auth/login/', 'login', False),
+    ('logout', 'POST', '/api/auth/logout/', None, 'fresh'),
+    ('user-profile', 'GET', '/api/auth/user/', None, True),
+    ('recipe-list', 'GET', '/api/recipes/', None, False),
+    ('recipe-list POST', 'POST', '/api/recipes/', {'title': 'Bench soup', 'instructions': 'Boil', 'is_public': False}, True),
+    ('recipe-detail', 'GET', '/api/recipes/{public_recipe}/', None, False),
+    ('recipe-search', 'GET', '/api/recipes/search/?q=chicken', None, False),
+    ('recipe-pantry-match', 'POST', '/api/recipes/pantry-match/',
+     {'ingredients': ['Salt', 'Butter', 'Large eggs', 'Onion', 'Rice', 'Garlic cloves']}, False),
+    ('my-recipe-list', 'GET', '/api/my-recipes/', None, True),
+    ('my-recipe-detail', 'GET', '/api/my-recipes/{own_recipe}/', None, True),
+    ('my-recipe-detail PATCH', 'PATCH', '/api/my-recipes/{own_recipe}/', {'description': 'Benchmarked'}, True),
+    ('my-recipe-export', 'GET', '/api/my-recipes/export/', None, True),
+    ('my-recipe-batch-update', 'PATCH', '/api/my-recipes/batch/',
+     {'ids': ['{own_recipe}'], 'changes': {'description': 'Benchmarked'}}, True),
+    ('my-recipe-import-ndjson', 'POST', '/api/my-recipes/import/', 'ndjson', True),
+    ('grocery-list-list', 'GET', '/api/grocery-lists/', None, True),
+    ('grocery-list-detail', 'GET', '/api/grocery-lists/{own_list}/', None, True),
+    ('grocery-list-export', 'GET', '/api/grocery-lists/export/', None, True),
+    ('grocery-list-from-recipes', 'POST', '/api/grocery-lists/from-recipes/',
+     {'name': 'Bench list', 'recipes': [{'id': '{public_recipe}'}]}, True),
+    ('grocery-list-shares', 'GET', '/api/grocery-lists/{own_list}/shares/', None, True),
+    ('grocery-list-shares POST', 'POST', '/api/grocery-lists/{own_list}/shares/', 'share', True),
+    ('grocery-list-items', 'POST', '/api/grocery-lists/{own_list}/items/',
+     {'name': 'Bench item', 'unit': 'g', 'quantity': 1}, True),
+    ('grocery-list-item PATCH', 'PATCH', '/api/grocery-lists/{own_list}/items/{own_item}/', {'checked': True}, True),
+    ('sync', 'GET', '/api/sync/', None, True),
+]
+# Routes a request/response benchmark can't drive, and why
+UNBENCHMARKED = {
+    'grocery-list-events': 'an event stream stays open until the client leaves',
+    'grocery-list-unshare': 'each share can only be removed once',
+    'my-recipe-batch-delete': 'each recipe can only be deleted once',
+}
+NDJSON_BODY = json.dumps({'title': 'Bench import', 'instructions': 'Mix',
+                          'ingredients': [{'name': 'Salt', 'unit': 'g', 'quantity': 1}]}) + '\n'
+
+
+def route_names(patterns=api_urls.urlpatterns):
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def fixtures(users, concurrency):
+    """
+    Make sure synthetic users exist and return the ids the scenarios need:
+    the user count, a public recipe, and for client N (logged in as
+    bench-N) one of that user's recipes, grocery lists and grocery items.
+    """
+    from django.contrib.auth.models import User
+    from recipeApp.models import GroceryItem, GroceryList, Recipe
+
+    if not User.objects.filter(username=f'{PREFIX}-0000000').exists():
+        subprocess.run([sys.executable, 'manage.py', 'generate_data', '--prefix', PREFIX,
+                        '--users', str(max(users, concurrency))], cwd=HERE, check=True)
+    clients = []
+    for client_id in range(concurrency):
+        owner = User.objects.get(username=f'{PREFIX}-{client_id:07d}')
+        # Synthetic users may have no rows of their own
+        own_recipe = Recipe.objects.filter(created_by=owner).order_by('id').first() \
+            or Recipe.objects.create(created_by=owner, title='Bench', instructions='Mix')
+        own_list = GroceryList.objects.filter(created_by=owner).order_by('id').first() \
+            or GroceryList.objects.create(created_by=owner, name='Bench')
+        own_item = own_list.items.order_by('id').first() \
+            or GroceryItem.objects.create(grocery_list=own_list, name='Bench', unit='g', quantity=1)
+        clients.append({'own_recipe': own_recipe.pk, 'own_list': own_list.pk, 'own_item': own_item.pk})
+    return {
+        'users': User.objects.filter(username__regex=rf'^{PREFIX}-[0-9]+$').count(),
+        'public_recipe': Recipe.objects.filter(is_public=True).order_by('id').values_list('id', flat=True).first(),
+        'clients': clients,
+    }
+
+
+class Client:
+    """One keep-alive connection with its own cookies and forwarded address."""
+    addresses = itertools.count(1)
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.conn = HTTPConnection(host, port, timeout=60)
+        self.cookies = {}
+        self.reused = False
+        n = next(self.addresses)
+        # A distinct address per client keeps the per-IP auth throttle out of the numbers
+        self.address = f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}'
+
+    def request(self, method, path, body=None, content_type='application/json'):
+        headers = {'Accept': 'application/json', 'X-Forwarded-For': self.address}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+            if 'csrftoken' in self.cookies:
+                headers['X-CSRFToken'] = self.cookies['csrftoken']
+        if body is not None:
+            headers['Content-Type'] = content_type
+            body = body if isinstance(body, str) else json.dumps(body)
+        try:
+            response = self._send(method, path, body, headers)
+        except (OSError, HTTPException):
+            if not self.reused:
+                raise
+            # gunicorn drops idle keep-alive connections when it recycles a
+            # worker (max_requests); reconnect once, as browsers do
+            response = self._send(method, path, body, headers)
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status
+
+    def _send(self, method, path, body, headers):
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (OSError, HTTPException):
+            self.conn.close()
+            self.reused = False
+            raise
+        self.reused = not response.will_close
+        return response
+
+    def login(self, username):
+        self.cookies.clear()
+        status = self.request('POST', '/api/auth/login/', {'username': username, 'password': DEFAULT_PASSWORD})
+        self.request('GET', '/api/auth/csrf-token/')
+        return status
+
+
+def body_for(kind, client_id, counter, ids):
+    if kind == 'register':
+        username = f'{PREFIX}-reg-{os.getpid()}-{next(counter)}'
+        return {'username': username, 'email': f'{username}@example.com', 'password': 'bench-pass-123'}
+    if kind == 'login':
+        # Rotate through the users so the per-username throttle doesn't kick in
+        return {'username': f"{PREFIX}-{next(counter) % ids['users']:07d}", 'password': DEFAULT_PASSWORD}
+    if kind == 'ndjson':
+        return NDJSON_BODY
+    if kind == 'share':
+        # Share with the next client's user; repeats just update the share
+        return {'username': f"{PREFIX}-{(client_id + 1) % ids['users']:07d}", 'permissions': 'view'}
+    if isinstance(kind, dict):
+        body = json.dumps(kind).replace('"{public_recipe}"', str(ids['public_recipe']))
+        return json.loads(body.replace('"{own_recipe}"', str(ids['clients'][client_id]['own_recipe'])))
+    return kind
+
+
+def run_scenario(host, port, scenario, ids, concurrency, duration):
+    name, method, path, body, authenticated = scenario
+    content_type = 'application/x-ndjson' if body == 'ndjson' else 'application/json'
+    counter = itertools.count()
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    clients = [Client(host, port) for _ in range(concurrency)]
+    if authenticated is True:
+        for client_id, client in enumerate(clients):
+            client.login(f'{PREFIX}-{client_id:07d}')
+
+    deadline = time.perf_counter() + duration
+
+    def drive(client_id, client):
+        local, seen = [], Counter()
+        client_path = path.format(public_recipe=ids['public_recipe'], **ids['clients'][client_id])
+        while time.perf_counter() < deadline:
+            if authenticated == 'fresh':
+                client.login(f"{PREFIX}-{next(counter) % ids['users']:07d}")
+            request_body = body_for(body, client_id, counter, ids)
+            start = time.perf_counter()
+            try:
+                status = client.request(method, client_path, request_body, content_type)
+            except (OSError, HTTPException):
+                seen['connection error'] += 1
+                continue
+            local.append(time.perf_counter() - start)
+            seen[str(status)] += 1
+        with lock:
+            latencies.extend(local)
+            statuses.update(seen)
+
+    threads = [threading.Thread(target=drive, args=(i, client)) for i, client in enumerate(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 2) if latencies else None
+
+    return {
+        'method': method,
+        'requests': len(latencies),
+        'errors': sum(count for status, count in statuses.items() if not status.startswith(('2', '3'))),
+        'statuses': dict(sorted(statuses.items())),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Regressions of ``results`` against ``baseline``, as human-readable strings."""
+    regressions = []
+    for name, current in results['routes'].items():
+        before = baseline.get('routes', {}).get(name)
+        if not before:
+            continue
+        if before['rps'] and current['rps'] < before['rps'] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {before['rps']} -> {current['rps']} req/s")
+        if before['p95_ms'] is not None and current['p95_ms'] is not None and \
+                current['p95_ms'] > max(before['p95_ms'] * (1 + max_regression), before['p95_ms'] + NOISE_MS):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {current['p95_ms']} ms")
+        if current['errors'] > before['errors']:
+            regressions.append(f"{name}: errors {before['errors']} -> {current['errors']}")
+    return regressions
+
+
+def git_commit():
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Benchmark a running server instead of starting gunicorn')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5, help='Seconds per route')
+    parser.add_argument('--routes', help='Comma-separated scenario names (default: all)')
+    parser.add_argument('--users', type=int, default=200, help='Synthetic users to generate when none exist')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', help='Earlier JSON results to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    missing = route_names() - {name.split(' ')[0] for name, *_ in SCENARIOS} - set(UNBENCHMARKED)
+    if missing:
+        parser.error(f"No benchmark scenario for route(s): {', '.join(sorted(missing))}")
+    scenarios = SCENARIOS
+    if args.routes:
+        wanted = set(args.routes.split(','))
+        scenarios = [scenario for scenario in SCENARIOS if scenario[0] in wanted]
+
+    ids = fixtures(args.users, args.concurrency)
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = '127.0.0.1', args.port
+        server = subprocess.Popen(MODES['gunicorn'](port), cwd=HERE, stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL)
+    try:
+        if server:
+            wait_until_ready(port)
+        results = {
+            'commit': git_commit(),
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'routes': {},
+        }
+        for scenario in scenarios:
+            results['routes'][scenario[0]] = result = run_scenario(
+                host, port, scenario, ids, args.concurrency, args.duration,
+            )
+            print(f"{scenario[0]:<28}{result['rps']:>9.1f} req/s  p50 {result['p50_ms']} ms  "
+                  f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  errors {result['errors']}",
+                  file=sys.stderr)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=60)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        results['regressions'] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    for regression in regressions:
+        print(f'REGRESSION {regression}', file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
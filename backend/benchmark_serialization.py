@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Recipe list serialization benchmark: DRF serializer vs. projection fast path.
+
+Loads --rows public recipes from the local database the way the recipe feed
+does, then times loading, serializing and rendering them to JSON, once
+through model instances, RecipeListSerializer and DRF's JSONRenderer and
+once through recipe_list_projection and FastJSONRenderer. Prints rows/s for
+each stage and checks that both paths produce the same bytes. Run
+`manage.py generate_data` first so there are rows to render.
+
+    python benchmark_serialization.py [--rows 1000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from rest_framework.renderers import JSONRenderer
+
+from recipeApp.models import Recipe
+from recipeApp.renderers import FastJSONRenderer
+from recipeApp.serializers import RecipeListSerializer
+from recipeApp.views import recipe_list_projection, recipe_list_queryset
+
+STAGES = ('load', 'serialize', 'render')
+
+
+def stock(queryset):
+    rows = list(recipe_list_queryset(queryset))
+    yield
+    data = RecipeListSerializer(rows, many=True).data
+    yield
+    yield JSONRenderer().render(data)
+
+
+def fast(queryset):
+    rows = list(recipe_list_projection.project(recipe_list_queryset(queryset)))
+    yield
+    data = recipe_list_projection.serialize(rows)
+    yield
+    yield FastJSONRenderer().render(data)
+
+
+def measure(path, queryset, repeat):
+    """Best time per stage over ``repeat`` runs, and the rendered bytes."""
+    best = dict.fromkeys(STAGES, float('inf'))
+    for _ in range(repeat):
+        steps = path(queryset)
+        start = time.perf_counter()
+        for stage, output in zip(STAGES, steps):
+            now = time.perf_counter()
+            best[stage] = min(best[stage], now - start)
+            start = now
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    queryset = Recipe.objects.filter(is_public=True).order_by('-created_at', '-id')[:args.rows]
+    rows = queryset.count()
+    if not rows:
+        sys.exit('No public recipes; run `manage.py generate_data` first.')
+
+    before, expected = measure(stock, queryset, args.repeat)
+    after, output = measure(fast, queryset, args.repeat)
+    if output != expected:
+        sys.exit('The fast path rendered different JSON.')
+
+    print(f'{rows} recipes, best of {args.repeat} runs, rows/s')
+    print(f"{'stage':<12}{'serializer':>14}{'projection':>14}{'speedup':>10}")
+    for stage in (*STAGES, 'total'):
+        old = sum(before.values()) if stage == 'total' else before[stage]
+        new = sum(after.values()) if stage == 'total' else after[stage]
+        print(f'{stage:<12}{rows / old:>14,.0f}{rows / new:>14,.0f}{old / new:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Local throughput benchmark: runserver vs. gunicorn (gunicorn.conf.py).
+
+Starts each server on a spare port against the local database, drives it
+with keep-alive HTTP clients for a fixed time, and prints requests/s and
+latency percentiles. Run `manage.py generate_data` first so list pages have
+rows to render.
+
+    python benchmark_server.py [--path /api/recipes/] [--concurrency 16] [--duration 10]
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MODES = {
+    'runserver': lambda port: [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload'],
+    'gunicorn': lambda port: [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                              '--bind', f'127.0.0.1:{port}', 'backend.wsgi:application'],
+}
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health/')
+            if conn.getresponse().status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not become ready')
+
+
+def run_load(port, path, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0
+
+    return len(latencies) / elapsed, percentile(0.5), percentile(0.99), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=[*MODES, 'both'], default='both')
+    parser.add_argument('--path', default='/api/recipes/?page_size=20')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--settings', default='backend.settings')
+    args = parser.parse_args()
+
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': args.settings}
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'], cwd=HERE, env=env, check=True)
+
+    modes = list(MODES) if args.mode == 'both' else [args.mode]
+    print(f'GET {args.path}, {args.concurrency} clients, {args.duration:.0f}s per mode')
+    print(f"{'mode':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode in modes:
+        server = subprocess.Popen(MODES[mode](args.port), cwd=HERE, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(args.port)
+            rate, p50, p99, errors = run_load(args.port, args.path, args.concurrency, args.duration)
+            print(f'{mode:<12}{rate:>10.0f}{p50:>10.1f}{p99:>10.1f}{errors:>8}')
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
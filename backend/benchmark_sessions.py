@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark session and user resolution for authenticated API requests.
+
+Compares the plain database session engine with ModelBackend against the
+cached_db engine with recipeApp.auth.CachedModelBackend, on a throwaway
+test database. Reports queries per request and mean latency.
+
+    python benchmark_sessions.py [--requests 500]
+"""
+import argparse
+import os
+import time
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases
+
+from recipeApp.middleware import QueryStats
+
+URLS = ['/api/auth/user/', '/api/grocery-lists/']
+
+CONFIGURATIONS = {
+    'db sessions, ModelBackend': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    },
+    'cached_db sessions, CachedModelBackend': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'AUTHENTICATION_BACKENDS': ['recipeApp.auth.CachedModelBackend'],
+    },
+}
+
+
+def create_data():
+    from django.contrib.auth.models import User
+    from recipeApp.models import GroceryList, GroceryItem
+
+    user = User.objects.create_user('bench', 'bench@example.com', 'bench-pass-123')
+    for i in range(10):
+        grocery_list = GroceryList.objects.create(name=f'List {i}', created_by=user)
+        GroceryItem.objects.bulk_create(
+            GroceryItem(grocery_list=grocery_list, name=f'item {j}', unit='g', quantity=1)
+            for j in range(10)
+        )
+
+
+def measure(url, requests):
+    client = Client()
+    client.login(username='bench', password='bench-pass-123')
+    client.get(url)  # warm up caches
+
+    stats = QueryStats()
+    start = time.perf_counter()
+    with connection.execute_wrapper(stats):
+        for _ in range(requests):
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+    elapsed = time.perf_counter() - start
+    return stats.count / requests, elapsed / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        create_data()
+        print(f"{'configuration':<42}{'url':<24}{'queries/req':>12}{'ms/req':>10}")
+        for name, overrides in CONFIGURATIONS.items():
+            with override_settings(**overrides, RESPONSE_CACHE={**settings.RESPONSE_CACHE, 'ENABLED': False}):
+                for alias in caches:
+                    caches[alias].clear()
+                for url in URLS:
+                    queries, ms = measure(url, args.requests)
+                    print(f'{name:<42}{url:<24}{queries:>12.1f}{ms:>10.2f}')
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
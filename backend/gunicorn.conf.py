@@ -0,0 +1,120 @@
+"""
+Gunicorn settings for serving the backend in production.
+
+    gunicorn -c gunicorn.conf.py backend.wsgi:application
+
+Every value can be overridden from the environment (GUNICORN_* below, or
+gunicorn's own GUNICORN_CMD_ARGS). To serve backend.asgi instead, install
+uvicorn and set GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker with
+backend.asgi:application as the app.
+
+The master also runs the periodic maintenance commands in MAINTENANCE_JOBS
+next to the workers, so every image that serves with this file gets them.
+Set GUNICORN_MAINTENANCE=0 where something else schedules them.
+"""
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Workers write Prometheus samples here so /metrics can add them all up
+# (see recipeApp.metrics). Must be set before the app is imported.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus-metrics')
+
+# Pre-forked workers sized from the CPU count, each with a few threads so
+# requests waiting on Postgres don't hold a whole process.
+workers = _env_int('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = _env_int('GUNICORN_THREADS', 4)
+
+# Import Django once in the master so workers fork with the app already
+# loaded (faster boots, shared copy-on-write memory).
+preload_app = True
+
+# Recycle each worker after roughly this many requests to cap memory growth;
+# the jitter keeps all workers from restarting at the same moment.
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# SIGTERM / SIGHUP: stop accepting, let in-flight requests finish for up to
+# graceful_timeout seconds, then exit (or swap in new workers on HUP).
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+# nginx keeps upstream connections open (see nginx.conf); hold them a bit
+# longer than nginx does so it never sends on a socket we just closed.
+keepalive = _env_int('GUNICORN_KEEPALIVE', 75)
+
+# Long-running `manage.py <job> --every N` loops the master starts once it is
+# ready and stops when it exits. Each is a batched DELETE, safe to run from
+# several containers at once.
+MAINTENANCE_JOBS = [
+    ['purge_sessions', '--every', '3600'],          # expired sessions, hourly
+    ['compact_tombstones', '--every', '86400'],     # sync feed tombstones past retention, daily
+]
+_maintenance = []
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # Refuse to start when every worker's full DB pool can't fit in Postgres
+    from recipeApp.pooled_postgresql import check_pool_capacity
+    check_pool_capacity(server.cfg.workers)
+    # or when grocery list events wouldn't reach streams in the other workers
+    from recipeApp.events import check_event_broker
+    check_event_broker(server.cfg.workers)
+
+    # Samples left by a previous run would be counted again
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def when_ready(server):
+    if os.environ.get('GUNICORN_MAINTENANCE', '1') == '0':
+        return
+    manage = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manage.py')
+    for job in MAINTENANCE_JOBS:
+        _maintenance.append(subprocess.Popen([sys.executable, manage, *job], stdout=subprocess.DEVNULL))
+        server.log.info('Started maintenance job %s (pid %s)', ' '.join(job), _maintenance[-1].pid)
+
+
+def on_exit(server):
+    for process in _maintenance:
+        process.terminate()
+    for process in _maintenance:
+        try:
+            process.wait(timeout=graceful_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def post_fork(server, worker):
+    # Connections and pools opened while preloading must not be shared
+    # between processes
+    from django.db import connections
+    from recipeApp.pooled_postgresql import discard_pools
+    from recipeApp.health import health_probe
+    from recipeApp.pantry import pantry_index
+    connections.close_all()
+    discard_pools()
+    # Readiness is probed once per interval per worker, not once per poll
+    health_probe.start()
+    # Load the pantry index now rather than on the first match request
+    pantry_index.start()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
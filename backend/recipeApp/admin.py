@@ -1,8 +1,10 @@
 from django.contrib import admin
-from .models import Recipe, Ingredient, GroceryList, GroceryItem, SharedGroceryList
+from .models import Recipe, Ingredient, GroceryList, GroceryItem, SharedGroceryList, CanonicalIngredient, CanonicalUnit
 
 admin.site.register(Recipe)
 admin.site.register(Ingredient)
 admin.site.register(GroceryList)
 admin.site.register(GroceryItem)
 admin.site.register(SharedGroceryList)
+admin.site.register(CanonicalIngredient)
+admin.site.register(CanonicalUnit)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RecipeappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipeApp'
+
+    def ready(self):
+        # Connect the user cache invalidation signals
+        from . import auth  # noqa: F401
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import async_views
+
+# GET on these routes is served asynchronously; other methods reach the DRF viewsets
+urlpatterns = [
+    path('recipes/', async_views.recipe_list_view, name='async-recipe-list'),
+    path('recipes/<int:pk>/', async_views.recipe_detail_view, name='async-recipe-detail'),
+    path('my-recipes/', async_views.my_recipe_list_view, name='async-my-recipe-list'),
+    path('my-recipes/<int:pk>/', async_views.my_recipe_detail_view, name='async-my-recipe-detail'),
+    path('grocery-lists/', async_views.grocery_list_list_view, name='async-grocery-list-list'),
+    path('grocery-lists/<int:pk>/', async_views.grocery_list_detail_view, name='async-grocery-list-detail'),
+    path('grocery-lists/<int:pk>/events/', async_views.grocery_list_events_view, name='async-grocery-list-events'),
+]
@@ -0,0 +1,235 @@
+"""
+Async read endpoints for ASGI deployments.
+
+Under backend/asgi.py, AsyncRoutesMiddleware resolves requests against
+backend.urls_async, which points GET on the hot read routes (recipe list and
+detail, my-recipes, grocery-lists and their event streams) at the views
+below. They load rows with Django's async ORM so the event loop isn't
+blocked while Postgres answers; every other method on those routes is
+handed to the regular DRF viewset.
+
+Responses match the DRF views: same querysets, visibility rules,
+pagination, serializers, ETag / 304 handling and anonymous response cache.
+They are always rendered as JSON. Requests with ?fields= or ?expand= (see
+fieldsets.py) go to the viewset as well. An event stream waits on the
+event loop rather than in a worker thread (see events.py).
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from .events import event_stream_response, grocery_list_events, release_connections
+from .conditional import VALIDATOR_FIELDS, has_validators, make_validators, not_modified, set_validators
+from .fieldsets import SparseFieldsMixin
+from .models import Recipe
+from .pagination import RecipeCursorPagination
+from .renderers import FastJSONRenderer
+from .response_cache import cached_response, response_cache
+from .serializers import RecipeSerializer, RecipeListSerializer, GroceryListSerializer
+from .sharing import visible_grocery_lists
+from .views import (
+    RecipeViewSet, MyRecipeViewSet, GroceryListViewSet, recipe_list_queryset, recipe_detail_queryset,
+    recipe_list_projection,
+)
+
+LIST_ACTIONS = {'get': 'list', 'post': 'create'}
+DETAIL_ACTIONS = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+
+renderer = FastJSONRenderer()
+
+
+def json_response(data, status=200):
+    response = HttpResponse(renderer.render(data), status=status, content_type='application/json')
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def error_response(exc):
+    return json_response({'detail': exc.detail}, status=exc.status_code)
+
+
+def _validator_rows(rows):
+    return [(row.pk, row.updated_at) for row in rows]
+
+
+async def _all(queryset):
+    return [obj async for obj in queryset]
+
+
+async def render_list(request, queryset, serializer_class, pagination_class=None, projection=None):
+    """Async version of ConditionalGetMixin.list; ``projection`` stands in for the serializer."""
+    drf_request = Request(request)
+
+    if has_validators(request):
+        validators = queryset.select_related(None).prefetch_related(None).only(*VALIDATOR_FIELDS)
+        rows = await pagination_class().apaginate_queryset(validators, drf_request) if pagination_class else None
+        if rows is None:
+            rows = await _all(validators)
+        response = not_modified(request, *make_validators(_validator_rows(rows)))
+        if response is not None:
+            return response
+
+    if projection is not None:
+        queryset = projection.project(queryset)
+    paginator = pagination_class() if pagination_class else None
+    page = await paginator.apaginate_queryset(queryset, drf_request) if paginator else None
+    rows = page if page is not None else await _all(queryset)
+    etag, last_modified = make_validators(_validator_rows(rows))
+    data = projection.serialize(rows) if projection is not None else serializer_class(rows, many=True).data
+    if page is not None:
+        data = paginator.get_paginated_response(data).data
+    return set_validators(json_response(data), etag, last_modified)
+
+
+async def render_detail(request, queryset, pk, serializer_class, visible=None, check=None):
+    """Async version of ConditionalGetMixin.retrieve; ``check`` may raise PermissionDenied."""
+    try:
+        if has_validators(request):
+            row = await (visible if visible is not None else queryset).select_related(None) \
+                .prefetch_related(None).filter(pk=pk).values_list('pk', 'updated_at').afirst()
+            if row is not None:
+                response = not_modified(request, *make_validators([row]))
+                if response is not None:
+                    return response
+        instance = await queryset.aget(pk=pk)
+    except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+        raise exceptions.NotFound()
+    if check is not None:
+        check(instance)
+    data = serializer_class(instance).data
+    return set_validators(json_response(data), *make_validators([(instance.pk, instance.updated_at)]))
+
+
+def wants_json(request):
+    """False for browsable API requests, which only the DRF viewsets can render."""
+    return (
+        request.GET.get('format', 'json') == 'json'
+        and 'text/html' not in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+def wants_default_fields(request):
+    """False when the request narrows or expands the response, which the viewsets handle."""
+    return (
+        SparseFieldsMixin.fields_query_param not in request.GET
+        and SparseFieldsMixin.expand_query_param not in request.GET
+    )
+
+
+def async_read_view(viewset, actions, read, authenticated=False):
+    """
+    Route JSON GETs to the async ``read`` coroutine and everything else to
+    the DRF ``viewset``. ``read`` receives the resolved user after the same
+    authentication check the viewset applies.
+    """
+    sync_view = sync_to_async(viewset.as_view(actions))
+
+    @csrf_exempt
+    async def view(request, *args, **kwargs):
+        if request.method != 'GET' or not wants_json(request) or not wants_default_fields(request):
+            return await sync_view(request, *args, **kwargs)
+        user = await request.auser()
+        if authenticated and not user.is_authenticated:
+            # DRF answers 403 here too, since SessionAuthentication has no WWW-Authenticate challenge
+            return json_response({'detail': exceptions.NotAuthenticated.default_detail}, status=403)
+        try:
+            return await read(request, user, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+
+    view.__name__ = read.__name__
+    return view
+
+
+async def cached_read(request, user, generations, read):
+    """Serve anonymous requests through the response cache, as ResponseCacheMixin does."""
+    if not response_cache.enabled or user.is_authenticated:
+        return await read()
+    key = await sync_to_async(response_cache.make_key)(request, 'recipe', generations)
+    entry = await sync_to_async(response_cache.get)(key)
+    if entry is not None:
+        return cached_response(request, entry)
+    response = await read()
+    if response.status_code == 200:
+        await sync_to_async(response_cache.set)(key, response)
+    return response
+
+
+def _visible_recipes(user):
+    if user.is_authenticated:
+        return Recipe.objects.filter(Q(is_public=True) | Q(created_by=user))
+    return Recipe.objects.filter(is_public=True)
+
+
+async def recipe_list(request, user):
+    queryset = recipe_list_queryset(_visible_recipes(user)).order_by('-created_at', '-id')
+    return await cached_read(request, user, ['feed'], lambda: render_list(
+        request, queryset, RecipeListSerializer, RecipeCursorPagination, recipe_list_projection,
+    ))
+
+
+async def recipe_detail(request, user, pk):
+    def check(recipe):
+        # Same rule as RecipeViewSet.get_object for retrieve
+        if not (recipe.is_public or (user.is_authenticated and recipe.created_by_id == user.id)):
+            raise exceptions.PermissionDenied("You don't have permission to access this recipe.")
+
+    return await cached_read(request, user, ['recipes', f'recipe:{pk}'], lambda: render_detail(
+        request, recipe_detail_queryset(Recipe.objects.all()), pk, RecipeSerializer,
+        visible=_visible_recipes(user), check=check,
+    ))
+
+
+async def my_recipe_list(request, user):
+    queryset = recipe_list_queryset(Recipe.objects.filter(created_by=user)).order_by('-created_at', '-id')
+    return await render_list(request, queryset, RecipeListSerializer, RecipeCursorPagination, recipe_list_projection)
+
+
+async def my_recipe_detail(request, user, pk):
+    queryset = recipe_detail_queryset(Recipe.objects.filter(created_by=user))
+    return await render_detail(request, queryset, pk, RecipeSerializer)
+
+
+def _grocery_lists(user):
+    return (
+        visible_grocery_lists(user)
+        .select_related('created_by')
+        .prefetch_related('items')
+        .order_by('-created_at')
+    )
+
+
+async def grocery_list_list(request, user):
+    return await render_list(request, _grocery_lists(user), GroceryListSerializer)
+
+
+async def grocery_list_detail(request, user, pk):
+    return await render_detail(request, _grocery_lists(user), pk, GroceryListSerializer)
+
+
+
+async def grocery_list_event_stream(request, user, pk):
+    """Async version of GroceryListViewSet.events; a stream holds no thread while it waits."""
+    grocery_list = await visible_grocery_lists(user).filter(pk=pk).only('id', 'updated_at').afirst()
+    if grocery_list is None:
+        raise exceptions.NotFound()
+    subscription = grocery_list_events.subscribe(grocery_list.pk, user.id, loop=asyncio.get_running_loop())
+    await sync_to_async(release_connections)()
+    ready = GroceryListSerializer(grocery_list, fields=['id', 'updated_at']).data
+    return event_stream_response(grocery_list_events.astream(subscription, ready))
+
+
+recipe_list_view = async_read_view(RecipeViewSet, LIST_ACTIONS, recipe_list)
+recipe_detail_view = async_read_view(RecipeViewSet, DETAIL_ACTIONS, recipe_detail)
+my_recipe_list_view = async_read_view(MyRecipeViewSet, LIST_ACTIONS, my_recipe_list, authenticated=True)
+my_recipe_detail_view = async_read_view(MyRecipeViewSet, DETAIL_ACTIONS, my_recipe_detail, authenticated=True)
+grocery_list_list_view = async_read_view(GroceryListViewSet, LIST_ACTIONS, grocery_list_list, authenticated=True)
+grocery_list_detail_view = async_read_view(GroceryListViewSet, DETAIL_ACTIONS, grocery_list_detail, authenticated=True)
+grocery_list_events_view = async_read_view(GroceryListViewSet, {'get': 'events'}, grocery_list_event_stream, authenticated=True)
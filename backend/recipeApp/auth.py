@@ -0,0 +1,45 @@
+"""
+Authentication backend that caches the user resolved from a session.
+
+With SessionAuthentication every API call loads the session and then the
+user it points at. The session half is handled by the cached_db session
+engine; this backend covers the user half by keeping resolved users in a
+cache for USER_CACHE['TTL'] seconds. Saving or deleting a user drops its
+entry, so profile and password changes (which also rotate the session auth
+hash) take effect on the next request. Writes that bypass model signals,
+such as QuerySet.update(), are picked up when the entry expires.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+USER_KEY = 'auth-user:%s'
+
+
+def _user_cache():
+    config = getattr(settings, 'USER_CACHE', {})
+    return caches[config.get('ALIAS', 'default')], config.get('TTL', 60)
+
+
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        cache, ttl = _user_cache()
+        key = USER_KEY % user_id
+        user = cache.get(key)
+        if user is not None:
+            return user
+        user = super().get_user(user_id)
+        if user is not None:
+            cache.set(key, user, ttl)
+        return user
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='recipeapp-user-cache-save')
+@receiver(post_delete, sender=get_user_model(), dispatch_uid='recipeapp-user-cache-delete')
+def forget_cached_user(sender, instance, **kwargs):
+    cache, _ = _user_cache()
+    cache.delete(USER_KEY % instance.pk)
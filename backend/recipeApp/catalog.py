@@ -0,0 +1,150 @@
+"""
+Canonical ingredient and unit catalog.
+
+Ingredient and GroceryItem rows keep the name and unit the user typed, for
+display, and point at a CanonicalIngredient and a CanonicalUnit for what
+they mean. " Tomatoes, " and "tomato" share one catalog entry, and so do
+"All-purpose flour" and "flour" through ALIASES. Grouping and joining by
+ingredient then compares integer ids instead of free text.
+
+Catalog entries are created the first time a name is written and never
+change. Each process remembers the ids it has looked up, so writes with
+familiar names cost no catalog queries. A batch of new names costs one
+INSERT (names another process added first are skipped) and one SELECT.
+Rows written before the catalog existed are linked by migration 0010.
+"""
+import threading
+
+from django.db import transaction
+
+from .models import CanonicalIngredient, CanonicalUnit
+from .pantry import normalize_ingredient_name
+from .units import UNITS, normalize_unit
+
+# Normalized spellings of the same ingredient -> the catalog name they share
+ALIASES = {
+    'all purpose flour': 'flour',
+    'ap flour': 'flour',
+    'plain flour': 'flour',
+    'white flour': 'flour',
+    'granulated sugar': 'sugar',
+    'white sugar': 'sugar',
+    'table salt': 'salt',
+    'large egg': 'egg',
+    'garlic clove': 'garlic',
+    'scallion': 'green onion',
+    'spring onion': 'green onion',
+    'coriander leaf': 'cilantro',
+    'courgette': 'zucchini',
+    'aubergine': 'eggplant',
+    'garbanzo bean': 'chickpea',
+}
+
+# Every spelling in units.UNITS -> the first one listed for that unit
+UNIT_ALIASES = {
+    alias: aliases[0]
+    for factors in UNITS.values()
+    for aliases in factors.values()
+    for alias in aliases
+}
+
+# The row keys link() fills in, for callers that diff or write them
+CATALOG_FIELDS = ['canonical_id', 'canonical_unit_id']
+
+LOOKUP_BATCH_SIZE = 500
+
+
+def canonical_ingredient_name(name):
+    """'All-purpose Flour' -> 'flour', ' Tomatoes, ' -> 'tomato'."""
+    name = normalize_ingredient_name(name)
+    return ALIASES.get(name, name)
+
+
+def canonical_unit_name(unit):
+    """'Tablespoons' -> 'tbsp', 'Grams' -> 'g', 'cloves' -> 'clove'."""
+    unit = normalize_unit(unit)
+    return UNIT_ALIASES.get(unit, unit)
+
+
+class Catalog:
+    """Canonical name -> id for one catalog table, cached per process."""
+
+    def __init__(self, model, canonicalize):
+        self.model = model
+        self.canonicalize = canonicalize
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._ids = {}
+
+    def ids(self, names):
+        """Map each of ``names`` (as typed) to its entry's id; None for names that normalize to nothing."""
+        keys = {name: self.canonicalize(name) for name in set(names)}
+        with self._lock:
+            known = {key: self._ids[key] for key in keys.values() if key in self._ids}
+        missing = sorted({key for key in keys.values() if key and key not in known})
+        if missing:
+            found = self._create(missing)
+            known.update(found)
+            # Entries inserted here roll back with the transaction, so they
+            # are only remembered once it commits
+            transaction.on_commit(lambda: self._remember(found))
+        return {name: known.get(key) for name, key in keys.items()}
+
+    def lookup(self, names):
+        """Like ids(), but for reads: names the catalog doesn't have yet map to None instead of being added."""
+        keys = {name: self.canonicalize(name) for name in set(names)}
+        with self._lock:
+            known = {key: self._ids[key] for key in keys.values() if key in self._ids}
+        missing = sorted({key for key in keys.values() if key and key not in known})
+        if missing:
+            found = {}
+            for start in range(0, len(missing), LOOKUP_BATCH_SIZE):
+                batch = missing[start:start + LOOKUP_BATCH_SIZE]
+                found.update(self.model.objects.filter(name__in=batch).values_list('name', 'pk'))
+            known.update(found)
+            transaction.on_commit(lambda: self._remember(found))
+        return {name: known.get(key) for name, key in keys.items()}
+
+    def _create(self, keys):
+        found = {}
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[start:start + LOOKUP_BATCH_SIZE]
+            self.model.objects.bulk_create([self.model(name=key) for key in batch], ignore_conflicts=True)
+            found.update(self.model.objects.filter(name__in=batch).values_list('name', 'pk'))
+        return found
+
+    def _remember(self, found):
+        with self._lock:
+            self._ids.update(found)
+
+
+ingredient_catalog = Catalog(CanonicalIngredient, canonical_ingredient_name)
+unit_catalog = Catalog(CanonicalUnit, canonical_unit_name)
+
+
+def link(rows):
+    """
+    Set canonical_id and canonical_unit_id on row dicts (validated
+    Ingredient or GroceryItem data) from the name and unit they carry;
+    returns ``rows``.
+    """
+    names = ingredient_catalog.ids(row['name'] for row in rows if 'name' in row)
+    units = unit_catalog.ids(row['unit'] for row in rows if 'unit' in row)
+    for row in rows:
+        if 'name' in row:
+            row['canonical_id'] = names[row['name']]
+        if 'unit' in row:
+            row['canonical_unit_id'] = units[row['unit']]
+    return rows
+
+
+def link_instances(instances):
+    """The same for Ingredient or GroceryItem instances, from their current name and unit; returns ``instances``."""
+    rows = link([{'name': instance.name, 'unit': instance.unit} for instance in instances])
+    for instance, row in zip(instances, rows):
+        instance.canonical_id = row['canonical_id']
+        instance.canonical_unit_id = row['canonical_unit_id']
+    return instances
@@ -0,0 +1,191 @@
+"""
+Incremental change feed for offline clients.
+
+Recipe, Ingredient, GroceryList and GroceryItem rows carry a change_seq.
+Every write takes a new number and stores it on each row it inserts or
+updates. Deletes leave a Tombstone with that number for every user who
+could see the row. Tombstones cover only the row itself: deleting a recipe
+or a list leaves no tombstones for its children, since clients drop those
+along with it.
+
+Numbers are handed out before their transactions commit, and transactions
+commit in any order, so a sync reads only up to a watermark: the highest
+number at or below which no write is still in flight. A reader that has
+seen seq 12 can then never later find a committed seq 11 it skipped.
+- On Postgres the numbers come from a sequence (migration 0012), so writers
+  never wait for each other. Each writer holds a transaction-level advisory
+  lock on its number until it ends, and the watermark is the number below
+  the oldest such lock. A long write transaction holds the watermark back
+  until it ends; syncs in the meantime return less, not wrong rows.
+- On SQLite, which runs one write transaction at a time anyway, the number
+  is ChangeCounter's value, bumped in place, and is its own watermark.
+Write paths that read rows and write them back lock them with
+select_for_update() first.
+
+GET /api/sync/?since=<cursor> (views.SyncView) returns what changed after
+the cursor and a new cursor. Without since it returns everything, including
+rows from before change_seq existed, which all have 0, and no tombstones:
+a client starting from nothing has nothing to delete. Tombstones older than
+CHANGE_FEED['TOMBSTONE_RETENTION_DAYS'] are deleted by `manage.py
+compact_tombstones`. Cursors from before the newest deleted tombstone get
+410 Gone, and the client starts over without since.
+
+A response holds at most CHANGE_FEED['PAGE_SIZE'] rows and tombstones, in
+(change_seq, kind, pk) order, up to the watermark read when the sync
+began. When more are left it says ``has_more`` and its cursor points just
+past the last one sent; the client applies each page in turn and calls
+again with that cursor until ``has_more`` is false. The pages of a sync
+without since carry no tombstones either.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ChangeCounter, GroceryItem, Tombstone
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULTS = {
+    'TOMBSTONE_RETENTION_DAYS': 30,
+    'PAGE_SIZE': 1000,
+}
+
+# The kinds in a sync response, in the order a page lists rows that share a change_seq
+SYNC_KINDS = ('recipes', 'ingredients', 'grocery_lists', 'grocery_items', 'deleted')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHANGE_FEED', {})}
+
+
+def next_change_seq():
+    """
+    Take the change_seq for the writing transaction's rows. Call inside the
+    transaction, before its first write; syncs don't read past it until the
+    transaction ends.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT recipeapp_next_change_seq()')
+            return cursor.fetchone()[0]
+        quote = connection.ops.quote_name
+        cursor.execute(
+            f'UPDATE {quote(ChangeCounter._meta.db_table)} SET {quote("value")} = {quote("value")} + 1 '
+            f'WHERE {quote("id")} = 1 RETURNING {quote("value")}'
+        )
+        row = cursor.fetchone()
+    if row is None:
+        # The row migration 0007 created is gone (a flushed test database)
+        ChangeCounter.objects.create(pk=1, value=1)
+        return 1
+    return row[0]
+
+
+def current_change_seq():
+    """The watermark a sync may read up to, and the change_seq tombstones are compacted through."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT recipeapp_change_watermark(), (SELECT {connection.ops.quote_name("compacted_through")} '
+                f'FROM {connection.ops.quote_name(ChangeCounter._meta.db_table)} WHERE id = 1)'
+            )
+            value, compacted_through = cursor.fetchone()
+        return value, compacted_through or 0
+    return ChangeCounter.objects.filter(pk=1).values_list('value', 'compacted_through').first() or (0, 0)
+
+
+def parse_sync_cursor(value, current):
+    """
+    Read a SyncView cursor: ``'<seq>'`` once a sync is complete, or
+    ``'<until>.<seq>.<kind>.<pk>'`` part way through one, after the row of
+    SYNC_KINDS[kind] with that change_seq and pk, ending in ``.full`` when
+    the sync began without since. Returns ``(until, position, full)``: the
+    watermark the sync stops at (``current`` for a new one), the
+    ``(change_seq, kind, pk)`` to continue after, and whether it is a full
+    sync. Raises ValueError for anything else.
+    """
+    full = value.endswith('.full')
+    parts = [int(part) for part in value.removesuffix('.full').split('.')]
+    if any(part < 0 for part in parts):
+        raise ValueError(value)
+    if len(parts) == 1 and not full:
+        return current, (parts[0], len(SYNC_KINDS), 0), False
+    if len(parts) == 4 and parts[1] <= parts[0] and parts[2] < len(SYNC_KINDS):
+        return parts[0], tuple(parts[1:]), full
+    raise ValueError(value)
+
+
+def sync_cursor(until, last=None, full=False):
+    """
+    The cursor to hand out: where a complete sync ended, or the ``(change_seq,
+    kind, pk)`` a page ended at, marked when the sync began without since.
+    """
+    if last is None:
+        return str(until)
+    return '.'.join(map(str, (until, *last))) + ('.full' if full else '')
+
+
+def after_position(position, kind):
+    """Rows of SYNC_KINDS[kind] that come after ``position`` in (change_seq, kind, pk) order."""
+    seq, at_kind, pk = position
+    condition = Q(change_seq__gt=seq)
+    if kind > at_kind:
+        condition |= Q(change_seq=seq)
+    elif kind == at_kind:
+        condition |= Q(change_seq=seq, pk__gt=pk)
+    return condition
+
+
+def record_deletions(kind, object_ids, user_ids, seq):
+    """One tombstone per deleted object and user who could see it."""
+    Tombstone.objects.bulk_create(
+        Tombstone(kind=kind, object_id=object_id, user_id=user_id, change_seq=seq)
+        for object_id in object_ids
+        for user_id in user_ids
+    )
+
+
+def list_audience(grocery_list):
+    """Ids of the users who can see ``grocery_list``: its owner and everyone it is shared with."""
+    return [grocery_list.created_by_id, *grocery_list.shared_with.values_list('user_id', flat=True)]
+
+
+def touch_grocery_list(grocery_list, seq):
+    """
+    Move a list and its items to ``seq`` without changing them, so a user who
+    just gained access receives the whole list on their next sync.
+    """
+    type(grocery_list).objects.filter(pk=grocery_list.pk).update(change_seq=seq)
+    GroceryItem.objects.filter(grocery_list=grocery_list).update(change_seq=seq)
+
+
+def compact_tombstones(retention=None, batch_size=DEFAULT_BATCH_SIZE, pause=0.0, now=None):
+    """
+    Delete tombstones older than ``retention`` (a timedelta; CHANGE_FEED's
+    retention by default) in primary-key batches; returns how many were
+    removed. Cursors from before the newest deleted one stop being accepted.
+    """
+    if retention is None:
+        retention = timedelta(days=get_config()['TOMBSTONE_RETENTION_DAYS'])
+    cutoff = (now or timezone.now()) - retention
+    deleted = 0
+    while True:
+        rows = list(
+            Tombstone.objects.filter(deleted_at__lt=cutoff).order_by('pk')
+            .values_list('pk', 'change_seq')[:batch_size]
+        )
+        if not rows:
+            break
+        ids, seqs = zip(*rows)
+        # Stop accepting the cursors these tombstones belong to before they go
+        ChangeCounter.objects.filter(pk=1).update(compacted_through=Greatest('compacted_through', max(seqs)))
+        deleted += Tombstone.objects.filter(pk__in=ids).delete()[0]
+        if len(rows) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
@@ -0,0 +1,116 @@
+"""
+Conditional GET (ETag / Last-Modified / 304) for list and retrieve.
+
+Validators are derived from ``(id, updated_at)`` of the rows a response
+would contain. When a request carries If-None-Match or If-Modified-Since,
+they are checked against a query that loads only those columns, and a match
+returns 304 before the full queryset is fetched or anything is serialized.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+# Bump when a serializer's output changes shape so old validators stop matching
+ETAG_VERSION = '1'
+# created_at is needed by the cursor paginator to build the next link
+VALIDATOR_FIELDS = ('id', 'created_at', 'updated_at')
+
+
+def make_validators(rows):
+    """Return ``(etag, last_modified)`` for an iterable of ``(pk, updated_at)``."""
+    digest = hashlib.md5(ETAG_VERSION.encode(), usedforsecurity=False)
+    last_modified = None
+    for pk, updated_at in rows:
+        digest.update(f'{pk}:{updated_at.isoformat()};'.encode())
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    return f'"{digest.hexdigest()}"', last_modified
+
+
+def has_validators(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Responses depend on who is asking; let browsers keep them but always revalidate
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 response if the request's validators match, otherwise None."""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified is not None else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for a ModelViewSet's list and retrieve.
+    Set ``list_projection`` to render list rows without the serializer (see
+    projections.py).
+    """
+    list_projection = None
+
+    def get_list_projection(self):
+        return self.list_projection
+
+    def get_conditional_queryset(self):
+        """Rows the current user may retrieve; override when get_queryset doesn't filter by visibility."""
+        return self.get_queryset()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if has_validators(request):
+            validators = queryset.select_related(None).prefetch_related(None).only(*VALIDATOR_FIELDS)
+            page = self.paginate_queryset(validators)
+            rows = page if page is not None else validators
+            response = not_modified(request, *make_validators((row.pk, row.updated_at) for row in rows))
+            if response is not None:
+                return response
+
+        projection = self.get_list_projection()
+        if projection is not None:
+            queryset = projection.project(queryset)
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+        etag, last_modified = make_validators((row.pk, row.updated_at) for row in rows)
+        data = projection.serialize(rows) if projection is not None else self.get_serializer(rows, many=True).data
+        if page is not None:
+            response = self.get_paginated_response(data)
+        else:
+            response = Response(data)
+        return set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        if has_validators(request):
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            try:
+                row = (
+                    self.get_conditional_queryset().select_related(None).prefetch_related(None)
+                    .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+                    .values_list('pk', 'updated_at').first()
+                )
+            except (TypeError, ValueError, ValidationError):
+                row = None
+            # Unknown or hidden objects fall through to the usual 403 / 404
+            if row is not None:
+                response = not_modified(request, *make_validators([row]))
+                if response is not None:
+                    return response
+
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), *make_validators([(instance.pk, instance.updated_at)]))
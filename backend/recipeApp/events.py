@@ -0,0 +1,336 @@
+"""
+Live updates for shared grocery lists.
+
+Every write to a grocery list is described as a handful of small delta
+events, published once the transaction commits:
+
+    {"type": "added", "item": {...}}        an item was added
+    {"type": "changed", "item": {...}}      an item's name, unit or quantity changed
+    {"type": "checked", "item": {"id": 7, "checked": true}}
+                                            only an item's checked state changed
+    {"type": "removed", "item": {"id": 7}}  an item was removed
+    {"type": "list", "list": {...}}         the list was renamed
+    {"type": "revoked", "user": 3}          a user's share was removed
+    {"type": "deleted", "list": {"id": 1}}  the list is gone
+
+A broker fans them out to every open stream of that list. GET
+/api/grocery-lists/<id>/events/ is such a stream, as server-sent events: a
+``ready`` event carrying the list's updated_at (clients refetch when theirs
+differs), then the deltas as they happen, with a comment line every
+HEARTBEAT seconds so proxies keep the connection open. A stream ends after
+MAX_STREAM_SECONDS, when its list is deleted or its user's share revoked,
+and with a ``resync`` event when its client falls more than BUFFER events
+behind; EventSource reconnects on its own after the first two.
+
+Under WSGI a stream holds its worker thread for as long as it is open, so
+each process serves at most MAX_THREAD_STREAMS of them at once and answers
+any more with 503 and Retry-After, leaving the other threads for ordinary
+requests. Under ASGI (backend.asgi) a waiting stream holds no thread and
+there is no such limit.
+
+InProcessBroker only reaches streams served by the same process. With
+several workers set BROKER to RedisBroker, which relays events through
+Redis pub/sub; gunicorn.conf.py refuses to start several workers on a
+broker that doesn't (check_event_broker). Tests swap in their own broker through the GROCERY_EVENTS
+setting.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BROKER': 'recipeApp.events.InProcessBroker',
+    'OPTIONS': {},
+    'HEARTBEAT': 15,
+    'MAX_STREAM_SECONDS': 300,
+    'BUFFER': 100,
+    'RETRY_MS': 3000,
+    'MAX_THREAD_STREAMS': 2,
+}
+
+# Events after which a stream has nothing more to send
+FINAL_EVENTS = {'deleted', 'resync'}
+
+
+class StreamsBusy(Exception):
+    """This process already holds MAX_THREAD_STREAMS threads open for streams."""
+
+
+class Subscription:
+    """
+    The queue of events for one open stream. Brokers push from any thread;
+    the stream waits on it with wait() in a thread or await_events() on the
+    event loop it was created for.
+    """
+
+    def __init__(self, broker, list_id, user_id, buffer, loop=None):
+        self.broker = broker
+        self.list_id = list_id
+        self.user_id = user_id
+        self.buffer = buffer
+        self.overflowed = False
+        self._events = []
+        self._lock = threading.Lock()
+        self._loop = loop
+        self._ready = threading.Event() if loop is None else asyncio.Event()
+
+    def push(self, events):
+        with self._lock:
+            if len(self._events) + len(events) > self.buffer:
+                self.overflowed = True
+            else:
+                self._events.extend(events)
+        if self._loop is None:
+            self._ready.set()
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # The loop is closed, and the stream with it
+            pass
+
+    def _drain(self):
+        with self._lock:
+            events, self._events = self._events, []
+            self._ready.clear()
+        if self.overflowed:
+            events.append({'type': 'resync'})
+        return [event for event in events if event['type'] != 'revoked' or event['user'] == self.user_id]
+
+    def wait(self, timeout):
+        """Events pushed since the last call, waiting up to ``timeout`` seconds for one."""
+        self._ready.wait(timeout)
+        return self._drain()
+
+    async def await_events(self, timeout):
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._drain()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fans events out to the subscriptions of this process."""
+    # Whether an event published in one process reaches streams in the others
+    cross_process = False
+
+    def __init__(self, buffer=DEFAULTS['BUFFER']):
+        self.buffer = buffer
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, list_id, user_id, loop=None):
+        subscription = Subscription(self, list_id, user_id, self.buffer, loop)
+        with self._lock:
+            self._subscriptions[list_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.list_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.list_id]
+
+    def subscriber_count(self, list_id):
+        with self._lock:
+            return len(self._subscriptions.get(list_id, ()))
+
+    def publish(self, list_id, events):
+        self.deliver(list_id, events)
+
+    def deliver(self, list_id, events):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(list_id, ()))
+        for subscription in subscriptions:
+            subscription.push(events)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Publishes through Redis pub/sub so streams in every worker receive the
+    event. Each process runs one listener thread, started by its first
+    subscriber, that hands what it hears to the local subscriptions.
+    """
+    channel_prefix = 'grocery-list-events:'
+    cross_process = True
+
+    def __init__(self, url, buffer=DEFAULTS['BUFFER']):
+        if redis is None:
+            raise ImproperlyConfigured('RedisBroker needs the redis package.')
+        super().__init__(buffer)
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._listener_pid = None
+
+    def publish(self, list_id, events):
+        self.client.publish(f'{self.channel_prefix}{list_id}', json.dumps(events, default=str))
+
+    def subscribe(self, list_id, user_id, loop=None):
+        with self._lock:
+            # Threads don't survive a fork, so each worker starts its own
+            if self._listener_pid != os.getpid():
+                self._listener_pid = os.getpid()
+                threading.Thread(target=self._listen, name='grocery-list-events', daemon=True).start()
+        return super().subscribe(list_id, user_id, loop)
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f'{self.channel_prefix}*')
+                for message in pubsub.listen():
+                    list_id = int(message['channel'][len(self.channel_prefix):])
+                    self.deliver(list_id, json.loads(message['data']))
+            except Exception:
+                logger.exception('Grocery list event listener failed; reconnecting')
+                time.sleep(1)
+
+
+def check_event_broker(workers, config=None):
+    """
+    Raise ImproperlyConfigured when ``workers`` processes would each deliver
+    events only to their own streams (GROCERY_EVENTS by default).
+    """
+    config = {**DEFAULTS, **getattr(settings, 'GROCERY_EVENTS', {})} if config is None else config
+    if workers > 1 and not import_string(config['BROKER']).cross_process:
+        raise ImproperlyConfigured(
+            f"{workers} workers, but GROCERY_EVENTS['BROKER'] {config['BROKER']} only reaches streams "
+            f'in its own process. Set REDIS_URL to use RedisBroker, or run one worker (WEB_CONCURRENCY=1).'
+        )
+
+
+class GroceryListEvents:
+
+    def __init__(self):
+        self.configure()
+
+    def configure(self):
+        self.config = {**DEFAULTS, **getattr(settings, 'GROCERY_EVENTS', {})}
+        self.broker = import_string(self.config['BROKER'])(buffer=self.config['BUFFER'], **self.config['OPTIONS'])
+        self._thread_slots = threading.BoundedSemaphore(self.config['MAX_THREAD_STREAMS'])
+
+    def publish(self, list_id, events):
+        """Publish ``events`` for the list once the current transaction commits."""
+        if events:
+            transaction.on_commit(lambda: self._publish(list_id, events))
+
+    def _publish(self, list_id, events):
+        try:
+            self.broker.publish(list_id, events)
+        except Exception:
+            # The write itself succeeded; streams resync when they reconnect
+            logger.exception('Could not publish events for grocery list %s', list_id)
+
+    def subscribe(self, list_id, user_id, loop=None):
+        return self.broker.subscribe(list_id, user_id, loop)
+
+    # -- streams -------------------------------------------------------------
+
+    def reserve_thread(self):
+        """
+        Claim one of this process's MAX_THREAD_STREAMS slots for a WSGI
+        stream and return the function that gives it back. Raises
+        StreamsBusy when every slot is taken.
+        """
+        slots = self._thread_slots
+        if not slots.acquire(blocking=False):
+            raise StreamsBusy()
+        return slots.release
+
+    def _opening(self, ready):
+        return f'retry: {self.config["RETRY_MS"]}\n'.encode() + format_event({'type': 'ready', 'list': ready})
+
+    def _frames(self, events):
+        """The SSE bytes for a batch of events, and whether the stream ends with it."""
+        if not events:
+            return b': heartbeat\n\n', False
+        return b''.join(map(format_event, events)), any(
+            event['type'] in FINAL_EVENTS or event['type'] == 'revoked' for event in events
+        )
+
+    def stream(self, subscription, ready, release=None):
+        """Server-sent events for ``subscription``, for WSGI workers; calls ``release`` when it ends."""
+        deadline = time.monotonic() + self.config['MAX_STREAM_SECONDS']
+        try:
+            yield self._opening(ready)
+            while (remaining := deadline - time.monotonic()) > 0:
+                frames, done = self._frames(subscription.wait(min(self.config['HEARTBEAT'], remaining)))
+                yield frames
+                if done:
+                    break
+        finally:
+            subscription.close()
+            if release is not None:
+                release()
+
+    async def astream(self, subscription, ready):
+        """Server-sent events for ``subscription``, on the event loop."""
+        deadline = time.monotonic() + self.config['MAX_STREAM_SECONDS']
+        try:
+            yield self._opening(ready)
+            while (remaining := deadline - time.monotonic()) > 0:
+                frames, done = self._frames(
+                    await subscription.await_events(min(self.config['HEARTBEAT'], remaining))
+                )
+                yield frames
+                if done:
+                    break
+        finally:
+            subscription.close()
+
+
+def format_event(event):
+    return f'event: {event["type"]}\ndata: {json.dumps(event, separators=(",", ":"), default=str)}\n\n'.encode()
+
+
+def event_stream_response(stream):
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx would otherwise hold events back until its buffer fills
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def release_connections():
+    """
+    Give back this thread's database connections before a long stream,
+    which never queries again; Django would only close them when the
+    response finishes. Connections inside an atomic block (tests) stay.
+    """
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+grocery_list_events = GroceryListEvents()
+
+
+def _reload(setting, **kwargs):
+    if setting == 'GROCERY_EVENTS':
+        grocery_list_events.configure()
+
+
+setting_changed.connect(_reload)
@@ -0,0 +1,98 @@
+"""
+Streaming exports of a user's recipes and grocery lists as NDJSON or CSV.
+
+Rows are pulled with QuerySet.iterator(chunk_size=...) and their children are
+prefetched one chunk at a time, so a worker holds at most one chunk in
+memory and the first bytes go out as soon as the first chunk is read.
+"""
+import csv
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import RecipeSerializer, GroceryListSerializer
+
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+RECIPE_CSV_HEADER = [
+    'recipe_id', 'title', 'description', 'instructions', 'is_public', 'created_at',
+    'ingredient_id', 'ingredient_name', 'ingredient_quantity', 'ingredient_unit',
+]
+GROCERY_CSV_HEADER = [
+    'list_id', 'list_name', 'created_at', 'item_id', 'item_name', 'item_quantity', 'item_unit', 'item_checked',
+]
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def _ndjson_lines(queryset, serializer):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for obj in queryset:
+        yield encoder.encode(serializer.to_representation(obj)) + '\n'
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _recipe_csv_rows(queryset):
+    for recipe in queryset:
+        head = [recipe.pk, recipe.title, recipe.description, recipe.instructions,
+                recipe.is_public, recipe.created_at.isoformat()]
+        ingredients = recipe.ingredients.all()
+        if not ingredients:
+            yield head + ['', '', '', '']
+        for ingredient in ingredients:
+            yield head + [ingredient.pk, ingredient.name, ingredient.quantity, ingredient.unit]
+
+
+def _grocery_csv_rows(queryset):
+    for grocery_list in queryset:
+        head = [grocery_list.pk, grocery_list.name, grocery_list.created_at.isoformat()]
+        items = grocery_list.items.all()
+        if not items:
+            yield head + ['', '', '', '', '']
+        for item in items:
+            yield head + [item.pk, item.name, item.quantity, item.unit, item.checked]
+
+
+def _response(lines, export_format, filename):
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    # Tell nginx not to buffer the whole export before passing it on
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def export_recipes(queryset, export_format):
+    queryset = queryset.select_related('created_by').prefetch_related('ingredients').iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+    if export_format == 'csv':
+        lines = _csv_lines(RECIPE_CSV_HEADER, _recipe_csv_rows(queryset))
+    else:
+        lines = _ndjson_lines(queryset, RecipeSerializer())
+    return _response(lines, export_format, 'recipes')
+
+
+def export_grocery_lists(queryset, export_format):
+    queryset = queryset.select_related('created_by').prefetch_related('items').iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+    if export_format == 'csv':
+        lines = _csv_lines(GROCERY_CSV_HEADER, _grocery_csv_rows(queryset))
+    else:
+        lines = _ndjson_lines(queryset, GroceryListSerializer())
+    return _response(lines, export_format, 'grocery-lists')
@@ -0,0 +1,113 @@
+"""
+Sparse fieldsets for recipe and grocery list reads.
+
+``?fields=id,title`` limits a response to the named fields and
+``?expand=ingredients`` adds nested relations the endpoint leaves out by
+default; the two combine, so ``?fields=id,title&expand=created_by`` returns
+three keys. Without either parameter responses are unchanged.
+
+The selection drives the query as well as the output: only the selected
+columns are loaded (plus the few the view itself reads), the author is
+joined only when ``created_by`` is selected, and child rows are prefetched
+only when their relation is. Selections without child rows still go
+through the values_list() fast path (see projections.py).
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .conditional import VALIDATOR_FIELDS
+from .projections import projection_for
+
+
+class FieldSelection:
+    """The fields of one request's response and what loading them takes."""
+
+    def __init__(self, serializer):
+        self.fields = tuple(serializer.fields)
+        self.columns = set(VALIDATOR_FIELDS)
+        self.select_related = []
+        self.prefetch_related = []
+        for field in serializer.fields.values():
+            if isinstance(field, serializers.ListSerializer):
+                self.prefetch_related.append(field.source)
+            elif isinstance(field, serializers.BaseSerializer):
+                self.select_related.append(field.source)
+                self.columns.add(field.source)
+                self.columns.update(f'{field.source}__{child.source}' for child in field.fields.values())
+            else:
+                self.columns.add(field.source)
+
+    def apply(self, queryset, always_load=()):
+        return (
+            queryset.select_related(None).prefetch_related(None)
+            .select_related(*self.select_related).prefetch_related(*self.prefetch_related)
+            .only(*self.columns, *always_load)
+        )
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=`` and ``?expand=`` for a viewset's read actions.
+    ``sparse_serializer_class`` must accept ``fields=`` (see
+    serializers.SparseFieldsMixin) and declare every field a client may ask
+    for; ``sparse_always_load`` names columns the view reads itself, such as
+    the ones its permission checks use.
+    """
+    sparse_serializer_class = None
+    sparse_always_load = ()
+    sparse_actions = ('list', 'retrieve', 'search')
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def _parse_names(self, param):
+        """Names listed in ``param``; None when it is missing or empty."""
+        names = [name.strip() for name in self.request.query_params.get(param, '').split(',') if name.strip()]
+        return names or None
+
+    def get_field_selection(self):
+        """The request's FieldSelection, or None when it asks for the default response."""
+        if hasattr(self, '_field_selection'):
+            return self._field_selection
+        self._field_selection = None
+        fields = self._parse_names(self.fields_query_param)
+        expand = self._parse_names(self.expand_query_param)
+        if self.action not in self.sparse_actions or (fields is None and expand is None):
+            return None
+
+        available = self.sparse_serializer_class().fields
+        relations = {name for name, field in available.items() if isinstance(field, serializers.BaseSerializer)}
+        errors = {}
+        unknown = sorted(set(fields or ()) - set(available))
+        if unknown:
+            errors[self.fields_query_param] = f'Unknown fields: {", ".join(unknown)}. Choose from: {", ".join(available)}.'
+        unknown = sorted(set(expand or ()) - relations)
+        if unknown:
+            errors[self.expand_query_param] = f'Cannot expand: {", ".join(unknown)}. Choose from: {", ".join(sorted(relations))}.'
+        if errors:
+            raise ValidationError(errors)
+
+        names = set(self.get_serializer_class().Meta.fields if fields is None else fields) | set(expand or ())
+        self._field_selection = FieldSelection(self.sparse_serializer_class(fields=names))
+        return self._field_selection
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        selection = self.get_field_selection()
+        if selection is None:
+            return queryset
+        return selection.apply(queryset, self.sparse_always_load)
+
+    def get_serializer(self, *args, **kwargs):
+        selection = self.get_field_selection()
+        if selection is None:
+            return super().get_serializer(*args, **kwargs)
+        kwargs.setdefault('context', self.get_serializer_context())
+        return self.sparse_serializer_class(*args, fields=selection.fields, **kwargs)
+
+    def get_list_projection(self):
+        selection = self.get_field_selection()
+        if selection is None:
+            return super().get_list_projection()
+        if selection.prefetch_related:
+            return None
+        return projection_for(self.sparse_serializer_class, selection.fields)
@@ -0,0 +1,98 @@
+"""
+Item-level writes to a grocery list.
+
+Each function writes only the items it is given, in one transaction. It
+also moves the list's updated_at (list ETags cover its items), stamps
+change_seq for the sync feed (see changes.py) and publishes delta events
+(see events.py). Ticking an item off costs one SELECT and one single-row
+UPDATE of the item, plus the bookkeeping. Rewriting the whole list through
+GroceryListSerializer would diff every item.
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+
+from .catalog import CATALOG_FIELDS, link, link_instances
+from .changes import list_audience, next_change_seq, record_deletions
+from .events import grocery_list_events
+from .models import GroceryItem, GroceryList
+from .nested import create_children
+from .serializers import grocery_item_events
+
+FIELDS = ['name', 'unit', 'quantity', 'checked']
+MAX_BATCH_SIZE = 500
+
+
+def _touch_list(grocery_list):
+    GroceryList.objects.filter(pk=grocery_list.pk).update(updated_at=timezone.now())
+
+
+@transaction.atomic
+def add_items(grocery_list, rows):
+    """Insert ``rows`` (validated item data) into the list; returns the new items."""
+    seq = next_change_seq()
+    items = create_children(GroceryItem, 'grocery_list', grocery_list, link(rows), {'change_seq': seq})
+    _touch_list(grocery_list)
+    grocery_list_events.publish(grocery_list.pk, grocery_item_events(created=items))
+    return items
+
+
+@transaction.atomic
+def update_items(grocery_list, changes):
+    """
+    Apply ``changes`` (validated partial item data, each with an ``id``) to
+    the list's items; returns the items that actually changed. Repeated ids
+    raise ValidationError and ids the list doesn't have NotFound, and
+    nothing is written.
+    """
+    ids = [change['id'] for change in changes]
+    repeated = sorted({pk for pk in ids if ids.count(pk) > 1})
+    if repeated:
+        raise ValidationError({'id': [f'Duplicate item ids: {repeated}']})
+    seq = next_change_seq()
+    # Locked, so the items read here can't change before they are written back
+    items = grocery_list.items.select_for_update().order_by('pk').in_bulk(ids)
+    missing = [pk for pk in ids if pk not in items]
+    if missing:
+        raise NotFound(f'Grocery items not found: {missing}')
+
+    updated, checked, renamed, by_fields = [], [], [], {}
+    for change in changes:
+        item = items[change['id']]
+        diff = {field: value for field, value in change.items() if field in FIELDS and getattr(item, field) != value}
+        if not diff:
+            continue
+        for field, value in diff.items():
+            setattr(item, field, value)
+        item.change_seq = seq
+        fields = sorted(diff)
+        if 'name' in diff or 'unit' in diff:
+            renamed.append(item)
+            fields += CATALOG_FIELDS
+        # Each item writes only its own changed fields, so a field another
+        # item changed isn't written back from this one's copy
+        by_fields.setdefault((*fields, 'change_seq'), []).append(item)
+        (checked if set(diff) == {'checked'} else updated).append(item)
+    if not by_fields:
+        return []
+
+    if renamed:
+        link_instances(renamed)
+    for fields, group in by_fields.items():
+        GroceryItem.objects.bulk_update(group, fields)
+    _touch_list(grocery_list)
+    grocery_list_events.publish(grocery_list.pk, grocery_item_events(updated=updated, checked=checked))
+    return sorted(updated + checked, key=lambda item: ids.index(item.pk))
+
+
+@transaction.atomic
+def remove_item(grocery_list, item_id):
+    """Delete one item from the list; False when the list has no such item."""
+    seq = next_change_seq()
+    deleted, _ = GroceryItem.objects.filter(pk=item_id, grocery_list=grocery_list).delete()
+    if not deleted:
+        return False
+    record_deletions('grocery_item', [item_id], list_audience(grocery_list), seq)
+    _touch_list(grocery_list)
+    grocery_list_events.publish(grocery_list.pk, grocery_item_events(removed=[item_id]))
+    return True
@@ -0,0 +1,56 @@
+"""
+Bounded concurrency for password hashing.
+
+Logins and registrations run a deliberately slow password hash. Left
+unbounded, a burst of them occupies every worker thread and stalls the rest
+of the API. All hashing goes through one gate per process: at most
+PASSWORD_HASHING['MAX_CONCURRENCY'] hashes run at once, and a request that
+can't get a slot within PASSWORD_HASHING['QUEUE_TIMEOUT'] seconds gives up
+with HashingBusy instead of queueing indefinitely.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+
+class HashingBusy(Exception):
+    """No hashing slot became free within the queue timeout."""
+
+
+class HashingGate:
+
+    def __init__(self):
+        self.configure()
+
+    def configure(self):
+        config = getattr(settings, 'PASSWORD_HASHING', {})
+        self.max_concurrency = config.get('MAX_CONCURRENCY') or os.cpu_count() or 1
+        self.queue_timeout = config.get('QUEUE_TIMEOUT', 2.0)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    @contextmanager
+    def slot(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def run(self, func, *args, **kwargs):
+        with self.slot():
+            return func(*args, **kwargs)
+
+
+hashing_gate = HashingGate()
+
+
+def _reload(setting, **kwargs):
+    if setting == 'PASSWORD_HASHING':
+        hashing_gate.configure()
+
+
+setting_changed.connect(_reload)
@@ -0,0 +1,163 @@
+"""
+Cached readiness probe for the health endpoints.
+
+Load balancers poll every target every few seconds. Instead of running
+``SELECT 1`` for each poll, every process probes the database and the
+caches in HEALTH_CHECK['CACHES'] once per HEALTH_CHECK['INTERVAL'] seconds
+and the readiness endpoint answers from the last result. gunicorn starts
+the probe thread in each worker (see gunicorn.conf.py); anywhere else the
+first readiness request after the interval runs the probe inline.
+
+A result older than HEALTH_CHECK['STALE_AFTER'] seconds (a hung probe, say)
+counts as not ready. Failures report the exception class only, never its
+message, which can carry hostnames or credentials.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import close_old_connections, connections
+
+from .pooled_postgresql import pool_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'INTERVAL': 5,
+    'STALE_AFTER': 30,
+    'CACHES': ['responses'],
+    'LATENCY_WINDOW': 120,  # probes kept for the latency percentiles
+}
+PROBE_KEY = 'health-check:probe'
+
+
+def percentiles(samples, points=(0.5, 0.95, 0.99)):
+    """Nearest-rank percentiles of ``samples`` in milliseconds, keyed p50/p95/p99."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    return {
+        f'p{round(point * 100)}': round(ordered[min(int(len(ordered) * point), len(ordered) - 1)] * 1000, 2)
+        for point in points
+    }
+
+
+class HealthProbe:
+
+    def __init__(self):
+        self.configure()
+
+    def configure(self):
+        self.config = {**DEFAULTS, **getattr(settings, 'HEALTH_CHECK', {})}
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._result = None
+        self._thread = None
+        self._pid = None
+
+    # -- probing -------------------------------------------------------------
+
+    def _timed(self, name, check):
+        start = time.perf_counter()
+        try:
+            check()
+        except Exception as e:
+            logger.warning('Health probe for %s failed', name, exc_info=True)
+            return {'status': 'error', 'error': type(e).__name__}
+        elapsed = time.perf_counter() - start
+        window = self._latencies.setdefault(name, deque(maxlen=self.config['LATENCY_WINDOW']))
+        window.append(elapsed)
+        return {'status': 'ok', 'latency_ms': round(elapsed * 1000, 2)}
+
+    def _check_database(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+
+    def _probe(self):
+        checks = {'database': self._timed('database', self._check_database)}
+        for alias in self.config['CACHES']:
+            checks[f'cache:{alias}'] = self._timed(f'cache:{alias}', lambda: caches[alias].get(PROBE_KEY))
+        self._result = (time.monotonic(), checks)
+        return self._result
+
+    def run_once(self):
+        with self._lock:
+            return self._probe()
+
+    # -- background thread ---------------------------------------------------
+
+    def start(self):
+        """Probe in a daemon thread every INTERVAL seconds; once per process."""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop, name='health-probe', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            # Reuse or release the thread's connection the way a request would
+            # (CONN_MAX_AGE, CONN_HEALTH_CHECKS, pool)
+            close_old_connections()
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('Health probe crashed')
+            close_old_connections()
+            time.sleep(self.config['INTERVAL'])
+
+    # -- reporting -----------------------------------------------------------
+
+    def _needs_probe(self):
+        if self._result is None:
+            return True
+        running = self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+        return not running and time.monotonic() - self._result[0] >= self.config['INTERVAL']
+
+    def latest(self):
+        """(monotonic time, checks) of the last probe; probes inline only without the thread."""
+        if self._needs_probe():
+            with self._lock:
+                # Concurrent requests that queued here reuse the first one's probe
+                if self._needs_probe():
+                    self._probe()
+        return self._result
+
+    def report(self):
+        """(ready, body) for the readiness endpoint."""
+        probed_at, checks = self.latest()
+        age = time.monotonic() - probed_at
+        ready = age < self.config['STALE_AFTER'] and all(check['status'] == 'ok' for check in checks.values())
+
+        pools = {}
+        for alias, stats in pool_stats().items():
+            pools[alias] = {
+                'in_use': stats['in_use'],
+                'max_size': stats['max_size'],
+                'waiting': stats['waiting'],
+                'saturation': round(stats['in_use'] / stats['max_size'], 2),
+            }
+        return ready, {
+            'status': 'ready' if ready else 'unavailable',
+            'checks': checks,
+            'probe_age_seconds': round(age, 1),
+            'latency_ms': {name: percentiles(window) for name, window in list(self._latencies.items())},
+            'pools': pools,
+        }
+
+
+health_probe = HealthProbe()
+
+
+def _reload(setting, **kwargs):
+    if setting == 'HEALTH_CHECK':
+        health_probe.configure()
+
+
+setting_changed.connect(_reload)
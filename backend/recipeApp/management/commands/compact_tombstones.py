@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from recipeApp.changes import DEFAULT_BATCH_SIZE, compact_tombstones, get_config
+
+
+class Command(BaseCommand):
+    help = 'Delete sync feed tombstones older than the retention window in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help="Keep tombstones this many days (default: CHANGE_FEED's TOMBSTONE_RETENTION_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--every', type=int, default=0,
+                            help='Keep running and compact every N seconds (0 = run once)')
+
+    def handle(self, *args, **options):
+        while True:
+            days = options['retention_days']
+            retention = timedelta(days=get_config()['TOMBSTONE_RETENTION_DAYS'] if days is None else days)
+            start = time.perf_counter()
+            try:
+                deleted = compact_tombstones(retention, options['batch_size'], options['pause'])
+            except DatabaseError as exc:
+                if not options['every']:
+                    raise
+                # Keep the loop alive through a database outage; try again next round
+                self.stderr.write(f'Tombstone compaction failed: {exc}')
+                connection.close()
+            else:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(self.style.SUCCESS(f'Compacted {deleted} tombstones in {elapsed:.1f}s'))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
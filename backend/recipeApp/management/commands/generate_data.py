@@ -0,0 +1,53 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from recipeApp.synthetic import DEFAULT_CHUNK_SIZE, DEFAULT_PASSWORD, generate
+
+
+class Command(BaseCommand):
+    help = 'Generate deterministic synthetic users, recipes and grocery lists for benchmarks and capacity planning'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes-per-user', type=int, default=5, help='Average; actual counts vary per user')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--grocery-lists-per-user', type=int, default=2)
+        parser.add_argument('--items-per-list', type=int, default=10)
+        parser.add_argument('--share-ratio', type=float, default=0.1,
+                            help='Fraction of grocery lists shared with another user')
+        parser.add_argument('--public-ratio', type=float, default=0.7, help='Fraction of recipes that are public')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic', help='Usernames are <prefix>-0000000 onwards')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password for every generated user')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Users written per transaction')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Users named {options['prefix']}-* already exist; pick another --prefix")
+
+        start = time.perf_counter()
+
+        def progress(report):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{report.users}/{options["users"]} users, {report.recipes} recipes '
+                                  f'({time.perf_counter() - start:.0f}s)')
+
+        report = generate(
+            options['users'],
+            recipes_per_user=options['recipes_per_user'],
+            ingredients_per_recipe=options['ingredients_per_recipe'],
+            grocery_lists_per_user=options['grocery_lists_per_user'],
+            items_per_list=options['items_per_list'],
+            share_ratio=options['share_ratio'],
+            public_ratio=options['public_ratio'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - start
+        counts = ', '.join(f'{count} {name.replace("_", " ")}' for name, count in report.as_dict().items())
+        self.stdout.write(self.style.SUCCESS(f'Generated {counts} in {elapsed:.1f}s'))
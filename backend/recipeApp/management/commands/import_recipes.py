@@ -0,0 +1,37 @@
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from recipeApp.importer import DEFAULT_CHUNK_SIZE, import_recipes
+
+
+class Command(BaseCommand):
+    help = 'Stream recipes from an NDJSON file (one recipe per line) into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON file to import, or '-' for stdin")
+        parser.add_argument('--user', required=True, help='Username that will own the imported recipes')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist")
+
+        start = time.perf_counter()
+        if options['path'] == '-':
+            report = import_recipes(sys.stdin, user, chunk_size=options['chunk_size'])
+        else:
+            with open(options['path'], encoding='utf-8') as f:
+                report = import_recipes(f, user, chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - start
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        rate = report.created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.created} recipes ({report.failed} failed) in {elapsed:.1f}s, {rate:.0f} recipes/s'
+        ))
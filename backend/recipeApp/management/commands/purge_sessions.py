@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from recipeApp.sessions import DEFAULT_BATCH_SIZE, purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions from the database in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--every', type=int, default=0,
+                            help='Keep running and purge every N seconds (0 = run once)')
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            try:
+                deleted = purge_expired_sessions(options['batch_size'], options['pause'])
+            except DatabaseError as exc:
+                if not options['every']:
+                    raise
+                # Keep the loop alive through a database outage; try again next round
+                self.stderr.write(f'Session purge failed: {exc}')
+                connection.close()
+            else:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired sessions in {elapsed:.1f}s'))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
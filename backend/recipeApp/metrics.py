@@ -0,0 +1,186 @@
+"""
+Per-route request metrics in the Prometheus text format.
+
+MetricsMiddleware labels every request with its resolved route name
+(``recipe-list``, ``grocery-list-detail``, ...) and method, and records
+latency, SQL query count and time (from QueryBudgetMiddleware), time spent
+in serializers and response size. ``metrics_view`` serves them at
+/metrics, which nginx does not proxy: scrape the backend port directly.
+Only peers in METRICS['ALLOWED_NETWORKS'] (loopback by default) or
+requests carrying ``Authorization: Bearer <METRICS['TOKEN']>`` get an
+answer; everyone else gets 403.
+
+Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(set in gunicorn.conf.py) and /metrics adds up all workers, whichever one
+answers the scrape. Without that variable only the current process is
+reported.
+"""
+import hmac
+import ipaddress
+import os
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+LABELS = ('route', 'method')
+# Anything else is reported as OTHER, so clients can't mint new series
+METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+
+DEFAULTS = {
+    'ALLOWED_NETWORKS': ['127.0.0.1/32', '::1/128'],
+    'TOKEN': None,
+}
+
+REQUESTS = Counter(
+    'pantrytostore_http_requests', 'Requests served', [*LABELS, 'status'],
+)
+LATENCY = Histogram(
+    'pantrytostore_http_request_duration_seconds', 'Time to produce the response',
+    LABELS, buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'pantrytostore_http_request_db_queries', 'SQL queries per request',
+    LABELS, buckets=QUERY_BUCKETS,
+)
+DB_TIME = Histogram(
+    'pantrytostore_http_request_db_duration_seconds', 'Time spent in SQL per request',
+    LABELS, buckets=LATENCY_BUCKETS,
+)
+SERIALIZER_TIME = Histogram(
+    'pantrytostore_http_request_serializer_duration_seconds', 'Time spent in serializers per request',
+    LABELS, buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'pantrytostore_http_response_size_bytes', 'Response body size; streamed bodies are not counted',
+    LABELS, buckets=SIZE_BUCKETS,
+)
+
+class SerializerTimer:
+    """
+    Seconds spent in serializers for one request. MetricsMiddleware puts a
+    fresh one in ``serializer_timer`` and on the request; serializers add to
+    it in place, so time spent in a copied context (sync_to_async,
+    async_to_sync, a task) still reaches the request's total.
+    """
+    __slots__ = ('seconds',)
+
+    def __init__(self):
+        self.seconds = 0.0
+
+
+# The current request's SerializerTimer; None outside MetricsMiddleware
+serializer_timer = ContextVar('serializer_timer', default=None)
+
+
+def add_serializer_time(seconds):
+    timer = serializer_timer.get()
+    if timer is not None:
+        timer.seconds += seconds
+
+
+class TimedSerializerMixin:
+    """
+    Adds a serializer's to_representation time to the request's serializer
+    time. Use it on top-level serializers only; nested ones are already
+    inside their parent's measurement.
+    """
+
+    def to_representation(self, instance):
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            add_serializer_time(time.perf_counter() - start)
+
+
+class RouteMetrics:
+    """The labelled children for one route and method, bound once and reused."""
+    __slots__ = ('route', 'method', 'latency', 'db_queries', 'db_time', 'serializer_time', 'size', 'statuses')
+
+    def __init__(self, route, method):
+        self.route = route
+        self.method = method
+        self.latency = LATENCY.labels(route, method)
+        self.db_queries = DB_QUERIES.labels(route, method)
+        self.db_time = DB_TIME.labels(route, method)
+        self.serializer_time = SERIALIZER_TIME.labels(route, method)
+        self.size = RESPONSE_SIZE.labels(route, method)
+        self.statuses = {}
+
+    def observe(self, status, duration, query_stats, serializer_time, size):
+        counter = self.statuses.get(status)
+        if counter is None:
+            counter = self.statuses[status] = REQUESTS.labels(self.route, self.method, str(status))
+        counter.inc()
+        self.latency.observe(duration)
+        if query_stats is not None:
+            self.db_queries.observe(query_stats.count)
+            self.db_time.observe(query_stats.duration)
+        self.serializer_time.observe(serializer_time)
+        if size is not None:
+            self.size.observe(size)
+
+
+_routes = {}
+
+
+def route_metrics(route, method):
+    if method not in METHODS:
+        method = 'OTHER'
+    methods = _routes.get(route)
+    if methods is None:
+        methods = _routes[route] = {}
+    metrics = methods.get(method)
+    if metrics is None:
+        metrics = methods[method] = RouteMetrics(route, method)
+    return metrics
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    name = match.view_name
+    # The ASGI read views report under the same names as the viewsets they stand in for
+    return name[6:] if name.startswith('async-') else name
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+def scrape_allowed(request, config):
+    """A matching bearer token, or a direct connection from an allowed network."""
+    token = config['TOKEN']
+    if token:
+        scheme, _, given = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(given.encode(), token.encode()):
+            return True
+    # Relayed requests reach us from the proxy's address, which is usually
+    # loopback; only the token lets them through
+    if 'HTTP_X_FORWARDED_FOR' in request.META:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in config['ALLOWED_NETWORKS'])
+
+
+def metrics_view(request):
+    if not scrape_allowed(request, get_config()):
+        return HttpResponseForbidden()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
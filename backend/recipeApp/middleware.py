@@ -0,0 +1,146 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+from .metrics import SerializerTimer, route_metrics, route_name, serializer_timer
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    Database execute wrapper that counts queries and accumulates their time.
+
+    Usable on its own in tests or scripts:
+
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            ...
+        stats.count, stats.duration
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class QueryBudgetMiddleware:
+    """
+    Records SQL query count and time for every request.
+
+    Requests that go over QUERY_BUDGET['MAX_QUERIES'] are logged as warnings
+    so N+1 regressions show up in production logs. When
+    QUERY_BUDGET['HEADERS'] is on, the numbers are also returned as
+    X-Query-Count / X-Query-Time-Ms response headers.
+
+    Under ASGI the ORM runs in a separate thread per request, out of reach of
+    a wrapper installed here, so async requests pass through unmeasured
+    rather than forcing the whole chain onto one sync thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        budget = getattr(settings, 'QUERY_BUDGET', {})
+        self.max_queries = budget.get('MAX_QUERIES')
+        self.headers = budget.get('HEADERS', False)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+
+        request.query_stats = stats
+        if self.headers:
+            response['X-Query-Count'] = str(stats.count)
+            response['X-Query-Time-Ms'] = f'{stats.duration * 1000:.2f}'
+        if self.max_queries is not None and stats.count > self.max_queries:
+            logger.warning(
+                'Query budget exceeded: %s %s ran %d queries (budget %d) in %.2f ms',
+                request.method, request.path, stats.count, self.max_queries, stats.duration * 1000,
+            )
+        return response
+
+
+class AsyncRoutesMiddleware:
+    """
+    Resolve requests served through backend/asgi.py against
+    ASYNC_ROOT_URLCONF, which swaps in the async read views from
+    recipeApp.async_views. WSGI requests keep using ROOT_URLCONF.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.urlconf = getattr(settings, 'ASYNC_ROOT_URLCONF', None)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.urlconf:
+            request.urlconf = self.urlconf
+        return await self.get_response(request)
+
+
+class MetricsMiddleware:
+    """
+    Records per-route latency, SQL, serializer time and response size (see
+    recipeApp.metrics). Installed outermost so latency covers every other
+    middleware; SQL numbers come from QueryBudgetMiddleware further in.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        request.serializer_timer = SerializerTimer()
+        serializer_timer.set(request.serializer_timer)
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        request.serializer_timer = SerializerTimer()
+        serializer_timer.set(request.serializer_timer)
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, duration):
+        route_metrics(route_name(request), request.method).observe(
+            response.status_code,
+            duration,
+            getattr(request, 'query_stats', None),
+            request.serializer_timer.seconds,
+            None if response.streaming else len(response.content),
+        )
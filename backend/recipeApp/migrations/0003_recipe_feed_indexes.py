@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-18 10:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeApp', '0002_recipe_is_public'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['is_public', '-created_at', '-id'], name='recipe_public_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='recipe_owner_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,164 @@
+from django.db import migrations
+
+# Frozen copies of the names in recipeApp.search, so later edits there
+# can't change what this migration does.
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'recipeApp_recipe_fts'
+
+POSTGRES_VECTOR_SQL = f"""
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(%(recipe)s.title, '')), 'A') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+        SELECT string_agg(i.name, ' ') FROM "recipeApp_ingredient" i WHERE i.recipe_id = %(recipe)s.id
+    ), '')), 'B') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(%(recipe)s.description, '')), 'B') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(%(recipe)s.instructions, '')), 'C')
+"""
+
+POSTGRES_FORWARD = [
+    'ALTER TABLE "recipeApp_recipe" ADD COLUMN "search_vector" tsvector',
+    f'UPDATE "recipeApp_recipe" r SET "search_vector" = {POSTGRES_VECTOR_SQL % {"recipe": "r"}}',
+    'CREATE INDEX "recipe_search_vector_idx" ON "recipeApp_recipe" USING GIN ("search_vector")',
+    f"""
+    CREATE FUNCTION recipeapp_recipe_search_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {POSTGRES_VECTOR_SQL % {"recipe": "NEW"}};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recipe_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description, instructions ON "recipeApp_recipe"
+    FOR EACH ROW EXECUTE FUNCTION recipeapp_recipe_search_trigger()
+    """,
+    # Ingredient changes are handled per statement so a bulk_create of 50
+    # ingredients re-indexes the parent recipe once, not 50 times.
+    f"""
+    CREATE FUNCTION recipeapp_ingredient_search_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE "recipeApp_recipe" r SET search_vector = {POSTGRES_VECTOR_SQL % {"recipe": "r"}}
+            WHERE r.id IN (SELECT DISTINCT recipe_id FROM changed_new);
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE "recipeApp_recipe" r SET search_vector = {POSTGRES_VECTOR_SQL % {"recipe": "r"}}
+            WHERE r.id IN (SELECT DISTINCT recipe_id FROM changed_old);
+        ELSE
+            UPDATE "recipeApp_recipe" r SET search_vector = {POSTGRES_VECTOR_SQL % {"recipe": "r"}}
+            WHERE r.id IN (SELECT recipe_id FROM changed_new UNION SELECT recipe_id FROM changed_old);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER ingredient_search_insert AFTER INSERT ON "recipeApp_ingredient"
+    REFERENCING NEW TABLE AS changed_new
+    FOR EACH STATEMENT EXECUTE FUNCTION recipeapp_ingredient_search_trigger()
+    """,
+    """
+    CREATE TRIGGER ingredient_search_update AFTER UPDATE ON "recipeApp_ingredient"
+    REFERENCING NEW TABLE AS changed_new OLD TABLE AS changed_old
+    FOR EACH STATEMENT EXECUTE FUNCTION recipeapp_ingredient_search_trigger()
+    """,
+    """
+    CREATE TRIGGER ingredient_search_delete AFTER DELETE ON "recipeApp_ingredient"
+    REFERENCING OLD TABLE AS changed_old
+    FOR EACH STATEMENT EXECUTE FUNCTION recipeapp_ingredient_search_trigger()
+    """,
+]
+
+POSTGRES_REVERSE = [
+    'DROP TRIGGER IF EXISTS ingredient_search_delete ON "recipeApp_ingredient"',
+    'DROP TRIGGER IF EXISTS ingredient_search_update ON "recipeApp_ingredient"',
+    'DROP TRIGGER IF EXISTS ingredient_search_insert ON "recipeApp_ingredient"',
+    'DROP FUNCTION IF EXISTS recipeapp_ingredient_search_trigger()',
+    'DROP TRIGGER IF EXISTS recipe_search_vector_update ON "recipeApp_recipe"',
+    'DROP FUNCTION IF EXISTS recipeapp_recipe_search_trigger()',
+    'DROP INDEX IF EXISTS "recipe_search_vector_idx"',
+    'ALTER TABLE "recipeApp_recipe" DROP COLUMN IF EXISTS "search_vector"',
+]
+
+SQLITE_INGREDIENTS_SQL = (
+    "(SELECT coalesce(group_concat(name, ' '), '') FROM \"recipeApp_ingredient\" WHERE recipe_id = %s)"
+)
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5(
+        title, ingredients, instructions, description, tokenize = 'porter unicode61'
+    )
+    """,
+    f"""
+    INSERT INTO "{FTS_TABLE}" (rowid, title, ingredients, instructions, description)
+    SELECT r.id, r.title, {SQLITE_INGREDIENTS_SQL % 'r.id'}, r.instructions, r.description
+    FROM "recipeApp_recipe" r
+    """,
+    f"""
+    CREATE TRIGGER recipe_fts_insert AFTER INSERT ON "recipeApp_recipe" BEGIN
+        INSERT INTO "{FTS_TABLE}" (rowid, title, ingredients, instructions, description)
+        VALUES (new.id, new.title, '', new.instructions, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER recipe_fts_update AFTER UPDATE OF title, description, instructions ON "recipeApp_recipe" BEGIN
+        UPDATE "{FTS_TABLE}" SET title = new.title, instructions = new.instructions, description = new.description
+        WHERE rowid = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER recipe_fts_delete AFTER DELETE ON "recipeApp_recipe" BEGIN
+        DELETE FROM "{FTS_TABLE}" WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER ingredient_fts_insert AFTER INSERT ON "recipeApp_ingredient" BEGIN
+        UPDATE "{FTS_TABLE}" SET ingredients = {SQLITE_INGREDIENTS_SQL % 'new.recipe_id'}
+        WHERE rowid = new.recipe_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER ingredient_fts_update AFTER UPDATE OF name, recipe_id ON "recipeApp_ingredient" BEGIN
+        UPDATE "{FTS_TABLE}" SET ingredients = {SQLITE_INGREDIENTS_SQL % 'old.recipe_id'}
+        WHERE rowid = old.recipe_id;
+        UPDATE "{FTS_TABLE}" SET ingredients = {SQLITE_INGREDIENTS_SQL % 'new.recipe_id'}
+        WHERE rowid = new.recipe_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER ingredient_fts_delete AFTER DELETE ON "recipeApp_ingredient" BEGIN
+        UPDATE "{FTS_TABLE}" SET ingredients = {SQLITE_INGREDIENTS_SQL % 'old.recipe_id'}
+        WHERE rowid = old.recipe_id;
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS ingredient_fts_delete',
+    'DROP TRIGGER IF EXISTS ingredient_fts_update',
+    'DROP TRIGGER IF EXISTS ingredient_fts_insert',
+    'DROP TRIGGER IF EXISTS recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipe_fts_update',
+    'DROP TRIGGER IF EXISTS recipe_fts_insert',
+    f'DROP TABLE IF EXISTS "{FTS_TABLE}"',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeApp', '0003_recipe_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
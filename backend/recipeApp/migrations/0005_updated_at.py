@@ -0,0 +1,70 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+MODELS = ('Recipe', 'GroceryList')
+
+
+def add_updated_at(apps, schema_editor):
+    connection = schema_editor.connection
+    for name in MODELS:
+        model = apps.get_model('recipeApp', name)
+        field = model._meta.get_field('updated_at')
+        if connection.vendor == 'sqlite':
+            # AddField would rebuild the table on SQLite, which silently drops
+            # the full-text triggers created in 0004.
+            schema_editor.execute(
+                'ALTER TABLE %s ADD COLUMN %s datetime NOT NULL DEFAULT %s' % (
+                    schema_editor.quote_name(model._meta.db_table),
+                    schema_editor.quote_name(field.column),
+                    "'1970-01-01 00:00:00'",
+                )
+            )
+        else:
+            schema_editor.add_field(model, field)
+        model.objects.update(updated_at=F('created_at'))
+
+
+def remove_updated_at(apps, schema_editor):
+    connection = schema_editor.connection
+    for name in MODELS:
+        model = apps.get_model('recipeApp', name)
+        field = model._meta.get_field('updated_at')
+        if connection.vendor == 'sqlite':
+            # RemoveField would rebuild the table too (SQLite 3.35+ drops
+            # columns in place)
+            schema_editor.execute(
+                'ALTER TABLE %s DROP COLUMN %s' % (
+                    schema_editor.quote_name(model._meta.db_table),
+                    schema_editor.quote_name(field.column),
+                )
+            )
+        else:
+            schema_editor.remove_field(model, field)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeApp', '0004_recipe_search'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='recipe',
+                    name='updated_at',
+                    field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+                    preserve_default=False,
+                ),
+                migrations.AddField(
+                    model_name='grocerylist',
+                    name='updated_at',
+                    field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+                    preserve_default=False,
+                ),
+            ],
+        ),
+        migrations.RunPython(add_updated_at, remove_updated_at),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_shares(apps, schema_editor):
+    # Keep the most recent share of each (list, user) pair
+    SharedGroceryList = apps.get_model('recipeApp', 'SharedGroceryList')
+    keep = (
+        SharedGroceryList.objects.values('list', 'user')
+        .annotate(keep=Max('id'))
+        .values_list('keep', flat=True)
+    )
+    SharedGroceryList.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeApp', '0005_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_shares, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='sharedgrocerylist',
+            constraint=models.UniqueConstraint(fields=('list', 'user'), name='shared_grocery_list_unique_user'),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.0 on 2026-10-18 12:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+MODELS = ('Recipe', 'Ingredient', 'GroceryList', 'GroceryItem')
+
+
+def add_change_seq(apps, schema_editor):
+    # Existing rows keep change_seq 0: only a full sync (no since) returns them
+    connection = schema_editor.connection
+    for name in MODELS:
+        model = apps.get_model('recipeApp', name)
+        field = model._meta.get_field('change_seq')
+        if connection.vendor == 'sqlite':
+            # AddField would rebuild the table on SQLite, which silently drops
+            # the full-text triggers created in 0004.
+            schema_editor.execute(
+                'ALTER TABLE %s ADD COLUMN %s bigint NOT NULL DEFAULT 0' % (
+                    schema_editor.quote_name(model._meta.db_table),
+                    schema_editor.quote_name(field.column),
+                )
+            )
+        else:
+            schema_editor.add_field(model, field)
+
+
+def remove_change_seq(apps, schema_editor):
+    connection = schema_editor.connection
+    for name in MODELS:
+        model = apps.get_model('recipeApp', name)
+        field = model._meta.get_field('change_seq')
+        if connection.vendor == 'sqlite':
+            # RemoveField would rebuild the table too (SQLite 3.35+ drops
+            # columns in place)
+            schema_editor.execute(
+                'ALTER TABLE %s DROP COLUMN %s' % (
+                    schema_editor.quote_name(model._meta.db_table),
+                    schema_editor.quote_name(field.column),
+                )
+            )
+        else:
+            schema_editor.remove_field(model, field)
+
+
+def create_counter(apps, schema_editor):
+    apps.get_model('recipeApp', 'ChangeCounter').objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeApp', '0006_shared_grocery_list_unique_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+                ('compacted_through', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recipe', 'Recipe'), ('ingredient', 'Ingredient'), ('grocery_list', 'Grocery list'), ('grocery_item', 'Grocery item')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', 'change_seq'], name='tombstone_user_seq_idx'),
+                    models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+                ],
+            },
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name=name.lower(),
+                    name='change_seq',
+                    field=models.BigIntegerField(db_default=models.Value(0), default=0),
+                )
+                for name in MODELS
+            ],
+        ),
+        migrations.RunPython(add_change_seq, remove_change_seq),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['change_seq'], name='recipe_change_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['change_seq'], name='ingredient_change_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grocerylist',
+            index=models.Index(fields=['change_seq'], name='grocerylist_change_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groceryitem',
+            index=models.Index(fields=['change_seq'], name='groceryitem_change_seq_idx'),
+        ),
+    ]
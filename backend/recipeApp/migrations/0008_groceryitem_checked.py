@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeApp', '0007_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groceryitem',
+            name='checked',
+            field=models.BooleanField(db_default=models.Value(False), default=False),
+        ),
+    ]
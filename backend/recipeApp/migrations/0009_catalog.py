@@ -0,0 +1,50 @@
+# Generated by Django 5.0 on 2026-10-18 12:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeApp', '0008_groceryitem_checked'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CanonicalUnit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+        # Nullable columns without a default: SQLite adds them with ALTER TABLE
+        # instead of rebuilding the table, so 0004's full-text triggers stay.
+        migrations.AddField(
+            model_name='groceryitem',
+            name='canonical',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='recipeApp.canonicalingredient'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='canonical',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='recipeApp.canonicalingredient'),
+        ),
+        migrations.AddField(
+            model_name='groceryitem',
+            name='canonical_unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='recipeApp.canonicalunit'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='canonical_unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='recipeApp.canonicalunit'),
+        ),
+    ]
@@ -0,0 +1,135 @@
+import re
+
+from django.db import migrations, transaction
+
+# Frozen copies of the normalizers in recipeApp.catalog (and the pantry and
+# units helpers they build on) as they were when the catalog was added, so
+# later edits there can't change what this migration does.
+ALIASES = {
+    'all purpose flour': 'flour',
+    'ap flour': 'flour',
+    'plain flour': 'flour',
+    'white flour': 'flour',
+    'granulated sugar': 'sugar',
+    'white sugar': 'sugar',
+    'table salt': 'salt',
+    'large egg': 'egg',
+    'garlic clove': 'garlic',
+    'scallion': 'green onion',
+    'spring onion': 'green onion',
+    'coriander leaf': 'cilantro',
+    'courgette': 'zucchini',
+    'aubergine': 'eggplant',
+    'garbanzo bean': 'chickpea',
+}
+
+# Every spelling of each known unit, the catalog name first
+UNIT_SPELLINGS = [
+    ['ml', 'milliliter', 'millilitre', 'cc'],
+    ['cl', 'centiliter', 'centilitre'],
+    ['dl', 'deciliter', 'decilitre'],
+    ['l', 'liter', 'litre'],
+    ['tsp', 'teaspoon'],
+    ['tbsp', 'tbs', 'tbl', 'tablespoon'],
+    ['fl oz', 'floz', 'fluid ounce'],
+    ['cup'],
+    ['pint', 'pt'],
+    ['quart', 'qt'],
+    ['gallon', 'gal'],
+    ['mg', 'milligram', 'milligramme'],
+    ['g', 'gr', 'gram', 'gramme'],
+    ['kg', 'kilogram', 'kilogramme', 'kilo'],
+    ['oz', 'ounce'],
+    ['lb', 'pound'],
+]
+UNIT_ALIASES = {alias: spellings[0] for spellings in UNIT_SPELLINGS for alias in spellings}
+
+NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+UNIT_CLEAN_RE = re.compile(r'[.\s]+')
+
+
+def singular(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us')):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name):
+    return ' '.join(singular(word) for word in NON_WORD_RE.sub(' ', name.casefold()).split())
+
+
+def canonical_ingredient_name(name):
+    name = normalize_name(name)
+    return ALIASES.get(name, name)
+
+
+def canonical_unit_name(unit):
+    unit = UNIT_CLEAN_RE.sub(' ', unit.strip().lower()).strip()
+    if unit == 'lbs':
+        unit = 'lb'
+    elif unit not in UNIT_ALIASES:
+        unit = normalize_name(unit)
+    return UNIT_ALIASES.get(unit, unit)
+
+
+MODELS = ('Ingredient', 'GroceryItem')
+# Also keeps every name__in below SQLite's parameter limit
+BATCH_SIZE = 500
+
+
+def catalog_ids(model, keys, known):
+    """Create the catalog entries ``known`` lacks and add their ids to it."""
+    missing = sorted({key for key in keys if key and key not in known})
+    if missing:
+        model.objects.bulk_create([model(name=key) for key in missing], ignore_conflicts=True)
+        known.update(model.objects.filter(name__in=missing).values_list('name', 'pk'))
+
+
+def link_rows(apps, schema_editor):
+    """
+    Point existing rows at their catalog entries, one committed batch at a
+    time: a run that stops part way keeps what it linked, and the next run
+    starts with the rows still unlinked. On Postgres each batch re-indexes
+    the recipes it touches once (0004's ingredient trigger runs per
+    statement).
+    """
+    CanonicalIngredient = apps.get_model('recipeApp', 'CanonicalIngredient')
+    CanonicalUnit = apps.get_model('recipeApp', 'CanonicalUnit')
+    ingredient_ids, unit_ids = {}, {}
+    for name in MODELS:
+        model = apps.get_model('recipeApp', name)
+        last = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    model.objects.filter(pk__gt=last, canonical__isnull=True)
+                    .only('pk', 'name', 'unit').order_by('pk')[:BATCH_SIZE]
+                )
+                if not rows:
+                    break
+                names = {row.pk: canonical_ingredient_name(row.name) for row in rows}
+                units = {row.pk: canonical_unit_name(row.unit) for row in rows}
+                catalog_ids(CanonicalIngredient, names.values(), ingredient_ids)
+                catalog_ids(CanonicalUnit, units.values(), unit_ids)
+                for row in rows:
+                    row.canonical_id = ingredient_ids.get(names[row.pk])
+                    row.canonical_unit_id = unit_ids.get(units[row.pk])
+                model.objects.bulk_update(rows, ['canonical', 'canonical_unit'])
+            last = rows[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('recipeApp', '0009_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    apps.get_model('recipeApp', 'PantryIndexVersion').objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeApp', '0010_catalog_backfill'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PantryIndexVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,95 @@
+from django.db import migrations
+
+# Postgres only: change_seq numbers come from a sequence instead of
+# ChangeCounter's row (see recipeApp.changes), which keeps compacted_through.
+SEQUENCE = 'recipeapp_change_seq'
+COUNTER_TABLE = 'recipeApp_changecounter'
+
+# Advisory lock spaces (the first key of pg_advisory_lock(int, int)). Each
+# writer holds (IN_FLIGHT, low 32 bits of its change_seq) until it commits
+# or rolls back; GATE keeps a writer from being between nextval() and that
+# lock while a reader computes the watermark.
+IN_FLIGHT = 72746610
+GATE = 72746611
+
+POSTGRES_FUNCTIONS = [
+    f"""
+    CREATE FUNCTION recipeapp_next_change_seq() RETURNS bigint AS $$
+    DECLARE
+        seq bigint;
+    BEGIN
+        PERFORM pg_advisory_lock_shared({GATE}, 0);
+        BEGIN
+            seq := nextval('{SEQUENCE}');
+            PERFORM pg_advisory_xact_lock({IN_FLIGHT}, seq::bit(32)::integer);
+        EXCEPTION WHEN OTHERS OR QUERY_CANCELED THEN
+            PERFORM pg_advisory_unlock_shared({GATE}, 0);
+            RAISE;
+        END;
+        PERFORM pg_advisory_unlock_shared({GATE}, 0);
+        RETURN seq;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # The highest change_seq at or below which no transaction is still in
+    # flight. In-flight numbers are rebuilt from the low 32 bits in
+    # pg_locks.objid; all of them are within 2^32 of the last one handed out.
+    f"""
+    CREATE FUNCTION recipeapp_change_watermark() RETURNS bigint AS $$
+    DECLARE
+        last bigint;
+        oldest bigint;
+    BEGIN
+        PERFORM pg_advisory_lock({GATE}, 0);
+        BEGIN
+            SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END INTO last FROM {SEQUENCE};
+            SELECT min(last - ((last - objid::bigint) & 4294967295)) INTO oldest FROM pg_locks
+            WHERE locktype = 'advisory' AND classid = {IN_FLIGHT}::oid AND objsubid = 2 AND granted
+              AND database = (SELECT oid FROM pg_database WHERE datname = current_database());
+        EXCEPTION WHEN OTHERS OR QUERY_CANCELED THEN
+            PERFORM pg_advisory_unlock({GATE}, 0);
+            RAISE;
+        END;
+        PERFORM pg_advisory_unlock({GATE}, 0);
+        RETURN least(last, oldest - 1);
+    END
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # Lock the counter so no write takes a number between reading it and the switch
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT value FROM "{COUNTER_TABLE}" WHERE id = 1 FOR UPDATE')
+        row = cursor.fetchone()
+    start = (row[0] if row else 0) + 1
+    schema_editor.execute(f'CREATE SEQUENCE {SEQUENCE} START WITH {start}', params=None)
+    for sql in POSTGRES_FUNCTIONS:
+        schema_editor.execute(sql, params=None)
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'UPDATE "{COUNTER_TABLE}" SET value = '
+        f'(SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM {SEQUENCE}) WHERE id = 1',
+        params=None,
+    )
+    schema_editor.execute('DROP FUNCTION IF EXISTS recipeapp_change_watermark()', params=None)
+    schema_editor.execute('DROP FUNCTION IF EXISTS recipeapp_next_change_seq()', params=None)
+    schema_editor.execute(f'DROP SEQUENCE IF EXISTS {SEQUENCE}', params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeApp', '0011_pantry_index_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
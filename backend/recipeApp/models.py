@@ -7,26 +7,102 @@ class Recipe(models.Model):
     instructions = models.TextField()
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recipes')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save, including nested ingredient edits (the serializer
+    # saves the recipe too); drives ETag / Last-Modified
+    updated_at = models.DateTimeField(auto_now=True)
     is_public = models.BooleanField(default=False)  # False = private, True = public
+    # Set by every write; drives the sync feed (see changes.py)
+    change_seq = models.BigIntegerField(default=0, db_default=0)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination over the public feed and "my recipes"
+            models.Index(fields=['is_public', '-created_at', '-id'], name='recipe_public_feed_idx'),
+            models.Index(fields=['created_by', '-created_at', '-id'], name='recipe_owner_feed_idx'),
+            models.Index(fields=['change_seq'], name='recipe_change_seq_idx'),
+        ]
+
+class CanonicalIngredient(models.Model):
+    """One entry per normalized ingredient name (see catalog.py)."""
+    name = models.CharField(max_length=255, unique=True)
+
+class CanonicalUnit(models.Model):
+    """One entry per normalized unit name (see catalog.py)."""
+    name = models.CharField(max_length=50, unique=True)
 
 class Ingredient(models.Model):
+    # As the user typed them; canonical / canonical_unit are what they mean
     name = models.CharField(max_length=255)
     unit = models.CharField(max_length=50)  # e.g., grams, cups
     quantity = models.FloatField()
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ingredients')
+    # Null until backfilled, and for names that normalize to nothing
+    canonical = models.ForeignKey(CanonicalIngredient, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
+    canonical_unit = models.ForeignKey(CanonicalUnit, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
+    change_seq = models.BigIntegerField(default=0, db_default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['change_seq'], name='ingredient_change_seq_idx')]
 
 class GroceryList(models.Model):
     name = models.CharField(max_length=255)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='grocery_lists')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    change_seq = models.BigIntegerField(default=0, db_default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['change_seq'], name='grocerylist_change_seq_idx')]
 
 class GroceryItem(models.Model):
     name = models.CharField(max_length=255)
     unit = models.CharField(max_length=50)  # e.g., grams, cups
     quantity = models.FloatField()
     grocery_list = models.ForeignKey(GroceryList, on_delete=models.CASCADE, related_name='items')
+    canonical = models.ForeignKey(CanonicalIngredient, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
+    canonical_unit = models.ForeignKey(CanonicalUnit, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
+    checked = models.BooleanField(default=False, db_default=False)  # ticked off while shopping
+    change_seq = models.BigIntegerField(default=0, db_default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['change_seq'], name='groceryitem_change_seq_idx')]
 
 class SharedGroceryList(models.Model):
     list = models.ForeignKey(GroceryList, on_delete=models.CASCADE, related_name='shared_with')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='shared_lists')
     permissions = models.CharField(max_length=10, choices=[('edit', 'Edit'), ('view', 'View')])
+
+    class Meta:
+        constraints = [
+            # One share per user and list; sharing again changes its permissions
+            models.UniqueConstraint(fields=['list', 'user'], name='shared_grocery_list_unique_user'),
+        ]
+
+class ChangeCounter(models.Model):
+    """A single row: how far tombstones have been compacted, and on SQLite the last change_seq handed out."""
+    value = models.BigIntegerField(default=0)
+    compacted_through = models.BigIntegerField(default=0)
+
+class PantryIndexVersion(models.Model):
+    """A single row: the last version handed out to the pantry index change log (see pantry.py)."""
+    value = models.BigIntegerField(default=0)
+
+class Tombstone(models.Model):
+    """A deleted row, kept for one user's sync feed until compacted."""
+    KINDS = [
+        ('recipe', 'Recipe'),
+        ('ingredient', 'Ingredient'),
+        ('grocery_list', 'Grocery list'),
+        ('grocery_item', 'Grocery item'),
+    ]
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_seq'], name='tombstone_user_seq_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
@@ -0,0 +1,69 @@
+"""
+Diff-based writes for nested child rows (recipe ingredients, grocery items).
+"""
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+
+def create_children(model, parent_field, parent, rows, values=None):
+    """
+    Insert all child rows for a new parent with a single bulk_create.
+    ``values`` (such as change_seq) are set on every row.
+    """
+    return model.objects.bulk_create(
+        model(**{parent_field: parent}, **{k: v for k, v in row.items() if k != 'id'}, **(values or {}))
+        for row in rows
+    )
+
+
+def sync_children(model, parent_field, parent, existing, rows, fields, values=None, derived=()):
+    """
+    Reconcile a parent's children with the rows sent by the client.
+
+    Rows are matched to ``existing`` children by ``id``: matched rows whose
+    values differ are written with one bulk_update, rows without an id are
+    inserted with one bulk_create, and children that weren't sent are removed
+    with one DELETE. Unchanged rows cost nothing, and surviving rows keep
+    their primary keys. ``values`` (such as change_seq) are set on every row
+    that is inserted or updated. ``derived`` fields (such as catalog ids) are
+    copied from the row along with a change, but never count as one.
+    """
+    values = values or {}
+    existing = {child.pk: child for child in existing}
+    seen = set()
+    to_create = []
+    to_update = []
+    for index, row in enumerate(rows):
+        pk = row.get('id')
+        if pk is None:
+            to_create.append(model(**{parent_field: parent}, **{f: row[f] for f in [*fields, *derived] if f in row}, **values))
+            continue
+
+        child = existing.get(pk)
+        if child is None or pk in seen:
+            raise ValidationError({'id': [f'Row {index}: unknown or duplicate id {pk}.']})
+        seen.add(pk)
+
+        changed = False
+        for field in fields:
+            if field in row and getattr(child, field) != row[field]:
+                setattr(child, field, row[field])
+                changed = True
+        if changed:
+            for field in derived:
+                if field in row:
+                    setattr(child, field, row[field])
+            for field, value in values.items():
+                setattr(child, field, value)
+            to_update.append(child)
+
+    removed = [pk for pk in existing if pk not in seen]
+    # Callers already hold a transaction; don't pay for a savepoint here
+    with transaction.atomic(savepoint=False):
+        if removed:
+            model.objects.filter(pk__in=removed).delete()
+        if to_update:
+            model.objects.bulk_update(to_update, [*fields, *derived, *values])
+        if to_create:
+            model.objects.bulk_create(to_create)
+    return to_create, to_update, removed
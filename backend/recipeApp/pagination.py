@@ -0,0 +1,180 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class PageSizeMixin:
+    """Lets clients pick ?page_size=, capped at max_page_size."""
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+
+class RecipeCursorPagination(PageSizeMixin, BasePagination):
+    """
+    Opt-in keyset pagination over (created_at, id), newest first.
+
+    Pagination only kicks in when the client sends ?cursor= or ?page_size=,
+    so existing clients that expect a plain list keep working. Each page is
+    a range scan on the composite (…, -created_at, -id) indexes, so the cost
+    of a page does not depend on how deep the client has paged.
+    """
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.finish_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async counterpart of paginate_queryset for the ASGI read views."""
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.finish_page([obj async for obj in queryset])
+
+    def page_queryset(self, queryset, request):
+        """The (unevaluated) slice for the requested page, or None when not paginating."""
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            # Written as a bounded range plus tie-breaker so the planner can
+            # seek straight into the index instead of OR-ing two scans.
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk)
+            )
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, results):
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_position = (results[-1].created_at, results[-1].pk) if self.has_next else None
+        return results
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, position):
+        created_at, pk = position
+        raw = f'{created_at.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii')
+            timestamp, pk = raw.rsplit('|', 1)
+            created_at = parse_datetime(timestamp)
+            pk = int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+
+class RecipeSearchPagination(PageSizeMixin, BasePagination):
+    """
+    Page-number pagination for ranked search results.
+
+    Relevance order has no stable keyset, so this pages by offset but never
+    runs COUNT(*): it fetches one extra row to decide whether there is a
+    next page.
+    """
+    page_query_param = 'page'
+    max_page = 50
+    invalid_page_message = 'Invalid page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        try:
+            self.page = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        if not 1 <= self.page <= self.max_page:
+            raise NotFound(self.invalid_page_message)
+
+        offset = (self.page - 1) * self.page_size
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.has_next = len(results) > self.page_size and self.page < self.max_page
+        return results[:self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page + 1)
+
+    def get_previous_link(self):
+        if self.page <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page - 1)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,394 @@
+"""
+"What can I cook with my pantry" matching.
+
+Every worker keeps an in-memory inverted index from catalog ingredient id
+(see catalog.py) to the recipes that use it, so "Tomatoes" and "tomato", or
+"plain flour" and "flour", are one term. Postings are compact ``array('I')`` lists of
+dense recipe slots; terms that appear in many recipes also keep a bitset
+(a plain Python int), so a common ingredient like salt costs one big-int
+operation instead of a loop over its postings.
+
+Coverage is counted with a bit-sliced counter: each pantry term's bitset is
+added into a handful of bit planes, so after N terms plane ``i`` holds bit
+``i`` of "how many pantry items does this recipe use" for every recipe at
+once. Ranking then walks (matched, total) buckets in coverage order and only
+decodes as many slots as the page needs.
+
+Writes don't touch the index directly. RecipeSerializer records the changed
+recipe id in a change log in the shared cache after the transaction commits,
+numbered by the PantryIndexVersion row (one atomic UPDATE per write, so two
+workers never claim the same number, whatever the cache backend). Each
+worker replays that log (reloading just those recipes) before its next
+match. A worker that has fallen too far behind rebuilds from scratch in a
+background thread and keeps answering from its old index until the new one
+is swapped in; only a worker with no index at all waits for a build, and
+gunicorn's post_fork starts that build before the first request arrives.
+"""
+import heapq
+import logging
+import re
+import threading
+from array import array
+
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+
+from .models import Recipe, Ingredient, PantryIndexVersion
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+CHANGE_KEY = 'pantry-index:change:%d'
+CHANGE_TIMEOUT = 60 * 60
+MAX_REPLAY = 1000
+# Terms used by more than 1/64 of recipes keep a bitset next to their postings
+DENSE_RATIO = 64
+
+_NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def _singular(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us')):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient_name(name):
+    """Lowercase, strip punctuation and naive plurals: " Tomatoes, " -> "tomato"."""
+    words = _NON_WORD_RE.sub(' ', name.casefold()).split()
+    return ' '.join(_singular(word) for word in words)
+
+
+def _bits_from_slots(slots, size):
+    buf = bytearray((size + 7) // 8)
+    for slot in slots:
+        buf[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _add_to_counter(planes, bits):
+    """Add a 0/1-per-recipe bitset into a bit-sliced counter, in place."""
+    carry = bits
+    for i, plane in enumerate(planes):
+        if not carry:
+            return
+        planes[i] = plane ^ carry
+        carry = plane & carry
+    if carry:
+        planes.append(carry)
+
+
+def _slots_from_bits(bits):
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield index * 8 + low.bit_length() - 1
+            byte ^= low
+
+
+def _counter_equals(planes, value, universe):
+    """Bitset of recipes whose counter equals ``value``."""
+    if value >> len(planes):
+        return 0
+    result = universe
+    for i, plane in enumerate(planes):
+        result &= plane if (value >> i) & 1 else ~plane
+    return result
+
+
+class PantryIndex:
+
+    # Everything build() replaces when it swaps a fresh index in
+    STATE = ('version', 'term_ids', 'postings', 'dense', 'slot_of', 'recipe_ids', 'slot_terms', 'free_slots', 'sizes', 'public')
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Held for the whole of a build, so a process runs one at a time
+        self._building = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.version = None
+            self.term_ids = {}
+            self.postings = []          # term id -> array('I') of slots
+            self.dense = {}             # term id -> bitset, for common terms
+            self.slot_of = {}           # recipe id -> slot
+            self.recipe_ids = array('q')  # slot -> recipe id (0 = free)
+            self.slot_terms = []        # slot -> array('I') of term ids
+            self.free_slots = []
+            self.sizes = {}             # distinct term count -> bitset of slots
+            self.public = 0
+
+    # -- maintenance ---------------------------------------------------------
+
+    def build(self):
+        """Load every recipe into a fresh index and swap it in; matches use the old one meanwhile."""
+        fresh = PantryIndex()
+        fresh._load_all(current_version())
+        with self._lock:
+            for name in self.STATE:
+                setattr(self, name, getattr(fresh, name))
+
+    def _load_all(self, version):
+        ingredients = {}
+        rows = Ingredient.objects.filter(canonical__isnull=False).values_list('recipe_id', 'canonical_id')
+        for recipe_id, canonical_id in rows.iterator(chunk_size=10000):
+            ingredients.setdefault(recipe_id, []).append(canonical_id)
+        public = set(Recipe.objects.filter(is_public=True).values_list('id', flat=True).iterator(chunk_size=10000))
+
+        # Collect slots first and turn them into bitsets once at the end;
+        # OR-ing bits in one at a time would copy every bitset per recipe.
+        size_slots = {}
+        public_slots = array('I')
+        for recipe_id in sorted(ingredients):
+            slot, terms = self._place(recipe_id, ingredients[recipe_id])
+            size_slots.setdefault(len(terms), array('I')).append(slot)
+            if recipe_id in public:
+                public_slots.append(slot)
+        size = len(self.recipe_ids)
+        self.sizes = {total: _bits_from_slots(slots, size) for total, slots in size_slots.items()}
+        self.public = _bits_from_slots(public_slots, size)
+        self._rebuild_dense()
+        self.version = version
+
+    def start(self):
+        """Build in a daemon thread if there is no index yet (gunicorn's post_fork calls this)."""
+        if self.version is None:
+            self._build_in_background()
+
+    def _build_in_background(self):
+        if not self._building.acquire(blocking=False):
+            return
+        threading.Thread(target=self._background_build, name='pantry-index-build', daemon=True).start()
+
+    def _background_build(self):
+        try:
+            self.build()
+        except Exception:
+            # The next sync tries again
+            logger.exception('Pantry index build failed')
+        finally:
+            self._building.release()
+            connections.close_all()
+
+    def sync(self):
+        """Bring this worker's index up to date with the shared change log."""
+        current = current_version()
+        if self.version is None:
+            # Nothing to answer from yet: wait for the build already running, or run one
+            with self._building:
+                if self.version is None:
+                    self.build()
+            return
+
+        version = self.version
+        if current == version:
+            return
+        if version < current <= version + MAX_REPLAY:
+            keys = [CHANGE_KEY % v for v in range(version + 1, current + 1)]
+            changes = cache.get_many(keys)
+            if len(changes) == len(keys):
+                self.reload(set(changes.values()), version, current)
+                return
+        # Too far behind, a change log entry has expired, or the counter went
+        # backwards (a restored database): start over, without blocking
+        self._build_in_background()
+
+    def reload(self, recipe_ids, since=None, until=None):
+        """
+        Re-index ``recipe_ids``. With ``since``/``until``, they are the
+        changes between those versions and are only applied if the index is
+        still at ``since``; a concurrent sync or build may have got there first.
+        """
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = Ingredient.objects.filter(recipe_id__in=recipe_ids, canonical__isnull=False)
+        for recipe_id, canonical_id in rows.values_list('recipe_id', 'canonical_id'):
+            ingredients[recipe_id].append(canonical_id)
+        public = dict(Recipe.objects.filter(id__in=recipe_ids).values_list('id', 'is_public'))
+
+        with self._lock:
+            if since is not None:
+                if self.version != since:
+                    return
+                self.version = until
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+                if recipe_id in public and ingredients[recipe_id]:
+                    self._add(recipe_id, ingredients[recipe_id], public[recipe_id])
+
+    def _term_id(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = self.term_ids[term] = len(self.postings)
+            self.postings.append(array('I'))
+        return term_id
+
+    def _place(self, recipe_id, canonical_ids):
+        """Give a recipe a slot and add it to the postings lists."""
+        terms = array('I', sorted({self._term_id(canonical_id) for canonical_id in canonical_ids}))
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.recipe_ids[slot] = recipe_id
+            self.slot_terms[slot] = terms
+        else:
+            slot = len(self.recipe_ids)
+            self.recipe_ids.append(recipe_id)
+            self.slot_terms.append(terms)
+        self.slot_of[recipe_id] = slot
+        for term_id in terms:
+            self.postings[term_id].append(slot)
+        return slot, terms
+
+    def _add(self, recipe_id, canonical_ids, is_public):
+        slot, terms = self._place(recipe_id, canonical_ids)
+        bit = 1 << slot
+        for term_id in terms:
+            if term_id in self.dense:
+                self.dense[term_id] |= bit
+        self.sizes[len(terms)] = self.sizes.get(len(terms), 0) | bit
+        if is_public:
+            self.public |= bit
+
+    def _remove(self, recipe_id):
+        slot = self.slot_of.pop(recipe_id, None)
+        if slot is None:
+            return
+        terms = self.slot_terms[slot]
+        bit = 1 << slot
+        for term_id in terms:
+            self.postings[term_id].remove(slot)
+            if term_id in self.dense:
+                self.dense[term_id] &= ~bit
+        self.sizes[len(terms)] &= ~bit
+        self.public &= ~bit
+        self.recipe_ids[slot] = 0
+        self.slot_terms[slot] = None
+        self.free_slots.append(slot)
+
+    def _rebuild_dense(self):
+        threshold = max(len(self.recipe_ids) // DENSE_RATIO, 1)
+        self.dense = {
+            term_id: _bits_from_slots(slots, len(self.recipe_ids))
+            for term_id, slots in enumerate(self.postings)
+            if len(slots) >= threshold
+        }
+
+    def _term_bits(self, term_id):
+        bits = self.dense.get(term_id)
+        if bits is None:
+            bits = _bits_from_slots(self.postings[term_id], len(self.recipe_ids))
+        return bits
+
+    # -- matching ------------------------------------------------------------
+
+    def match(self, pantry, own_recipe_ids=(), limit=20, offset=0, min_coverage=0.0):
+        """
+        Rank recipes by the fraction of their ingredients found in ``pantry``
+        (catalog ingredient ids).
+
+        Returns ``[(recipe_id, matched, total), ...]`` ordered by coverage,
+        then by number of matched ingredients, then newest first. Only public
+        recipes and ``own_recipe_ids`` are considered.
+        """
+        with self._lock:
+            term_ids = {self.term_ids[term] for term in pantry if term in self.term_ids}
+            allowed = self.public
+            for recipe_id in own_recipe_ids:
+                slot = self.slot_of.get(recipe_id)
+                if slot is not None:
+                    allowed |= 1 << slot
+
+            planes = []
+            universe = 0
+            for term_id in term_ids:
+                bits = self._term_bits(term_id) & allowed
+                universe |= bits
+                _add_to_counter(planes, bits)
+
+            buckets = sorted(
+                ((matched, total) for total in self.sizes if total
+                 for matched in range(1, min(total, len(term_ids)) + 1)
+                 if matched / total >= min_coverage),
+                key=lambda bucket: (-bucket[0] / bucket[1], -bucket[0]),
+            )
+
+            results = []
+            wanted = offset + limit
+            equals = {}
+            for matched, total in buckets:
+                if matched not in equals:
+                    equals[matched] = _counter_equals(planes, matched, universe)
+                hits = equals[matched] & self.sizes[total]
+                if hits:
+                    # Newest (highest id) first within a bucket. Slots say
+                    # nothing about age: deleted recipes' slots are reused.
+                    newest = heapq.nlargest(wanted - len(results), map(self.recipe_ids.__getitem__, _slots_from_bits(hits)))
+                    results.extend((recipe_id, matched, total) for recipe_id in newest)
+                if len(results) >= wanted:
+                    break
+            return results[offset:]
+
+
+pantry_index = PantryIndex()
+
+
+def current_version():
+    """The last version handed out to the change log."""
+    return PantryIndexVersion.objects.filter(pk=1).values_list('value', flat=True).first() or 0
+
+
+def _reserve_versions(count):
+    """Claim ``count`` consecutive versions and return the last one."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {quote(PantryIndexVersion._meta.db_table)} SET {quote("value")} = {quote("value")} + %s '
+            f'WHERE {quote("id")} = 1 RETURNING {quote("value")}',
+            [count],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        # The row migration 0011 created is gone (a flushed test database)
+        PantryIndexVersion.objects.create(pk=1, value=count)
+        return count
+    return row[0]
+
+
+def _publish_changes(recipe_ids):
+    if len(recipe_ids) > MAX_REPLAY:
+        # Too many to replay one by one; jump the version so every worker rebuilds
+        _reserve_versions(MAX_REPLAY + 1)
+        return
+    last = _reserve_versions(len(recipe_ids))
+    first = last - len(recipe_ids) + 1
+    cache.set_many(
+        {CHANGE_KEY % version: recipe_id for version, recipe_id in zip(range(first, last + 1), recipe_ids)},
+        timeout=CHANGE_TIMEOUT,
+    )
+
+
+def recipe_changed(recipe_id):
+    """Queue a recipe for re-indexing once the current transaction commits."""
+    recipes_changed([recipe_id])
+
+
+def recipes_changed(recipe_ids):
+    """Re-index these recipes and expire their cached responses once the transaction commits."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: _publish_changes(recipe_ids))
+        transaction.on_commit(lambda: response_cache.invalidate_recipes(recipe_ids))
+
+
+def match_pantry(pantry, user=None, limit=20, offset=0, min_coverage=0.0):
+    pantry_index.sync()
+    own = ()
+    if user is not None and user.is_authenticated:
+        own = Recipe.objects.filter(created_by=user, is_public=False).values_list('id', flat=True)
+    return pantry_index.match(pantry, own, limit=limit, offset=offset, min_coverage=min_coverage)
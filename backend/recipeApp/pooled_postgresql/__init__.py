@@ -0,0 +1,154 @@
+"""
+PostgreSQL backend that borrows connections from a psycopg 3 pool.
+
+Django 5.0 either opens a connection per request or keeps one per thread
+(CONN_MAX_AGE). With ENGINE = 'recipeApp.pooled_postgresql' and
+OPTIONS['pool'] set, each process instead keeps one psycopg_pool
+ConnectionPool per alias: a request checks a connection out when it first
+touches the database and hands it back when Django closes it. The OPTIONS
+layout is the one Django 5.1 adopted for its built-in pool, so moving to
+that is a one-line ENGINE change.
+
+This module stays importable without psycopg: settings use it to validate
+the pool configuration, and health checks and metrics read pool_stats().
+"""
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# alias -> psycopg_pool.ConnectionPool, filled in lazily by base.DatabaseWrapper
+pools = {}
+
+
+class PoolMetrics:
+    """Checkout counters for one pool, updated from every request thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def record_timeout(self, waited):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_seconds += waited
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': self.wait_seconds,
+                'max_wait_seconds': self.max_wait_seconds,
+            }
+
+
+metrics = {}
+
+
+def get_metrics(alias):
+    return metrics.setdefault(alias, PoolMetrics())
+
+
+def pool_stats():
+    """
+    Snapshot of every pool opened by this process, keyed by alias: size
+    limits, connections in use and idle, waiting requests and checkout
+    wait times.
+    """
+    result = {}
+    for alias, pool in list(pools.items()):
+        stats = pool.get_stats()
+        size = stats.get('pool_size', 0)
+        available = stats.get('pool_available', 0)
+        result[alias] = {
+            'min_size': pool.min_size,
+            'max_size': pool.max_size,
+            'size': size,
+            'in_use': size - available,
+            'idle': available,
+            'waiting': stats.get('requests_waiting', 0),
+            **get_metrics(alias).as_dict(),
+        }
+    return result
+
+
+def discard_pools():
+    """Forget pools inherited from a parent process without touching their sockets."""
+    pools.clear()
+    metrics.clear()
+
+
+def _env_number(environ, name, default, cast):
+    value = environ.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ImproperlyConfigured(f'{name} must be a number, got {value!r}.')
+
+
+def pool_options(environ, threads):
+    """
+    Build OPTIONS['pool'] from DB_POOL_* variables, or return None when
+    pooling is off (DB_POOL unset or "0"). ``threads`` is the number of
+    request threads per process and sizes the pool by default.
+
+    Raises ImproperlyConfigured for values the pool would reject or that
+    can't work together, so a bad deploy stops at startup instead of
+    failing its first requests.
+    """
+    if environ.get('DB_POOL', '0').lower() in ('0', 'false', 'no', ''):
+        return None
+    if environ.get('DB_CONN_MAX_AGE') not in (None, '', '0'):
+        raise ImproperlyConfigured(
+            'DB_CONN_MAX_AGE must be unset or 0 when DB_POOL is on: '
+            'pooled connections are returned after every request.'
+        )
+    options = {
+        'min_size': _env_number(environ, 'DB_POOL_MIN_SIZE', 1, int),
+        'max_size': _env_number(environ, 'DB_POOL_MAX_SIZE', threads, int),
+        'timeout': _env_number(environ, 'DB_POOL_TIMEOUT', 5.0, float),
+        'max_idle': _env_number(environ, 'DB_POOL_MAX_IDLE', 300.0, float),
+    }
+    if options['max_size'] < 1:
+        raise ImproperlyConfigured('DB_POOL_MAX_SIZE must be at least 1.')
+    if not 0 <= options['min_size'] <= options['max_size']:
+        raise ImproperlyConfigured(
+            f"DB_POOL_MIN_SIZE must be between 0 and DB_POOL_MAX_SIZE ({options['max_size']})."
+        )
+    if options['timeout'] <= 0:
+        raise ImproperlyConfigured('DB_POOL_TIMEOUT must be greater than 0.')
+    return options
+
+
+def check_pool_capacity(workers, databases=None, limit=None):
+    """
+    Raise ImproperlyConfigured when ``workers`` processes with full pools
+    would need more connections than ``limit`` (DATABASE_MAX_CONNECTIONS by
+    default) allows.
+    """
+    databases = settings.DATABASES if databases is None else databases
+    limit = getattr(settings, 'DATABASE_MAX_CONNECTIONS', None) if limit is None else limit
+    if not limit:
+        return
+    for alias, database in databases.items():
+        pool = database.get('OPTIONS', {}).get('pool')
+        if not pool:
+            continue
+        needed = workers * pool['max_size']
+        if needed > limit:
+            raise ImproperlyConfigured(
+                f"Database '{alias}': {workers} workers x DB_POOL_MAX_SIZE {pool['max_size']} = "
+                f'{needed} connections, more than DB_MAX_CONNECTIONS ({limit}).'
+            )
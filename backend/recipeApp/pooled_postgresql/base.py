@@ -0,0 +1,81 @@
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+from . import get_metrics, pools
+
+if not is_psycopg3:
+    raise ImproperlyConfigured('recipeApp.pooled_postgresql requires psycopg 3; install psycopg[binary].')
+
+try:
+    from psycopg_pool import ConnectionPool, PoolTimeout
+except ImportError as e:
+    raise ImproperlyConfigured('Error loading psycopg_pool module. Did you install psycopg-pool?') from e
+
+_pool_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        pool = pools.get(self.alias)
+        if pool is None:
+            if self.settings_dict['CONN_MAX_AGE']:
+                raise ImproperlyConfigured('Pooled connections do not support CONN_MAX_AGE; set it to 0.')
+            with _pool_lock:
+                pool = pools.get(self.alias)
+                if pool is None:
+                    pool = ConnectionPool(
+                        kwargs=self.get_connection_params(),
+                        # Opened on first use, inside the worker that owns it
+                        open=False,
+                        check=ConnectionPool.check_connection if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+                        name=f'django-{self.alias}',
+                        **options,
+                    )
+                    pools[self.alias] = pool
+        return pool
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        options = self.settings_dict['OPTIONS']
+        if 'isolation_level' in options:
+            self.isolation_level = base.IsolationLevel(options['isolation_level'])
+        else:
+            self.isolation_level = base.IsolationLevel.READ_COMMITTED
+
+        pool.open()
+        start = time.perf_counter()
+        try:
+            connection = pool.getconn()
+        except PoolTimeout:
+            get_metrics(self.alias).record_timeout(time.perf_counter() - start)
+            raise
+        get_metrics(self.alias).record_checkout(time.perf_counter() - start)
+        if 'isolation_level' in options:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is not None and self.pool is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
+            # The connection belongs to the pool again
+            self.connection = None
+            return
+        return super()._close()
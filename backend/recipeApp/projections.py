@@ -0,0 +1,162 @@
+"""
+Read-only fast path for list endpoints.
+
+A Projection is compiled once from a serializer class. It loads the columns
+the serializer renders with ``values_list(named=True)`` and builds each row's
+dict with precomputed converters, skipping model instances and DRF's
+per-field machinery. The output matches ``serializer_class(rows, many=True).data``
+key for key and value for value, so the rendered JSON is byte-for-byte the
+same.
+
+Supported fields are plain model fields and to-one nested serializers;
+anything else (many=True children, method fields, ``source='*'``) raises
+ImproperlyConfigured when the projection is compiled.
+"""
+import time
+from functools import cached_property, lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .conditional import VALIDATOR_FIELDS
+from .metrics import add_serializer_time
+
+# to_representation methods that return database values unchanged
+PASSTHROUGH = {
+    serializers.BooleanField.to_representation,
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.ReadOnlyField.to_representation,
+}
+
+
+class IsoDateTime:
+    """
+    DateTimeField.to_representation for ISO 8601 output, with the field's
+    timezone looked up once per serialize() call rather than once per value.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    @classmethod
+    def handles(cls, field):
+        return (
+            type(field).to_representation is serializers.DateTimeField.to_representation
+            and type(field).enforce_timezone is serializers.DateTimeField.enforce_timezone
+            and getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() == ISO_8601
+        )
+
+    def bind(self):
+        field = self.field
+        tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if tz is None:
+            return field.to_representation
+
+        def convert(value):
+            if value.utcoffset() is None:
+                return field.to_representation(value)
+            value = value.astimezone(tz).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+
+
+def _converter(field):
+    if type(field).to_representation in PASSTHROUGH:
+        return None
+    if IsoDateTime.handles(field):
+        return IsoDateTime(field)
+    return field.to_representation
+
+
+class Projection:
+    """``fields``, when given, is passed on to the serializer to narrow it (see fieldsets.py)."""
+
+    def __init__(self, serializer_class, fields=None):
+        self.serializer_class = serializer_class
+        self.fields = fields
+
+    @cached_property
+    def _compiled(self):
+        columns = ['pk' if name == 'id' else name for name in VALIDATOR_FIELDS]
+        serializer = self.serializer_class() if self.fields is None else self.serializer_class(fields=self.fields)
+        layout = self._compile(serializer, '', columns)
+        return columns, layout
+
+    def _column(self, columns, column):
+        if column not in columns:
+            columns.append(column)
+        return columns.index(column)
+
+    def _compile(self, serializer, prefix, columns):
+        """
+        A list of (key, column index, converter) for fields and (key, nested
+        layout, index of the relation's own column) for nested serializers.
+        """
+        layout = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or isinstance(field, (serializers.ListSerializer, serializers.SerializerMethodField)):
+                raise ImproperlyConfigured(
+                    f'{type(serializer).__name__}.{name} cannot be projected; serialize it the usual way.'
+                )
+            column = prefix + field.source.replace('.', '__')
+            if isinstance(field, serializers.BaseSerializer):
+                # The relation's own column is its key, None when the relation is empty
+                layout.append((name, self._compile(field, column + '__', columns), self._column(columns, column)))
+                continue
+            layout.append((name, self._column(columns, 'pk' if column == 'id' else column), _converter(field)))
+        return layout
+
+    @property
+    def columns(self):
+        return self._compiled[0]
+
+    def project(self, queryset):
+        """
+        ``queryset`` as named tuples of the serializer's columns. Rows always
+        carry ``pk``, ``created_at`` and ``updated_at``, which conditional GET
+        and the cursor paginator read.
+        """
+        return queryset.values_list(*self.columns, named=True)
+
+    def _bind(self, layout):
+        """``layout`` with per-call converters resolved."""
+        bound = []
+        for key, source, convert in layout:
+            if type(source) is list:
+                source = self._bind(source)
+            elif isinstance(convert, IsoDateTime):
+                convert = convert.bind()
+            bound.append((key, source, convert))
+        return bound
+
+    def _build(self, layout, row):
+        data = {}
+        for key, source, convert in layout:
+            if type(source) is list:
+                data[key] = None if row[convert] is None else self._build(source, row)
+                continue
+            value = row[source]
+            if convert is not None and value is not None:
+                value = convert(value)
+            data[key] = value
+        return data
+
+    def serialize(self, rows):
+        """The list ``serializer_class(rows, many=True).data`` would return, for projected rows."""
+        start = time.perf_counter()
+        layout = self._bind(self._compiled[1])
+        build = self._build
+        try:
+            return [build(layout, row) for row in rows]
+        finally:
+            add_serializer_time(time.perf_counter() - start)
+
+
+@lru_cache(maxsize=256)
+def projection_for(serializer_class, fields):
+    """A shared Projection of ``serializer_class`` narrowed to ``fields`` (a tuple), compiled once."""
+    return Projection(serializer_class, fields)
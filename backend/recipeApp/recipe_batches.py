@@ -0,0 +1,54 @@
+"""
+Batch writes to one user's recipes.
+
+Each function applies one change to many recipes in a single transaction,
+with one queryset update() or delete() filtered to the owner, and reports
+what happened to every requested id. Ids the user doesn't own are reported
+as ``not_found``, the same as ids that don't exist, so a batch never reveals
+other users' recipes. Like every other write it stamps change_seq and
+leaves tombstones (see changes.py), and re-indexes the recipes and expires
+their cached responses once it commits (see pantry.py).
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .changes import next_change_seq, record_deletions
+from .models import Recipe
+from .pantry import recipes_changed
+
+MAX_BATCH_SIZE = 500
+
+
+def _results(ids, found, outcome):
+    return [{'id': pk, 'status': outcome if pk in found else 'not_found'} for pk in dict.fromkeys(ids)]
+
+
+def _owned(user, ids):
+    # Locked, so no other write can remove one of them before this one is done
+    return list(
+        Recipe.objects.filter(created_by=user, pk__in=ids).select_for_update().order_by('pk').values_list('pk', flat=True)
+    )
+
+
+@transaction.atomic
+def update_recipes(user, ids, changes):
+    """Set ``changes`` (validated recipe fields) on the user's recipes among ``ids``."""
+    seq = next_change_seq()
+    found = _owned(user, ids)
+    if found:
+        # update() skips auto_now, and updated_at drives the ETags
+        Recipe.objects.filter(pk__in=found).update(**changes, updated_at=timezone.now(), change_seq=seq)
+        recipes_changed(found)
+    return _results(ids, set(found), 'updated')
+
+
+@transaction.atomic
+def delete_recipes(user, ids):
+    """Delete the user's recipes among ``ids``, with their ingredients."""
+    seq = next_change_seq()
+    found = _owned(user, ids)
+    if found:
+        Recipe.objects.filter(pk__in=found).delete()
+        record_deletions('recipe', found, [user.pk], seq)
+        recipes_changed(found)
+    return _results(ids, set(found), 'deleted')
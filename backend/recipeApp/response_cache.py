@@ -0,0 +1,237 @@
+"""
+Two-tier cache for anonymous recipe responses.
+
+Tier one is a bounded LRU in each worker process, so a hot page is served
+from memory without any network hop. Tier two is a shared Django cache alias
+(Redis in production, local memory or files in development and tests) that
+lets workers reuse each other's renders.
+
+Entries are never deleted on write. Instead every cache key embeds one or
+more generation counters kept in the shared tier: ``feed`` for list pages,
+``recipes`` plus ``recipe:<id>`` for a recipe's detail page. A write bumps
+the counters once the transaction commits, which moves readers to fresh
+keys and lets the old entries expire. Workers keep their copy of a counter
+for GENERATION_TTL seconds, so other processes see a write within that
+window while a local hit still costs no I/O at all.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+KEY_PREFIX = 'response-cache'
+GENERATION_KEY = KEY_PREFIX + ':generation:%s'
+# Past this many recipes, bump the shared "recipes" counter instead of one per recipe
+MAX_RECIPE_BUMPS = 100
+# Headers that belong to one client and must never be replayed to another
+PRIVATE_HEADERS = {'set-cookie', 'content-length'}
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'LOCAL_MAX_ENTRIES': 512,
+    'LOCAL_TTL': 10,
+    'SHARED_TTL': 300,
+    'GENERATION_TTL': 1,
+}
+
+
+class LocalCache:
+    """Bounded LRU with per-entry expiry, shared by the threads of one process."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResponseCache:
+
+    def __init__(self):
+        self.configure()
+
+    def configure(self):
+        self.config = {**DEFAULTS, **getattr(settings, 'RESPONSE_CACHE', {})}
+        self.local = LocalCache(self.config['LOCAL_MAX_ENTRIES'])
+        self.generations = LocalCache(self.config['LOCAL_MAX_ENTRIES'])
+
+    @property
+    def enabled(self):
+        return self.config['ENABLED']
+
+    @property
+    def shared(self):
+        return caches[self.config['ALIAS']]
+
+    def clear_local(self):
+        """Forget this process's entries and counters; the shared tier is left alone."""
+        self.local.clear()
+        self.generations.clear()
+
+    # -- generations ---------------------------------------------------------
+
+    def get_generations(self, names):
+        """Current counter for each name, from this worker's copy when it is fresh."""
+        result = {}
+        missing = []
+        for name in names:
+            generation = self.generations.get(name)
+            if generation is None:
+                missing.append(name)
+            else:
+                result[name] = generation
+        if missing:
+            shared = self.shared.get_many([GENERATION_KEY % name for name in missing])
+            for name in missing:
+                generation = shared.get(GENERATION_KEY % name)
+                if generation is None:
+                    generation = self._start_generation(name)
+                self.generations.set(name, generation, self.config['GENERATION_TTL'])
+                result[name] = generation
+        return [result[name] for name in names]
+
+    def _start_generation(self, name):
+        # Start from the clock rather than 0, so a counter the shared cache
+        # evicted can't come back at a value that old entries still use.
+        key = GENERATION_KEY % name
+        self.shared.add(key, int(time.time() * 1000), timeout=None)
+        return self.shared.get(key, 0)
+
+    def bump(self, names):
+        for name in names:
+            key = GENERATION_KEY % name
+            try:
+                self.shared.incr(key)
+            except ValueError:
+                self._start_generation(name)
+                self.shared.incr(key)
+            self.generations.delete(name)
+
+    def invalidate_recipes(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        if len(recipe_ids) > MAX_RECIPE_BUMPS:
+            self.bump(['feed', 'recipes'])
+        else:
+            self.bump(['feed', *(f'recipe:{recipe_id}' for recipe_id in recipe_ids)])
+
+    # -- entries -------------------------------------------------------------
+
+    def make_key(self, request, namespace, generation_names):
+        generations = '.'.join(map(str, self.get_generations(generation_names)))
+        variant = '|'.join([
+            request.get_host(),
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+        ])
+        digest = hashlib.md5(variant.encode(), usedforsecurity=False).hexdigest()
+        return f'{KEY_PREFIX}:{namespace}:{generations}:{digest}'
+
+    def get(self, key):
+        entry = self.local.get(key)
+        if entry is None:
+            entry = self.shared.get(key)
+            if entry is None:
+                return None
+            self.local.set(key, entry, self.config['LOCAL_TTL'])
+        return entry
+
+    def set(self, key, response):
+        if hasattr(response, 'render'):
+            response.render()
+        entry = (
+            response.content,
+            {name: value for name, value in response.items() if name.lower() not in PRIVATE_HEADERS},
+        )
+        self.local.set(key, entry, self.config['LOCAL_TTL'])
+        self.shared.set(key, entry, self.config['SHARED_TTL'])
+
+
+response_cache = ResponseCache()
+
+
+def _reload(setting, **kwargs):
+    if setting in ('RESPONSE_CACHE', 'CACHES'):
+        response_cache.configure()
+
+
+setting_changed.connect(_reload)
+
+
+def cached_response(request, entry):
+    content, headers = entry
+    response = HttpResponse(content)
+    for name, value in headers.items():
+        response[name] = value
+    return get_conditional_response(
+        request,
+        etag=headers.get('ETag'),
+        last_modified=parse_http_date_safe(headers.get('Last-Modified', '')),
+        response=response,
+    )
+
+
+class ResponseCacheMixin:
+    """
+    Serve anonymous GET requests for ``cached_actions`` from the response
+    cache, before DRF authenticates, negotiates or touches the database.
+    """
+    cached_actions = ('list', 'retrieve')
+
+    def get_cache_generations(self, action):
+        """Names of the generation counters a cached response depends on."""
+        if action == 'list':
+            return ['feed']
+        return ['recipes', f'recipe:{self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)}']
+
+    def dispatch(self, request, *args, **kwargs):
+        action = self.action_map.get('get') if request.method == 'GET' else None
+        if not response_cache.enabled or action not in self.cached_actions or request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+
+        self.kwargs = kwargs
+        key = response_cache.make_key(request, self.basename, self.get_cache_generations(action))
+        entry = response_cache.get(key)
+        if entry is not None:
+            return cached_response(request, entry)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            response_cache.set(key, response)
+        return response
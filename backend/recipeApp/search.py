@@ -0,0 +1,83 @@
+"""
+Full-text recipe search.
+
+Production (Postgres) keeps a weighted ``search_vector`` tsvector column on
+recipeApp_recipe with a GIN index; development (SQLite) keeps an FTS5 virtual
+table, recipeApp_recipe_fts, keyed by recipe id. Both are maintained by
+database triggers created in migration 0004, so every write path (serializers,
+admin, bulk imports) stays in sync without touching Python code.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'recipeApp_recipe_fts'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _fts5_query(query):
+    """Quote every word so user input can never hit FTS5 query syntax."""
+    tokens = _TOKEN_RE.findall(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _postgres_search(queryset, query):
+    tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+    return queryset.filter(
+        RawSQL(f'"recipeApp_recipe"."search_vector" @@ {tsquery}', [query], output_field=BooleanField())
+    ).annotate(
+        search_rank=RawSQL(f'ts_rank_cd("recipeApp_recipe"."search_vector", {tsquery})', [query], output_field=FloatField())
+    )
+
+
+def _sqlite_search(queryset, query):
+    match = _fts5_query(query)
+    if not match:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset.filter(
+        RawSQL(
+            f'"recipeApp_recipe"."id" IN (SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s)',
+            [match], output_field=BooleanField(),
+        )
+    ).annotate(
+        # bm25() is lower-is-better, flip it so both backends sort descending
+        search_rank=RawSQL(
+            f'(SELECT -bm25("{FTS_TABLE}", 10.0, 5.0, 1.0, 5.0) FROM "{FTS_TABLE}" '
+            f'WHERE "{FTS_TABLE}" MATCH %s AND rowid = "recipeApp_recipe"."id")',
+            [match], output_field=FloatField(),
+        )
+    )
+
+
+def _fallback_search(queryset, query):
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    condition = Q()
+    for token in tokens:
+        condition &= (
+            Q(title__icontains=token) | Q(description__icontains=token)
+            | Q(instructions__icontains=token) | Q(ingredients__name__icontains=token)
+        )
+    matching = queryset.model.objects.filter(condition).values('pk')
+    return queryset.filter(pk__in=matching).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def search_recipes(queryset, query):
+    """
+    Filter a Recipe queryset down to rows matching ``query`` and order them
+    by relevance (``search_rank``, highest first).
+    """
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        queryset = _postgres_search(queryset, query)
+    elif vendor == 'sqlite':
+        queryset = _sqlite_search(queryset, query)
+    else:
+        queryset = _fallback_search(queryset, query)
+    return queryset.order_by('-search_rank', '-id')
+
@@ -1,12 +1,33 @@
 from rest_framework import serializers
-from .models import Recipe, GroceryList, Ingredient, GroceryItem
+from .models import Recipe, GroceryList, Ingredient, GroceryItem, SharedGroceryList
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Min, Q, Sum, Value, When
+from .pantry import recipe_changed
+from .units import merge_compatible_units
+from .nested import create_children, sync_children
+from .metrics import TimedSerializerMixin
+from .events import grocery_list_events
+from .changes import list_audience, next_change_seq, record_deletions
+from .catalog import CATALOG_FIELDS, link, link_instances
+from .recipe_batches import MAX_BATCH_SIZE as MAX_RECIPE_BATCH_SIZE
+
+class SparseFieldsMixin:
+    """Accepts ``fields=`` (field names) and drops every other field; see fieldsets.py."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 class IngredientSerializer(serializers.ModelSerializer):
+    # Writable so nested updates can match rows to existing ingredients
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = Ingredient
         fields = ['id', 'name', 'unit', 'quantity']
-        read_only_fields = ['id']
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,85 +35,238 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
         read_only_fields = ['id']
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     ingredients = IngredientSerializer(many=True, required=False)
     created_by = UserSerializer(read_only=True)
     
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'description', 'instructions', 'created_by', 'created_at', 'is_public', 'ingredients']
-        read_only_fields = ['created_at', 'created_by']
+        fields = ['id', 'title', 'description', 'instructions', 'created_by', 'created_at', 'updated_at', 'is_public', 'ingredients']
+        read_only_fields = ['created_at', 'updated_at', 'created_by']
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients', [])
-        recipe = Recipe.objects.create(**validated_data)
-        
-        for ingredient_data in ingredients_data:
-            Ingredient.objects.create(recipe=recipe, **ingredient_data)
+        seq = next_change_seq()
+        recipe = Recipe.objects.create(**validated_data, change_seq=seq)
+        create_children(Ingredient, 'recipe', recipe, link(ingredients_data), {'change_seq': seq})
         
+        recipe_changed(recipe.pk)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('ingredients', [])
+        ingredients_data = validated_data.pop('ingredients', None)
+        seq = next_change_seq()
         
         # Update recipe fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
+        instance.change_seq = seq
         instance.save()
         
-        # Update ingredients (simple approach: delete all and recreate)
-        if ingredients_data:
-            instance.ingredients.all().delete()
-            for ingredient_data in ingredients_data:
-                Ingredient.objects.create(recipe=instance, **ingredient_data)
+        # Reconcile ingredients by id when the client sent them
+        if ingredients_data is not None:
+            _, _, removed = sync_children(
+                Ingredient, 'recipe', instance, instance.ingredients.all(),
+                link(ingredients_data), ['name', 'unit', 'quantity'], {'change_seq': seq}, CATALOG_FIELDS,
+            )
+            record_deletions('ingredient', removed, [instance.created_by_id], seq)
         
+        recipe_changed(instance.pk)
         return instance
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Simplified serializer for recipe lists"""
     created_by = UserSerializer(read_only=True)
     
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'description', 'created_by', 'created_at', 'is_public']
-        read_only_fields = ['created_at', 'created_by']
+        fields = ['id', 'title', 'description', 'created_by', 'created_at', 'updated_at', 'is_public']
+        read_only_fields = ['created_at', 'updated_at', 'created_by']
+
+class PantryMatchSerializer(serializers.Serializer):
+    """Request body for matching recipes against a pantry"""
+    ingredients = serializers.ListField(
+        child=serializers.CharField(max_length=255), min_length=1, max_length=200
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+    offset = serializers.IntegerField(min_value=0, max_value=1000, default=0)
+    min_coverage = serializers.FloatField(min_value=0, max_value=1, default=0)
+
+class RecipeBatchSerializer(serializers.Serializer):
+    """Request body for a batch delete of the user's recipes"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=MAX_RECIPE_BATCH_SIZE)
+
+class RecipeChangesSerializer(serializers.ModelSerializer):
+    """The recipe fields a batch update may set"""
+
+    class Meta:
+        model = Recipe
+        fields = ['title', 'description', 'instructions', 'is_public']
+        extra_kwargs = {field: {'required': False} for field in fields}
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('Name at least one field to change.')
+        return attrs
+
+class RecipeBatchUpdateSerializer(RecipeBatchSerializer):
+    """Request body for a batch update: the same changes for every id"""
+    changes = RecipeChangesSerializer()
 
 class GroceryItemSerializer(serializers.ModelSerializer):
+    # Writable so nested updates can match rows to existing items
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = GroceryItem
-        fields = ['id', 'name', 'unit', 'quantity']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'unit', 'quantity', 'checked']
 
-class GroceryListSerializer(serializers.ModelSerializer):
+def grocery_item_events(created=(), updated=(), removed=(), checked=()):
+    """
+    Delta events for written items; ``removed`` holds ids. ``checked`` items
+    changed nothing but their checked state, which takes a smaller event.
+    """
+    return [
+        *({'type': 'added', 'item': GroceryItemSerializer(item).data} for item in created),
+        *({'type': 'changed', 'item': GroceryItemSerializer(item).data} for item in updated),
+        *({'type': 'checked', 'item': {'id': item.pk, 'checked': item.checked}} for item in checked),
+        *({'type': 'removed', 'item': {'id': pk}} for pk in removed),
+    ]
+
+class GroceryListSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     items = GroceryItemSerializer(many=True, required=False)
     created_by = UserSerializer(read_only=True)
     
     class Meta:
         model = GroceryList
-        fields = ['id', 'name', 'created_by', 'created_at', 'items']
-        read_only_fields = ['created_at', 'created_by']
+        fields = ['id', 'name', 'created_by', 'created_at', 'updated_at', 'items']
+        read_only_fields = ['created_at', 'updated_at', 'created_by']
 
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
-        grocery_list = GroceryList.objects.create(**validated_data)
-        
-        for item_data in items_data:
-            GroceryItem.objects.create(grocery_list=grocery_list, **item_data)
+        seq = next_change_seq()
+        grocery_list = GroceryList.objects.create(**validated_data, change_seq=seq)
+        create_children(GroceryItem, 'grocery_list', grocery_list, link(items_data), {'change_seq': seq})
         
         return grocery_list
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        items_data = validated_data.pop('items', [])
+        items_data = validated_data.pop('items', None)
+        seq = next_change_seq()
         
         # Update grocery list fields
+        events = []
+        if any(getattr(instance, attr) != value for attr, value in validated_data.items()):
+            events.append({'type': 'list', 'list': {'id': instance.pk, **validated_data}})
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
+        instance.change_seq = seq
         instance.save()
         
-        # Update items (simple approach: delete all and recreate)
-        if items_data:
-            instance.items.all().delete()
-            for item_data in items_data:
-                GroceryItem.objects.create(grocery_list=instance, **item_data)
+        # Reconcile items by id when the client sent them
+        if items_data is not None:
+            created, updated, removed = sync_children(
+                GroceryItem, 'grocery_list', instance, instance.items.all(),
+                link(items_data), ['name', 'unit', 'quantity', 'checked'], {'change_seq': seq}, CATALOG_FIELDS,
+            )
+            if removed:
+                record_deletions('grocery_item', removed, list_audience(instance), seq)
+            events += grocery_item_events(created, updated, removed)
         
+        # Subscribers of the list receive the deltas (see events.py)
+        grocery_list_events.publish(instance.pk, events)
         return instance
+
+class IngredientChangeSerializer(IngredientSerializer):
+    """An ingredient in the sync feed, which lists children apart from their recipes."""
+    
+    class Meta(IngredientSerializer.Meta):
+        fields = [*IngredientSerializer.Meta.fields, 'recipe']
+
+class GroceryItemChangeSerializer(GroceryItemSerializer):
+    """A grocery item in the sync feed, which lists children apart from their lists."""
+    
+    class Meta(GroceryItemSerializer.Meta):
+        fields = [*GroceryItemSerializer.Meta.fields, 'grocery_list']
+
+class SharedGroceryListSerializer(serializers.ModelSerializer):
+    """One user's access to a grocery list, granted by username."""
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    username = serializers.SlugRelatedField(source='user', slug_field='username', queryset=User.objects.all())
+    
+    class Meta:
+        model = SharedGroceryList
+        fields = ['user', 'username', 'permissions']
+
+    def validate_username(self, value):
+        if value.pk == self.context['grocery_list'].created_by_id:
+            raise serializers.ValidationError('The owner of a list already has access to it.')
+        return value
+
+class RecipeServingsSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    multiplier = serializers.FloatField(min_value=0.01, max_value=100, default=1)
+
+class GroceryListFromRecipesSerializer(serializers.Serializer):
+    """Builds one consolidated grocery list from several recipes"""
+    name = serializers.CharField(max_length=255)
+    recipes = RecipeServingsSerializer(many=True)
+
+    def validate_recipes(self, value):
+        if not value:
+            raise serializers.ValidationError('At least one recipe is required.')
+        if len(value) > 100:
+            raise serializers.ValidationError('At most 100 recipes can be combined.')
+
+        user = self.context['request'].user
+        requested = {entry['id'] for entry in value}
+        visible = set(
+            Recipe.objects.filter(Q(is_public=True) | Q(created_by=user), id__in=requested)
+            .values_list('id', flat=True)
+        )
+        missing = sorted(requested - visible)
+        if missing:
+            raise serializers.ValidationError(f'Recipes not found: {missing}')
+        return value
+
+    def create(self, validated_data):
+        multipliers = {}
+        for entry in validated_data['recipes']:
+            multipliers[entry['id']] = multipliers.get(entry['id'], 0) + entry['multiplier']
+
+        # The database sums each (ingredient, unit) pair across the recipes,
+        # so only one row per pair comes back, spelled the way that sorts
+        # first. Rows the catalog couldn't name stay on their own.
+        multiplier = Case(
+            *(When(recipe_id=recipe_id, then=Value(value)) for recipe_id, value in multipliers.items()),
+            output_field=FloatField(),
+        )
+        groups = (
+            Ingredient.objects.filter(recipe_id__in=multipliers)
+            .annotate(alone=Case(When(canonical__isnull=True, then=F('id')), default=Value(0)))
+            .values('canonical_id', 'canonical_unit_id', 'alone')
+            .annotate(total=Sum(F('quantity') * multiplier), first=Min('id'), name=Min('name'), unit=Min('unit'))
+            .order_by('first')
+        )
+        # Then pairs in compatible units (cups and tablespoons) are merged
+        merged = merge_compatible_units(
+            (group['canonical_id'] or -group['alone'], group['name'], group['unit'], group['total'])
+            for group in groups
+        )
+
+        with transaction.atomic():
+            seq = next_change_seq()
+            grocery_list = GroceryList.objects.create(
+                name=validated_data['name'], created_by=validated_data['created_by'], change_seq=seq
+            )
+            items = [
+                GroceryItem(grocery_list=grocery_list, name=name, unit=unit, quantity=quantity, change_seq=seq)
+                for name, unit, quantity in merged
+            ]
+            link_instances(items)
+            GroceryItem.objects.bulk_create(items)
+        return grocery_list
@@ -0,0 +1,33 @@
+"""
+Batched cleanup of expired database sessions.
+
+Django's clearsessions removes every expired row in one DELETE, which on a
+large table holds locks and generates WAL for as long as it runs. This
+deletes them in small primary-key batches instead, optionally pausing
+between batches so normal traffic is never stuck behind the purge.
+"""
+import time
+
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def purge_expired_sessions(batch_size=DEFAULT_BATCH_SIZE, pause=0.0, now=None):
+    """Delete sessions that expired before ``now``; returns how many were removed."""
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now)
+            .values_list('session_key', flat=True)[:batch_size]
+        )
+        if not keys:
+            break
+        deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+        if len(keys) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
@@ -0,0 +1,38 @@
+"""
+Who may do what with a grocery list.
+
+Owners can do everything. SharedGroceryList grants another user access:
+``view`` to read the list and follow its changes, ``edit`` to change its
+name and items as well, whole or one item at a time. Deleting a list and
+managing its shares stay with the owner, except that anyone can remove
+their own share.
+"""
+from django.db.models import Q
+from rest_framework import permissions
+
+from .models import GroceryList, SharedGroceryList
+
+# Actions each share permission allows; anything else is the owner's
+SHARED_ACTIONS = {
+    'view': {'list', 'retrieve', 'events'},
+    'edit': {'list', 'retrieve', 'events', 'update', 'partial_update', 'items', 'item'},
+}
+
+
+def visible_grocery_lists(user):
+    """The lists ``user`` owns or has been given access to."""
+    return GroceryList.objects.filter(
+        Q(created_by=user) | Q(pk__in=SharedGroceryList.objects.filter(user=user).values('list'))
+    )
+
+
+class GroceryListAccess(permissions.IsAuthenticated):
+    message = "You don't have permission to do that with this grocery list."
+
+    def has_object_permission(self, request, view, obj):
+        if obj.created_by_id == request.user.id:
+            return True
+        share = SharedGroceryList.objects.filter(list=obj, user=request.user).values_list('permissions', flat=True).first()
+        return view.action in SHARED_ACTIONS.get(share, ()) or (
+            view.action == 'unshare' and view.kwargs.get('user_id') == str(request.user.id)
+        )
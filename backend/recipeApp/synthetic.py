@@ -0,0 +1,172 @@
+"""
+Deterministic synthetic data for capacity planning and benchmarks.
+
+generate() creates users, recipes, ingredients, grocery lists, grocery
+items and SharedGroceryList rows from a seeded RNG: the same seed and
+sizes always produce the same rows. Users are written in chunks, and each
+chunk's children go in with it, so memory stays flat at millions of rows.
+Parents use bulk_create, since their ids are needed; ingredients and
+grocery items use the importer's multi-row INSERTs.
+
+Every synthetic user shares one password hash, computed once, so
+generating a million users doesn't hash a million passwords.
+"""
+import random
+from array import array
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .catalog import ingredient_catalog, unit_catalog
+from .changes import next_change_seq
+from .importer import insert_rows
+from .models import Recipe, Ingredient, GroceryList, GroceryItem, SharedGroceryList
+from .pantry import recipes_changed
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_PASSWORD = 'synthetic-pass-123'
+
+ADJECTIVES = [
+    'Classic', 'Spicy', 'Smoky', 'Creamy', 'Crispy', 'Quick', 'Rustic', 'Roasted', 'Grilled', 'Lemony',
+    'Herbed', 'Garlicky', 'Sweet', 'Tangy', 'Hearty', 'Light', 'Slow-cooked', 'One-pot', 'Weeknight', 'Zesty',
+]
+DISHES = [
+    'Pancakes', 'Carbonara', 'Stir Fry', 'Chili', 'Tacos', 'Curry', 'Risotto', 'Lasagna', 'Salad', 'Soup',
+    'Omelette', 'Burrito Bowl', 'Flatbread', 'Noodles', 'Stew', 'Frittata', 'Casserole', 'Dumplings',
+    'Chocolate Chip Cookies', 'Banana Bread', 'Avocado Toast', 'Fried Rice', 'Shakshuka', 'Paella',
+]
+INGREDIENTS = [
+    'All-purpose flour', 'Baking soda', 'Salt', 'Butter', 'Granulated sugar', 'Brown sugar', 'Vanilla extract',
+    'Large eggs', 'Chocolate chips', 'Spaghetti', 'Pancetta', 'Parmesan cheese', 'Black pepper', 'Bread',
+    'Avocado', 'Lime juice', 'Red pepper flakes', 'Chicken breast', 'Mixed vegetables', 'Garlic cloves',
+    'Fresh ginger', 'Vegetable oil', 'Soy sauce', 'Oyster sauce', 'Cornstarch', 'Olive oil', 'Onion',
+    'Tomatoes', 'Canned tomatoes', 'Rice', 'Arborio rice', 'Chicken stock', 'Milk', 'Heavy cream',
+    'Cheddar cheese', 'Mozzarella', 'Ground beef', 'Black beans', 'Kidney beans', 'Cumin', 'Paprika',
+    'Chili powder', 'Cilantro', 'Basil', 'Oregano', 'Thyme', 'Potatoes', 'Carrots', 'Celery', 'Spinach',
+    'Mushrooms', 'Bell pepper', 'Zucchini', 'Lemon', 'Honey', 'Bananas', 'Tortillas', 'Coconut milk',
+    'Curry paste', 'Shrimp', 'Salmon', 'Tofu', 'Green onions', 'Sesame oil', 'Peanut butter', 'Oats',
+]
+UNITS = ['g', 'kg', 'ml', 'l', 'cup', 'cups', 'tbsp', 'tsp', 'piece', 'pieces', 'oz', 'lb', 'pinch']
+LIST_NAMES = ['Weekly shop', 'Weekend', 'Party', 'Meal prep', 'Pantry restock', 'Dinner', 'Baking', 'BBQ']
+
+
+class GenerationReport:
+
+    def __init__(self):
+        self.users = 0
+        self.recipes = 0
+        self.ingredients = 0
+        self.grocery_lists = 0
+        self.grocery_items = 0
+        self.shares = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def _count(rng, average):
+    """A count that averages ``average``: uniform over 0..2 * average."""
+    return rng.randint(0, 2 * average) if average else 0
+
+
+def _quantity(rng):
+    return round(rng.choice([0.25, 0.5, 1, 1, 2, 3, 100, 200, 250, 500]) * rng.uniform(0.5, 2), 2)
+
+
+def _write_chunk(rng, report, first, count, options, password, user_ids):
+    prefix = options['prefix']
+    users = [
+        User(username=f'{prefix}-{n:07d}', email=f'{prefix}-{n:07d}@example.com', password=password,
+             first_name=rng.choice(ADJECTIVES), last_name='Tester')
+        for n in range(first, first + count)
+    ]
+    with transaction.atomic():
+        seq = next_change_seq()
+        User.objects.bulk_create(users)
+        user_ids.extend(user.pk for user in users)
+
+        recipes = []
+        for user in users:
+            for _ in range(_count(rng, options['recipes_per_user'])):
+                title = f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}'
+                recipes.append(Recipe(
+                    created_by=user, title=title,
+                    description=f'{title} for {rng.randint(1, 8)}.',
+                    instructions='\n'.join(f'{step}. Step {step} of {title}.' for step in range(1, rng.randint(3, 9))),
+                    is_public=rng.random() < options['public_ratio'], change_seq=seq,
+                ))
+        Recipe.objects.bulk_create(recipes)
+        ingredients = [
+            (recipe.pk, name, rng.choice(UNITS), _quantity(rng), seq)
+            for recipe in recipes
+            for name in rng.sample(INGREDIENTS, min(_count(rng, options['ingredients_per_recipe']), len(INGREDIENTS)))
+        ]
+        names, units = ingredient_catalog.ids(INGREDIENTS), unit_catalog.ids(UNITS)
+        insert_rows(Ingredient, ['recipe', 'name', 'unit', 'quantity', 'canonical', 'canonical_unit', 'change_seq'], [
+            (recipe_id, name, unit, quantity, names[name], units[unit], seq)
+            for recipe_id, name, unit, quantity, _ in ingredients
+        ])
+
+        lists = [
+            GroceryList(created_by=user, name=rng.choice(LIST_NAMES), change_seq=seq)
+            for user in users
+            for _ in range(_count(rng, options['grocery_lists_per_user']))
+        ]
+        GroceryList.objects.bulk_create(lists)
+        items = [
+            (grocery_list.pk, name, rng.choice(UNITS), _quantity(rng), seq)
+            for grocery_list in lists
+            for name in rng.sample(INGREDIENTS, min(_count(rng, options['items_per_list']), len(INGREDIENTS)))
+        ]
+        insert_rows(GroceryItem, ['grocery_list', 'name', 'unit', 'quantity', 'canonical', 'canonical_unit', 'change_seq'], [
+            (list_id, name, unit, quantity, names[name], units[unit], seq)
+            for list_id, name, unit, quantity, _ in items
+        ])
+
+        # Share with users generated so far, never with the owner
+        shares = []
+        for grocery_list in lists:
+            if len(user_ids) > 1 and rng.random() < options['share_ratio']:
+                user_id = rng.choice(user_ids)
+                if user_id != grocery_list.created_by_id:
+                    shares.append(SharedGroceryList(
+                        list=grocery_list, user_id=user_id, permissions=rng.choice(['view', 'edit']),
+                    ))
+        SharedGroceryList.objects.bulk_create(shares)
+        recipes_changed(recipe.pk for recipe in recipes)
+
+    report.users += len(users)
+    report.recipes += len(recipes)
+    report.ingredients += len(ingredients)
+    report.grocery_lists += len(lists)
+    report.grocery_items += len(items)
+    report.shares += len(shares)
+
+
+def generate(users, recipes_per_user=5, ingredients_per_recipe=8, grocery_lists_per_user=2, items_per_list=10,
+             share_ratio=0.1, public_ratio=0.7, seed=0, prefix='synthetic', password=DEFAULT_PASSWORD,
+             chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Create ``users`` users named ``<prefix>-0000000`` onwards, each with on
+    average the given number of recipes and grocery lists; returns a
+    GenerationReport. ``progress(report)`` is called after every chunk.
+    """
+    options = {
+        'prefix': prefix,
+        'recipes_per_user': recipes_per_user,
+        'ingredients_per_recipe': ingredients_per_recipe,
+        'grocery_lists_per_user': grocery_lists_per_user,
+        'items_per_list': items_per_list,
+        'share_ratio': share_ratio,
+        'public_ratio': public_ratio,
+    }
+    rng = random.Random(seed)
+    password = make_password(password)
+    report = GenerationReport()
+    user_ids = array('q')
+    for first in range(0, users, chunk_size):
+        _write_chunk(rng, report, first, min(chunk_size, users - first), options, password, user_ids)
+        if progress is not None:
+            progress(report)
+    return report
@@ -1,3 +1,1992 @@
-from django.test import TestCase
+import base64
+import contextvars
+import csv
+import json
+import runpy
+import threading
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from tempfile import NamedTemporaryFile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from .catalog import canonical_ingredient_name, canonical_unit_name, ingredient_catalog, link_instances, unit_catalog
+from .changes import compact_tombstones, current_change_seq, next_change_seq
+from .events import InProcessBroker, check_event_broker, grocery_list_events
+from .middleware import MetricsMiddleware, QueryStats
+from .pagination import RecipeCursorPagination
+from .models import Recipe, Ingredient, GroceryList, GroceryItem, SharedGroceryList, Tombstone, CanonicalIngredient
+from .pantry import MAX_REPLAY, PantryIndex, _reserve_versions, current_version, pantry_index
+from .projections import Projection
+from .pooled_postgresql import PoolMetrics, check_pool_capacity, pool_options
+from .renderers import FastJSONRenderer
+from .response_cache import LocalCache, response_cache
+from .sessions import purge_expired_sessions
+from .synthetic import DEFAULT_PASSWORD, generate
+from .hashing import hashing_gate
+from .health import health_probe, percentiles
+from .throttling import AuthIPThrottle, AuthUsernameThrottle
+from .units import aggregate_ingredients, convert
+from .serializers import RecipeSerializer, RecipeListSerializer
+from .views import RecipeViewSet, MyRecipeViewSet, GroceryListViewSet, recipe_list_projection, recipe_list_queryset
+
+
+# Budgets below measure the real work; ResponseCacheTests turns the cache back on
+@override_settings(RESPONSE_CACHE={**settings.RESPONSE_CACHE, 'ENABLED': False})
+class QueryBudgetTestCase(APITestCase):
+    """Base class with helpers for pinning the SQL cost of an endpoint."""
+
+    def tearDown(self):
+        # Catalog ids remembered by on-commit callbacks roll back with the test
+        ingredient_catalog.clear()
+        unit_catalog.clear()
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            yield stats
+        self.assertLessEqual(
+            stats.count, budget,
+            f'{stats.count} queries executed, budget is {budget}',
+        )
+
+    def count_queries(self, method, url, **kwargs):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            getattr(self.client, method)(url, **kwargs)
+        return stats.count
+
+    def make_recipe(self, user, is_public=True, ingredients=3):
+        recipe = Recipe.objects.create(
+            title='Pancakes', description='Fluffy', instructions='Mix and fry',
+            created_by=user, is_public=is_public,
+        )
+        Ingredient.objects.bulk_create(link_instances([
+            Ingredient(recipe=recipe, name=f'item {i}', unit='g', quantity=i + 1)
+            for i in range(ingredients)
+        ]))
+        return recipe
+
+    def make_grocery_list(self, user, items=3):
+        grocery_list = GroceryList.objects.create(name='Weekly', created_by=user)
+        GroceryItem.objects.bulk_create(link_instances([
+            GroceryItem(grocery_list=grocery_list, name=f'item {i}', unit='g', quantity=i + 1)
+            for i in range(items)
+        ]))
+        return grocery_list
+
+
+class RouteQueryBudgetTests(QueryBudgetTestCase):
+    """Pins a maximum query count for every route in recipeApp/urls.py."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.other = User.objects.create_user('other', 'other@example.com', 'secret-pass-123')
+        self.recipe = self.make_recipe(self.user)
+        self.grocery_list = self.make_grocery_list(self.user)
+
+    def login(self):
+        self.client.force_login(self.user)
+
+    def recipe_payload(self):
+        return {
+            'title': 'Soup', 'instructions': 'Boil',
+            'ingredients': [{'name': f'veg {i}', 'unit': 'g', 'quantity': 1} for i in range(5)],
+        }
+
+    def test_health(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('health-check'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_register(self):
+        data = {'username': 'new', 'email': 'new@example.com', 'password': 'secret-pass-123'}
+        with self.assertMaxQueries(11):
+            response = self.client.post(reverse('register'), data)
+        self.assertEqual(response.status_code, 201)
+
+    def test_login(self):
+        data = {'username': 'cook', 'password': 'secret-pass-123'}
+        with self.assertMaxQueries(9):
+            response = self.client.post(reverse('login'), data)
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout(self):
+        self.login()
+        with self.assertMaxQueries(4):
+            response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_profile(self):
+        self.login()
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('user-profile'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_csrf_token(self):
+        with self.assertMaxQueries(0):
+            response = self.client.get(reverse('csrf-token'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_list_anonymous(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('recipe-list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_list_authenticated(self):
+        self.login()
+        with self.assertMaxQueries(3):
+            response = self.client.get(reverse('recipe-list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_detail(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('recipe-detail', args=[self.recipe.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['ingredients']), 3)
+
+    def test_recipe_create(self):
+        self.login()
+        # First sighting of ingredient names and units: one INSERT and one SELECT per catalog (see catalog.py)
+        with self.assertMaxQueries(11):
+            response = self.client.post(reverse('recipe-list'), self.recipe_payload(), format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_recipe_update(self):
+        self.login()
+        url = reverse('recipe-detail', args=[self.recipe.pk])
+        # Includes the change counter and catalog entries for the new names
+        with self.assertMaxQueries(15):
+            response = self.client.put(url, self.recipe_payload(), format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_delete(self):
+        self.login()
+        # Includes the change counter, the tombstone and their transaction
+        with self.assertMaxQueries(9):
+            response = self.client.delete(reverse('recipe-detail', args=[self.recipe.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    def test_recipe_search(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('recipe-search'), {'q': 'pancakes'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_pantry_match(self):
+        pantry_index.reset()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('recipe-pantry-match'), {'ingredients': ['item 0']}, format='json')
+        # Includes reading the pantry index version; the catalog id is remembered
+        with self.assertMaxQueries(3):
+            response = self.client.post(reverse('recipe-pantry-match'), {'ingredients': ['item 0']}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_my_recipe_list(self):
+        self.login()
+        with self.assertMaxQueries(3):
+            response = self.client.get(reverse('my-recipe-list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_my_recipe_detail(self):
+        self.login()
+        with self.assertMaxQueries(4):
+            response = self.client.get(reverse('my-recipe-detail', args=[self.recipe.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_my_recipe_create(self):
+        self.login()
+        # Includes catalog entries for the new names
+        with self.assertMaxQueries(11):
+            response = self.client.post(reverse('my-recipe-list'), self.recipe_payload(), format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_my_recipe_update(self):
+        self.login()
+        url = reverse('my-recipe-detail', args=[self.recipe.pk])
+        # Includes the change counter and catalog entries for the new names
+        with self.assertMaxQueries(15):
+            response = self.client.put(url, self.recipe_payload(), format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_my_recipe_delete(self):
+        self.login()
+        # Includes the change counter, the tombstone and their transaction
+        with self.assertMaxQueries(9):
+            response = self.client.delete(reverse('my-recipe-detail', args=[self.recipe.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    def test_my_recipe_import(self):
+        self.login()
+        body = '\n'.join(
+            json.dumps({'title': f'Dish {i}', 'instructions': 'Cook', 'ingredients': [{'name': 'salt', 'unit': 'g', 'quantity': 1}] * 5})
+            for i in range(50)
+        )
+        # Includes catalog entries for the new names
+        with self.assertMaxQueries(11):
+            response = self.client.post(reverse('my-recipe-import-ndjson'), body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+
+    def test_my_recipe_batch_update(self):
+        self.login()
+        ids = [self.recipe.pk, *(self.make_recipe(self.user).pk for _ in range(20))]
+        # One UPDATE for all 21 recipes
+        with self.assertMaxQueries(6):
+            response = self.client.patch(reverse('my-recipe-batch-update'),
+                                         {'ids': ids, 'changes': {'is_public': True}}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_my_recipe_batch_delete(self):
+        self.login()
+        ids = [self.recipe.pk, *(self.make_recipe(self.user).pk for _ in range(20))]
+        # One DELETE each for the recipes and their ingredients, one INSERT of tombstones
+        with self.assertMaxQueries(9):
+            response = self.client.post(reverse('my-recipe-batch-delete'), {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_my_recipe_export(self):
+        self.login()
+        with self.assertMaxQueries(4):
+            response = self.client.get(reverse('my-recipe-export'))
+            body = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(body.splitlines()), 1)
+
+    def test_grocery_list_list(self):
+        self.login()
+        with self.assertMaxQueries(4):
+            response = self.client.get(reverse('grocery-list-list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_grocery_list_detail(self):
+        self.login()
+        with self.assertMaxQueries(4):
+            response = self.client.get(reverse('grocery-list-detail', args=[self.grocery_list.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['items']), 3)
+
+    def test_grocery_list_create(self):
+        self.login()
+        data = {'name': 'Party', 'items': [{'name': f'snack {i}', 'unit': 'bag', 'quantity': 1} for i in range(5)]}
+        # Includes catalog entries for the new names
+        with self.assertMaxQueries(11):
+            response = self.client.post(reverse('grocery-list-list'), data, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_grocery_list_update(self):
+        self.login()
+        url = reverse('grocery-list-detail', args=[self.grocery_list.pk])
+        items = self.client.get(url).json()['items']
+        items[0]['quantity'] = 9
+        items[-1] = {'name': 'Lemon', 'unit': 'piece', 'quantity': 1}
+        # Includes the change counter, the tombstone for the removed item and
+        # catalog entries for the new one
+        with self.assertMaxQueries(16):
+            response = self.client.put(url, {'name': 'Party', 'items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_grocery_list_delete(self):
+        self.login()
+        # Includes the change counter and a tombstone for the owner and each share
+        with self.assertMaxQueries(11):
+            response = self.client.delete(reverse('grocery-list-detail', args=[self.grocery_list.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    def test_grocery_list_from_recipes(self):
+        self.login()
+        other_recipe = self.make_recipe(self.other, ingredients=20)
+        data = {'name': 'Plan', 'recipes': [{'id': self.recipe.pk}, {'id': other_recipe.pk, 'multiplier': 2}]}
+        # Includes catalog entries for the new names
+        with self.assertMaxQueries(14):
+            response = self.client.post(reverse('grocery-list-from-recipes'), data, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_grocery_list_export(self):
+        self.login()
+        with self.assertMaxQueries(4):
+            response = self.client.get(reverse('grocery-list-export'), {'format': 'csv'})
+            body = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(body.splitlines()), 4)
+
+    def test_grocery_list_shares(self):
+        self.login()
+        url = reverse('grocery-list-shares', args=[self.grocery_list.pk])
+        with self.assertMaxQueries(14):
+            response = self.client.post(url, {'username': 'other', 'permissions': 'view'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        with self.assertMaxQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertMaxQueries(9):
+            response = self.client.delete(reverse('grocery-list-unshare', args=[self.grocery_list.pk, self.other.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    def test_grocery_list_items(self):
+        self.login()
+        item = self.grocery_list.items.first()
+        with self.assertMaxQueries(9):
+            response = self.client.patch(reverse('grocery-list-item', args=[self.grocery_list.pk, item.pk]),
+                                         {'checked': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # Includes catalog entries for the new names
+        with self.assertMaxQueries(10):
+            response = self.client.post(reverse('grocery-list-items', args=[self.grocery_list.pk]),
+                                        {'name': 'Lemon', 'unit': 'piece', 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_sync(self):
+        self.login()
+        with self.assertMaxQueries(8):
+            response = self.client.get(reverse('sync'), {'since': 0})
+        self.assertEqual(response.status_code, 200)
+
+
+class ConstantListQueryTests(QueryBudgetTestCase):
+    """List endpoints must not run more queries as the number of rows grows."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.client.force_login(self.user)
+        # Resolve the user once so every count below sees a warm user cache
+        self.client.get(reverse('user-profile'))
+
+    def assertConstantQueries(self, url, make_row):
+        make_row()
+        baseline = self.count_queries('get', url)
+        for _ in range(10):
+            make_row()
+        self.assertEqual(self.count_queries('get', url), baseline)
+
+    def test_recipe_list(self):
+        self.assertConstantQueries(
+            reverse('recipe-list'),
+            lambda: self.make_recipe(User.objects.create_user(f'u{User.objects.count()}')),
+        )
+
+    def test_my_recipe_list(self):
+        self.assertConstantQueries(reverse('my-recipe-list'), lambda: self.make_recipe(self.user))
+
+    def test_grocery_list_list(self):
+        self.assertConstantQueries(reverse('grocery-list-list'), lambda: self.make_grocery_list(self.user))
+
+
+class RecipeCursorPaginationTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.recipes = [self.make_recipe(self.user, ingredients=0) for _ in range(5)]
+
+    def request(self, **params):
+        return Request(APIRequestFactory().get('/', params))
+
+    def test_cursor_round_trip(self):
+        paginator = RecipeCursorPagination()
+        position = (timezone.now(), 42)
+        cursor = paginator.encode_cursor(position)
+        self.assertEqual(paginator.decode_cursor(self.request(cursor=cursor)), position)
+        self.assertIsNone(paginator.decode_cursor(self.request()))
+
+    def test_invalid_cursor_is_404(self):
+        tampered = base64.urlsafe_b64encode(b'yesterday|7').decode('ascii')
+        for cursor in ['not base64!', tampered, base64.urlsafe_b64encode(b'no separator').decode('ascii')]:
+            response = self.client.get(reverse('recipe-list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_pages_split_runs_of_equal_created_at(self):
+        Recipe.objects.update(created_at=timezone.now())
+        seen, url = [], reverse('recipe-list') + '?page_size=2'
+        while url:
+            page = self.client.get(url).json()
+            seen += [recipe['id'] for recipe in page['results']]
+            url = page['next']
+        self.assertEqual(seen, sorted((recipe.pk for recipe in self.recipes), reverse=True))
+
+    def test_without_cursor_the_feed_is_a_plain_list(self):
+        response = self.client.get(reverse('recipe-list'))
+        self.assertEqual([recipe['id'] for recipe in response.json()],
+                         sorted((recipe.pk for recipe in self.recipes), reverse=True))
+
+
+class RecipeSearchTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.other = User.objects.create_user('other', 'other@example.com', 'secret-pass-123')
+
+    def search(self, query):
+        response = self.client.get(reverse('recipe-search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_ranks_title_matches_first(self):
+        in_description = Recipe.objects.create(
+            title='Pasta', description='with tomato', instructions='Cook', created_by=self.user, is_public=True,
+        )
+        in_title = Recipe.objects.create(
+            title='Tomato soup', instructions='Simmer', created_by=self.user, is_public=True,
+        )
+        self.assertEqual(self.search('tomato'), [in_title.pk, in_description.pk])
+
+    def test_matches_ingredients_and_follows_their_changes(self):
+        recipe = self.make_recipe(self.user)
+        Ingredient.objects.create(recipe=recipe, name='Basil', unit='g', quantity=5)
+        self.assertEqual(self.search('basil'), [recipe.pk])
+        recipe.ingredients.filter(name='Basil').delete()
+        self.assertEqual(self.search('basil'), [])
+
+    def test_respects_visibility(self):
+        private = self.make_recipe(self.other, is_public=False)
+        self.assertEqual(self.search('pancakes'), [])
+        self.client.force_login(self.other)
+        self.assertEqual(self.search('pancakes'), [private.pk])
+
+    def test_requires_query(self):
+        response = self.client.get(reverse('recipe-search'))
+        self.assertEqual(response.status_code, 400)
+
+
+class PantryMatchTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        pantry_index.reset()
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.client.force_login(self.user)
+
+    def create_recipe(self, ingredients, is_public=True):
+        data = {
+            'title': 'Dish', 'instructions': 'Cook', 'is_public': is_public,
+            'ingredients': [{'name': name, 'unit': 'g', 'quantity': 1} for name in ingredients],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('recipe-list'), data, format='json')
+        return response.data['id']
+
+    def match(self, pantry, **params):
+        response = self.client.post(reverse('recipe-pantry-match'), {'ingredients': pantry, **params}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [(row['recipe']['id'], row['matched'], row['total'], row['missing']) for row in response.data['results']]
+
+    def test_ranks_by_coverage_and_lists_missing(self):
+        omelette = self.create_recipe(['Eggs', 'Butter'])
+        cake = self.create_recipe(['Eggs', 'Flour', 'Sugar', 'Butter'])
+        self.create_recipe(['Rice'])
+        self.assertEqual(self.match(['egg', 'butter ', 'FLOUR']), [
+            (omelette, 2, 2, []),
+            (cake, 3, 4, ['Sugar']),
+        ])
+        self.assertEqual(self.match(['egg'], min_coverage=0.5), [(omelette, 1, 2, ['Butter'])])
+
+    def test_matches_catalog_aliases(self):
+        bread = self.create_recipe(['All-purpose flour', 'Plain flour', 'Yeast'])
+        self.assertEqual(self.match(['flour', 'saffron']), [(bread, 1, 2, ['Yeast'])])
+        self.assertFalse(CanonicalIngredient.objects.filter(name='saffron').exists())
+
+    def test_index_follows_writes(self):
+        self.assertEqual(self.match(['rice']), [])
+        recipe = self.create_recipe(['Rice'])
+        self.assertEqual(self.match(['rice']), [(recipe, 1, 1, [])])
+
+        data = {'ingredients': [{'name': 'Beans', 'unit': 'g', 'quantity': 1}]}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('my-recipe-detail', args=[recipe]), data, format='json')
+        self.assertEqual(self.match(['rice']), [])
+        self.assertEqual(self.match(['beans']), [(recipe, 1, 1, [])])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('my-recipe-detail', args=[recipe]))
+        self.assertEqual(self.match(['beans']), [])
+
+    def test_hides_other_users_private_recipes(self):
+        private = self.create_recipe(['Saffron'], is_public=False)
+        self.assertEqual(self.match(['saffron']), [(private, 1, 1, [])])
+        self.client.logout()
+        self.assertEqual(self.match(['saffron']), [])
+
+    def test_ties_rank_newest_first_when_slots_are_reused(self):
+        first = self.create_recipe(['Rice'])
+        second = self.create_recipe(['Rice'])
+        self.match(['rice'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('my-recipe-detail', args=[first]))
+        self.match(['rice'])
+        third = self.create_recipe(['Rice'])
+        self.assertEqual(self.match(['rice']), [(third, 1, 1, []), (second, 1, 1, [])])
+        # It took the slot the deleted recipe left, below the older one's
+        self.assertLess(pantry_index.slot_of[third], pantry_index.slot_of[second])
+
+    def test_versions_are_claimed_in_consecutive_ranges(self):
+        start = current_version()
+        self.assertEqual(_reserve_versions(3), start + 3)
+        self.assertEqual(_reserve_versions(1), start + 4)
+        self.assertEqual(current_version(), start + 4)
+
+    def test_rebuild_keeps_serving_the_old_index(self):
+        recipe = self.create_recipe(['Rice'])
+        index = PantryIndex()
+        index.sync()
+        _reserve_versions(MAX_REPLAY + 1)
+        with mock.patch.object(PantryIndex, '_build_in_background') as build:
+            index.sync()
+        build.assert_called_once_with()
+        rice = ingredient_catalog.lookup(['rice'])['rice']
+        self.assertEqual(index.match([rice]), [(recipe, 1, 1)])
+
+
+class GroceryFromRecipesTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.other = User.objects.create_user('other', 'other@example.com', 'secret-pass-123')
+        self.client.force_login(self.user)
+
+    def test_unit_conversion(self):
+        self.assertAlmostEqual(convert(3, 'tsp', 'Tbsp.'), 1.0, places=3)
+        self.assertAlmostEqual(convert(1, 'kg', 'g'), 1000)
+        self.assertAlmostEqual(convert(2, 'Cups', 'ml'), 473.176)
+        with self.assertRaises(ValueError):
+            convert(1, 'cup', 'g')
+
+    def test_merges_compatible_units(self):
+        merged = aggregate_ingredients([
+            ('Milk', 'cup', 1), ('milk ', 'tbsp', 4), ('Flour', 'kg', 1), ('flour', 'g', 250),
+            ('Flour', 'cup', 1), ('Eggs', 'pieces', 2), ('egg', 'piece', 1),
+        ])
+        self.assertEqual(merged, [
+            ('Milk', 'cup', 1.25), ('Flour', 'kg', 1.25), ('Flour', 'cup', 1.0), ('Eggs', 'pieces', 3.0),
+        ])
+
+    def test_builds_list_from_recipes(self):
+        pancakes = Recipe.objects.create(title='Pancakes', instructions='Fry', created_by=self.user)
+        porridge = Recipe.objects.create(title='Porridge', instructions='Stir', created_by=self.other, is_public=True)
+        Ingredient.objects.bulk_create(link_instances([
+            Ingredient(recipe=pancakes, name='Milk', unit='cup', quantity=1),
+            Ingredient(recipe=pancakes, name='Salt', unit='tsp', quantity=0.5),
+            Ingredient(recipe=porridge, name='milk', unit='tbsp', quantity=2),
+        ]))
+
+        data = {'name': 'Breakfast', 'recipes': [{'id': pancakes.pk, 'multiplier': 2}, {'id': porridge.pk}]}
+        response = self.client.post(reverse('grocery-list-from-recipes'), data, format='json')
+        self.assertEqual(response.status_code, 201)
+        items = [(item['name'], item['unit'], item['quantity']) for item in response.data['items']]
+        self.assertEqual(items, [('Milk', 'cup', 2.125), ('Salt', 'tsp', 1.0)])
+
+    def test_sums_in_the_database_by_catalog_entry(self):
+        bread = Recipe.objects.create(title='Bread', instructions='Bake', created_by=self.user)
+        cake = Recipe.objects.create(title='Cake', instructions='Bake', created_by=self.user)
+        Ingredient.objects.bulk_create(link_instances([
+            Ingredient(recipe=bread, name='Plain flour', unit='g', quantity=500),
+            Ingredient(recipe=bread, name='Salt', unit='tsp', quantity=1),
+            Ingredient(recipe=bread, name='!!!', unit='g', quantity=1),
+            Ingredient(recipe=cake, name='flour', unit='Grams', quantity=200),
+            Ingredient(recipe=cake, name='All-purpose flour', unit='kg', quantity=0.1),
+            Ingredient(recipe=cake, name='Salt', unit='pinch', quantity=1),
+            Ingredient(recipe=cake, name='???', unit='g', quantity=2),
+        ]))
+        data = {'name': 'Baking', 'recipes': [{'id': bread.pk, 'multiplier': 2}, {'id': cake.pk, 'multiplier': 0.5}]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('grocery-list-from-recipes'), data, format='json')
+        self.assertEqual(response.status_code, 201)
+        items = [(item['name'], item['unit'], item['quantity']) for item in response.data['items']]
+        self.assertEqual(items, [
+            ('Plain flour', 'Grams', 1150.0), ('Salt', 'tsp', 2.0), ('!!!', 'g', 2.0), ('Salt', 'pinch', 0.5), ('???', 'g', 1.0),
+        ])
+        # One row per (ingredient, unit) pair comes back, not one per ingredient
+        grouped = [query['sql'] for query in queries.captured_queries if 'GROUP BY' in query['sql']]
+        self.assertEqual(len(grouped), 1)
+
+    def test_rejects_other_users_private_recipes(self):
+        private = Recipe.objects.create(title='Secret', instructions='Hide', created_by=self.other)
+        data = {'name': 'Nope', 'recipes': [{'id': private.pk}]}
+        response = self.client.post(reverse('grocery-list-from-recipes'), data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(GroceryList.objects.exists())
+
+
+class RecipeBatchTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.other = User.objects.create_user('other', 'other@example.com', 'secret-pass-123')
+        self.recipes = [self.make_recipe(self.user, is_public=False) for _ in range(3)]
+        self.foreign = self.make_recipe(self.other, is_public=False)
+        self.client.force_login(self.user)
+
+    def test_batch_update_reports_each_id(self):
+        etag = self.client.get(reverse('my-recipe-detail', args=[self.recipes[0].pk]))['ETag']
+        ids = [self.recipes[0].pk, self.foreign.pk, self.recipes[1].pk, self.recipes[0].pk, 999999]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('my-recipe-batch-update'),
+                                         {'ids': ids, 'changes': {'is_public': True, 'title': 'Shared'}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'id': self.recipes[0].pk, 'status': 'updated'},
+            {'id': self.foreign.pk, 'status': 'not_found'},
+            {'id': self.recipes[1].pk, 'status': 'updated'},
+            {'id': 999999, 'status': 'not_found'},
+        ])
+        self.assertEqual(
+            sorted(Recipe.objects.filter(is_public=True).values_list('pk', 'title')),
+            [(self.recipes[0].pk, 'Shared'), (self.recipes[1].pk, 'Shared')],
+        )
+        self.assertNotEqual(self.client.get(reverse('my-recipe-detail', args=[self.recipes[0].pk]))['ETag'], etag)
+        synced = self.client.get(reverse('sync'), {'since': 0}).json()
+        self.assertEqual(sorted(recipe['id'] for recipe in synced['recipes']), [self.recipes[0].pk, self.recipes[1].pk])
+
+    def test_batch_delete_leaves_tombstones(self):
+        ids = [self.recipes[0].pk, self.foreign.pk, self.recipes[2].pk]
+        response = self.client.post(reverse('my-recipe-batch-delete'), {'ids': ids}, format='json')
+        self.assertEqual([result['status'] for result in response.json()['results']], ['deleted', 'not_found', 'deleted'])
+        self.assertEqual(list(Recipe.objects.order_by('pk').values_list('pk', flat=True)),
+                         [self.recipes[1].pk, self.foreign.pk])
+        self.assertFalse(Ingredient.objects.filter(recipe_id__in=ids).exclude(recipe=self.foreign).exists())
+        self.assertEqual(sorted(self.client.get(reverse('sync'), {'since': 0}).json()['deleted']['recipes']),
+                         [self.recipes[0].pk, self.recipes[2].pk])
+
+    def test_batches_are_validated(self):
+        url = reverse('my-recipe-batch-update')
+        self.assertEqual(self.client.patch(url, {'ids': [self.recipes[0].pk], 'changes': {}}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(url, {'ids': [], 'changes': {'is_public': True}}, format='json').status_code, 400)
+        response = self.client.post(reverse('my-recipe-batch-delete'), {'ids': list(range(1, 502))}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Recipe.objects.count(), 4)
+
+
+class CatalogTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.client.force_login(self.user)
+
+    def test_canonical_names(self):
+        self.assertEqual(canonical_ingredient_name('All-purpose Flour'), 'flour')
+        self.assertEqual(canonical_ingredient_name(' Tomatoes, '), 'tomato')
+        self.assertEqual(canonical_ingredient_name('!!'), '')
+        self.assertEqual(canonical_unit_name('Tablespoons'), 'tbsp')
+        self.assertEqual(canonical_unit_name('Grams'), 'g')
+        self.assertEqual(canonical_unit_name('cloves'), 'clove')
+
+    def test_writes_link_rows_to_shared_entries(self):
+        data = {'title': 'Cake', 'instructions': 'Bake', 'ingredients': [
+            {'name': 'Flour', 'unit': 'Cups', 'quantity': 2},
+            {'name': 'all-purpose flour ', 'unit': 'cup', 'quantity': 1},
+            {'name': 'Eggs', 'unit': 'pieces', 'quantity': 3},
+        ]}
+        response = self.client.post(reverse('my-recipe-list'), data, format='json')
+        flour, more_flour, eggs = Ingredient.objects.order_by('pk')
+        self.assertEqual(flour.canonical_id, more_flour.canonical_id)
+        self.assertEqual(flour.canonical_unit_id, more_flour.canonical_unit_id)
+        self.assertEqual(sorted(CanonicalIngredient.objects.values_list('name', flat=True)), ['egg', 'flour'])
+        self.assertEqual(eggs.name, 'Eggs')
+
+        ingredients = response.json()['ingredients']
+        ingredients[2]['name'] = 'Sugar'
+        self.client.put(reverse('my-recipe-detail', args=[response.json()['id']]),
+                        {**data, 'ingredients': ingredients}, format='json')
+        self.assertEqual(Ingredient.objects.get(pk=eggs.pk).canonical.name, 'sugar')
+
+        response = self.client.post(reverse('grocery-list-from-recipes'),
+                                    {'name': 'Shop', 'recipes': [{'id': response.json()['id']}]}, format='json')
+        # Both flours are one catalog entry, so the list merges them
+        self.assertEqual(
+            sorted(GroceryItem.objects.values_list('canonical__name', 'canonical_unit__name', 'quantity')),
+            [('flour', 'cup', 3.0), ('sugar', 'piece', 3.0)],
+        )
+        item = GroceryItem.objects.get(canonical__name='sugar')
+        self.client.patch(reverse('grocery-list-item', args=[item.grocery_list_id, item.pk]),
+                          {'name': 'Large eggs'}, format='json')
+        self.assertEqual(GroceryItem.objects.get(pk=item.pk).canonical.name, 'egg')
+
+    def test_familiar_names_cost_no_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = ingredient_catalog.ids(['Flour'])
+        with self.assertNumQueries(0):
+            self.assertEqual(ingredient_catalog.ids(['flour ', 'Plain flour']),
+                             {'flour ': ids['Flour'], 'Plain flour': ids['Flour']})
+
+
+class NestedWriteTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.client.force_login(self.user)
+        self.client.get(reverse('user-profile'))
+
+    def payload(self, count):
+        return {
+            'title': 'Stew', 'instructions': 'Simmer',
+            'ingredients': [{'name': f'veg {i}', 'unit': 'g', 'quantity': 1} for i in range(count)],
+        }
+
+    def test_create_cost_does_not_grow_with_ingredients(self):
+        few = self.count_queries('post', reverse('recipe-list'), data=self.payload(2), format='json')
+        many = self.count_queries('post', reverse('recipe-list'), data=self.payload(50), format='json')
+        self.assertEqual(few, many)
+
+    def test_update_keeps_ids_and_touches_only_changes(self):
+        response = self.client.post(reverse('recipe-list'), self.payload(50), format='json')
+        url = reverse('recipe-detail', args=[response.data['id']])
+        ingredients = response.data['ingredients']
+        ids = [row['id'] for row in ingredients]
+
+        ingredients[0]['name'] = 'renamed'
+        del ingredients[1]
+        ingredients.append({'name': 'new', 'unit': 'g', 'quantity': 2})
+        data = {'title': 'Stew', 'instructions': 'Simmer', 'ingredients': ingredients}
+        # Includes catalog entries for the new names
+        with self.assertMaxQueries(15):
+            response = self.client.put(url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        after = {row['id']: row['name'] for row in response.data['ingredients']}
+        self.assertEqual(after[ids[0]], 'renamed')
+        self.assertNotIn(ids[1], after)
+        self.assertTrue(set(ids[2:]) <= set(after))
+        self.assertEqual(len(after), 50)
+
+    def test_update_rejects_foreign_ids(self):
+        other = self.make_recipe(self.user)
+        response = self.client.post(reverse('recipe-list'), self.payload(1), format='json')
+        foreign = other.ingredients.first()
+        data = {'title': 'Stew', 'instructions': 'Simmer', 'ingredients': [{'id': foreign.pk, 'name': 'x', 'unit': 'g', 'quantity': 1}]}
+        response = self.client.put(reverse('recipe-detail', args=[response.data['id']]), data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Ingredient.objects.get(pk=foreign.pk).name, foreign.name)
+
+    def test_grocery_list_update_omitting_items_keeps_them(self):
+        grocery_list = self.make_grocery_list(self.user)
+        response = self.client.patch(reverse('grocery-list-detail', args=[grocery_list.pk]), {'name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['items']), 3)
+
+
+class RecipeImportTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.client.force_login(self.user)
+
+    def ndjson(self, *records):
+        return '\n'.join(record if isinstance(record, str) else json.dumps(record) for record in records)
+
+    def test_imports_valid_lines_and_reports_bad_ones(self):
+        body = self.ndjson(
+            {'title': 'Toast', 'instructions': 'Toast it', 'is_public': True,
+             'ingredients': [{'name': 'Bread', 'unit': 'slice', 'quantity': 2}]},
+            '{not json',
+            '',
+            {'title': 'No instructions'},
+            {'title': 'Soup', 'instructions': 'Boil', 'ingredients': [{'name': 'Water', 'unit': 'l'}]},
+            {'title': 'Tea', 'instructions': 'Steep'},
+        )
+        response = self.client.post(reverse('my-recipe-import-ndjson'), body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 4, 5])
+        self.assertIn('instructions', response.data['errors'][1]['errors'])
+        self.assertIn('quantity', response.data['errors'][2]['errors']['ingredients'][0])
+
+        toast = Recipe.objects.get(title='Toast')
+        self.assertEqual(toast.created_by, self.user)
+        self.assertTrue(toast.is_public)
+        self.assertEqual(list(toast.ingredients.values_list('name', 'unit', 'quantity')), [('Bread', 'slice', 2.0)])
+
+    def test_import_passes_the_csrf_check(self):
+        # The CSRF check reads request.POST, which parses the body first
+        client = self.client_class(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        token = client.get(reverse('csrf-token')).cookies['csrftoken'].value
+        response = client.post(reverse('my-recipe-import-ndjson'), self.ndjson({'title': 'Tea', 'instructions': 'Steep'}),
+                               content_type='application/x-ndjson', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+
+    def test_import_through_a_login_session(self):
+        # The session cookie the login route sets, not force_login's
+        client = self.client_class(enforce_csrf_checks=True)
+        token = client.get(reverse('csrf-token')).cookies['csrftoken'].value
+        response = client.post(reverse('login'), {'username': 'cook', 'password': 'secret-pass-123'},
+                               format='json', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+        token = client.cookies['csrftoken'].value
+        body = self.ndjson({'title': 'Tea', 'instructions': 'Steep'}, {'title': 'Toast', 'instructions': 'Toast it'})
+        response = client.post(reverse('my-recipe-import-ndjson'), body,
+                               content_type='application/x-ndjson', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Recipe.objects.filter(created_by=self.user).count(), 2)
+
+    def test_chunks_do_not_change_the_result(self):
+        records = [{'title': f'Dish {i}', 'instructions': 'Cook', 'ingredients': [{'name': 'salt', 'unit': 'g', 'quantity': i}]}
+                   for i in range(25)]
+        out = StringIO()
+        with NamedTemporaryFile('w', suffix='.ndjson') as f:
+            f.write(self.ndjson(*records))
+            f.flush()
+            call_command('import_recipes', f.name, user='cook', chunk_size=7, stdout=out)
+        self.assertIn('Imported 25 recipes', out.getvalue())
+        self.assertEqual(Ingredient.objects.filter(recipe__created_by=self.user).count(), 25)
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('ingredients__quantity', flat=True)),
+            [float(i) for i in range(25)],
+        )
+
+
+class ExportTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.other = User.objects.create_user('other', 'other@example.com', 'secret-pass-123')
+        self.client.force_login(self.user)
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export_round_trips_through_import(self):
+        for i in range(5):
+            self.make_recipe(self.user, is_public=bool(i % 2), ingredients=i)
+        self.make_recipe(self.other)
+
+        response, body = self.export('my-recipe-export')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(records), 5)
+        self.assertEqual([len(record['ingredients']) for record in records], [0, 1, 2, 3, 4])
+
+        Recipe.objects.filter(created_by=self.user).delete()
+        response = self.client.post(reverse('my-recipe-import-ndjson'), body, content_type='application/x-ndjson')
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(Ingredient.objects.filter(recipe__created_by=self.user).count(), 10)
+
+    def test_csv_export_has_one_row_per_child(self):
+        self.make_recipe(self.user, ingredients=2)
+        self.make_recipe(self.user, ingredients=0)
+        self.make_grocery_list(self.user, items=3)
+        self.make_grocery_list(self.other, items=3)
+
+        response, body = self.export('my-recipe-export', format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="recipes.csv"', response['Content-Disposition'])
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[0][:2], ['recipe_id', 'title'])
+        self.assertEqual(len(rows), 1 + 2 + 1)
+
+        _, body = self.export('grocery-list-export', format='csv')
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual([row[4] for row in rows[1:]], ['item 0', 'item 1', 'item 2'])
+
+    def test_export_query_count_does_not_grow_with_rows(self):
+        for _ in range(30):
+            self.make_recipe(self.user)
+        # session + user, one page of recipes, one batch of ingredients
+        with self.assertMaxQueries(4):
+            _, body = self.export('my-recipe-export')
+        self.assertEqual(len(body.splitlines()), 30)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse('my-recipe-export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('grocery-list-export'))
+        self.assertEqual(response.status_code, 403)
+
+
+class ConditionalGetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.other = User.objects.create_user('other', 'other@example.com', 'secret-pass-123')
+        self.recipe = self.make_recipe(self.user)
+        self.private = self.make_recipe(self.other, is_public=False)
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_recipe_detail_returns_304_after_one_query(self):
+        url = reverse('recipe-detail', args=[self.recipe.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertMaxQueries(1):
+            cached = self.revalidate(url, response)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+        cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_nested_ingredient_edit_changes_etag(self):
+        self.client.force_login(self.user)
+        url = reverse('my-recipe-detail', args=[self.recipe.pk])
+        response = self.client.get(url)
+        ingredient = response.data['ingredients'][0]
+
+        update = self.client.patch(url, {'ingredients': [{**ingredient, 'quantity': 42}]}, format='json')
+        self.assertEqual(update.status_code, 200)
+        self.assertGreater(update.data['updated_at'], response.data['updated_at'])
+
+        fresh = self.revalidate(url, response)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], response['ETag'])
+
+    def test_hidden_recipe_is_not_revalidated(self):
+        self.client.force_login(self.other)
+        url = reverse('recipe-detail', args=[self.private.pk])
+        response = self.client.get(url)
+        self.client.logout()
+        self.assertEqual(self.revalidate(url, response).status_code, 403)
+
+    def test_recipe_list_revalidation(self):
+        url = reverse('recipe-list')
+        response = self.client.get(url, {'page_size': 1})
+        with self.assertMaxQueries(1):
+            cached = self.revalidate(url, response, page_size=1)
+        self.assertEqual(cached.status_code, 304)
+
+        self.make_recipe(self.user)
+        self.assertEqual(self.revalidate(url, response, page_size=1).status_code, 200)
+
+        response = self.client.get(url)
+        Recipe.objects.filter(pk=self.recipe.pk).delete()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_grocery_list_revalidation(self):
+        self.client.force_login(self.user)
+        grocery_list = self.make_grocery_list(self.user)
+        list_url = reverse('grocery-list-list')
+        detail_url = reverse('grocery-list-detail', args=[grocery_list.pk])
+        listing = self.client.get(list_url)
+        detail = self.client.get(detail_url)
+
+        # session + user + validators
+        with self.assertMaxQueries(3):
+            self.assertEqual(self.revalidate(list_url, listing).status_code, 304)
+        with self.assertMaxQueries(3):
+            self.assertEqual(self.revalidate(detail_url, detail).status_code, 304)
+
+        self.client.patch(detail_url, {'name': 'Renamed'}, format='json')
+        self.assertEqual(self.revalidate(list_url, listing).status_code, 200)
+        self.assertEqual(self.revalidate(detail_url, detail).status_code, 200)
+
+
+@override_settings(RESPONSE_CACHE={**settings.RESPONSE_CACHE, 'ENABLED': True})
+class ResponseCacheTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        response_cache.clear_local()
+        caches[settings.RESPONSE_CACHE['ALIAS']].clear()
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.recipe = self.make_recipe(self.user)
+
+    def test_anonymous_hits_skip_the_database(self):
+        list_url = reverse('recipe-list')
+        detail_url = reverse('recipe-detail', args=[self.recipe.pk])
+        first = self.client.get(list_url)
+        detail = self.client.get(detail_url)
+
+        with self.assertMaxQueries(0):
+            self.assertEqual(self.client.get(list_url).json(), first.json())
+            self.assertEqual(self.client.get(detail_url).json(), detail.json())
+
+        # A new worker starts with an empty first tier and fills it from the shared one
+        response_cache.clear_local()
+        with self.assertMaxQueries(0):
+            cached = self.client.get(detail_url)
+        self.assertEqual(cached.json(), detail.json())
+        self.assertEqual(cached['ETag'], detail['ETag'])
+
+    def test_cached_response_honours_if_none_match(self):
+        url = reverse('recipe-detail', args=[self.recipe.pk])
+        response = self.client.get(url)
+        with self.assertMaxQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_writes_bump_generations(self):
+        list_url = reverse('recipe-list')
+        detail_url = reverse('recipe-detail', args=[self.recipe.pk])
+        self.client.get(list_url)
+        self.client.get(detail_url)
+
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('my-recipe-detail', args=[self.recipe.pk]), {'title': 'Crepes'}, format='json')
+            self.client.post(reverse('recipe-list'), {'title': 'Soup', 'instructions': 'Boil', 'is_public': True}, format='json')
+        self.client.logout()
+
+        self.assertEqual(self.client.get(detail_url).data['title'], 'Crepes')
+        self.assertEqual([recipe['title'] for recipe in self.client.get(list_url).data], ['Soup', 'Crepes'])
+
+    def test_other_workers_see_bumps_after_generation_ttl(self):
+        self.client.get(reverse('recipe-list'))
+        response_cache.generations.set('feed', -1, ttl=60)
+        # A stale counter only misses the cache; it never serves another generation's entry
+        with self.assertMaxQueries(1):
+            self.client.get(reverse('recipe-list'))
+
+    def test_authenticated_and_browsable_requests_are_not_shared(self):
+        url = reverse('recipe-list')
+        self.client.get(url)
+        self.assertIn('text/html', self.client.get(url, HTTP_ACCEPT='text/html')['Content-Type'])
+
+        private = self.make_recipe(self.user, is_public=False)
+        self.client.force_login(self.user)
+        self.assertIn(private.pk, [recipe['id'] for recipe in self.client.get(url).data])
+
+    def test_local_cache_is_a_bounded_lru(self):
+        local = LocalCache(max_entries=2)
+        local.set('a', 1, ttl=60)
+        local.set('b', 2, ttl=60)
+        local.get('a')
+        local.set('c', 3, ttl=60)
+        self.assertEqual((local.get('a'), local.get('b'), local.get('c')), (1, None, 3))
+        local.set('d', 4, ttl=0)
+        self.assertIsNone(local.get('d'))
+
+
+class SessionCacheTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.client.login(username='cook', password='secret-pass-123')
+
+    def test_warm_requests_skip_session_and_user_queries(self):
+        self.make_grocery_list(self.user)
+        self.client.get(reverse('user-profile'))
+        with self.assertMaxQueries(0):
+            response = self.client.get(reverse('user-profile'))
+        self.assertEqual(response.data['user']['username'], 'cook')
+        # Only the lists and their items
+        with self.assertMaxQueries(2):
+            self.assertEqual(self.client.get(reverse('grocery-list-list')).status_code, 200)
+
+    def test_profile_change_is_seen_on_next_request(self):
+        self.client.get(reverse('user-profile'))
+        self.user.first_name = 'Julia'
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('user-profile')).data['user']['first_name'], 'Julia')
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get(reverse('user-profile'))
+        self.user.set_password('new-pass-456')
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 403)
+
+    def test_purge_deletes_only_expired_sessions_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+            for i in range(25)
+        )
+        Session.objects.create(session_key='alive', session_data='', expire_date=now + timedelta(days=1))
+
+        self.assertEqual(purge_expired_sessions(batch_size=10), 25)
+        self.assertFalse(Session.objects.filter(expire_date__lt=now).exists())
+        self.assertTrue(Session.objects.filter(session_key='alive').exists())
+
+        out = StringIO()
+        call_command('purge_sessions', pause=0, stdout=out)
+        self.assertIn('Purged 0 expired sessions', out.getvalue())
+
+    def test_purge_loop_survives_database_errors(self):
+        out, err = StringIO(), StringIO()
+        outcomes = [DatabaseError('connection lost'), 3, KeyboardInterrupt]
+        with mock.patch('recipeApp.management.commands.purge_sessions.purge_expired_sessions', side_effect=outcomes), \
+                mock.patch('time.sleep'), self.assertRaises(KeyboardInterrupt):
+            call_command('purge_sessions', every=60, stdout=out, stderr=err)
+        self.assertIn('connection lost', err.getvalue())
+        self.assertIn('Purged 3 expired sessions', out.getvalue())
+
+    def test_gunicorn_runs_the_maintenance_jobs(self):
+        with mock.patch.dict('os.environ'):
+            config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+            with mock.patch('subprocess.Popen') as popen:
+                config['when_ready'](mock.Mock())
+                config['on_exit'](mock.Mock())
+        jobs = [call.args[0][2:] for call in popen.call_args_list]
+        self.assertIn(['purge_sessions', '--every', '3600'], jobs)
+        self.assertIn(['compact_tombstones', '--every', '86400'], jobs)
+        self.assertEqual(popen.return_value.terminate.call_count, len(jobs))
+
+        with mock.patch.dict('os.environ', {'GUNICORN_MAINTENANCE': '0'}), mock.patch('subprocess.Popen') as popen:
+            config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+            config['when_ready'](mock.Mock())
+        popen.assert_not_called()
+
+
+class AuthThrottleTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+
+    def login(self, username='cook', password='wrong', ip='10.0.0.1'):
+        return self.client.post(reverse('login'), {'username': username, 'password': password},
+                                format='json', REMOTE_ADDR=ip)
+
+    @mock.patch.object(AuthUsernameThrottle, 'THROTTLE_RATES', {'auth_username': '3/min'})
+    def test_username_throttle_applies_across_ips(self):
+        for i in range(3):
+            self.assertEqual(self.login(ip=f'10.0.0.{i}').status_code, 401)
+        with mock.patch.object(hashing_gate, 'run') as run:
+            response = self.login('Cook', 'secret-pass-123', ip='10.0.0.9')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        run.assert_not_called()
+        self.assertEqual(self.login('someone-else').status_code, 401)
+
+    @mock.patch.object(AuthIPThrottle, 'THROTTLE_RATES', {'auth_ip': '2/min'})
+    def test_ip_throttle_covers_register(self):
+        self.assertEqual(self.login().status_code, 401)
+        data = {'username': 'new', 'email': 'new@example.com', 'password': 'pw-123456'}
+        self.assertEqual(self.client.post(reverse('register'), data, format='json', REMOTE_ADDR='10.0.0.1').status_code, 201)
+        self.assertEqual(self.login(ip='10.0.0.1').status_code, 429)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, 401)
+
+    def test_registered_password_is_hashed(self):
+        data = {'username': 'new', 'email': 'New@EXAMPLE.com', 'password': 'pw-123456'}
+        self.assertEqual(self.client.post(reverse('register'), data, format='json').status_code, 201)
+        user = User.objects.get(username='new')
+        self.assertEqual(user.email, 'New@example.com')
+        self.assertTrue(user.check_password('pw-123456'))
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 200)
+
+    @override_settings(PASSWORD_HASHING={'MAX_CONCURRENCY': 1, 'QUEUE_TIMEOUT': 0.01})
+    def test_busy_hashing_gate_answers_503(self):
+        with hashing_gate.slot():
+            response = self.login(password='secret-pass-123')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.login(password='secret-pass-123').status_code, 200)
+
+    def test_production_default_leaves_threads_for_other_requests(self):
+        for threads in (2, 4, 8):
+            with mock.patch.dict('os.environ', {'GUNICORN_THREADS': str(threads)}):
+                production = runpy.run_module('backend.settings_production')
+            hashing = {**production['PASSWORD_HASHING'], 'QUEUE_TIMEOUT': 0.01}
+            with self.subTest(threads=threads), self.settings(PASSWORD_HASHING=hashing), ExitStack() as busy:
+                self.assertLess(hashing_gate.max_concurrency, threads)
+                for _ in range(hashing_gate.max_concurrency):
+                    busy.enter_context(hashing_gate.slot())
+                self.assertEqual(self.login(password='secret-pass-123').status_code, 503)
+                self.assertEqual(self.client.get(reverse('recipe-list')).status_code, 200)
+
+
+class AsyncReadTests(QueryBudgetTestCase):
+    """The ASGI read path must answer exactly like the DRF viewsets."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.other = User.objects.create_user('other', 'other@example.com', 'secret-pass-123')
+        self.recipe = self.make_recipe(self.user)
+        self.private = self.make_recipe(self.other, is_public=False)
+        self.mine = self.make_recipe(self.user, is_public=False)
+        self.grocery_list = self.make_grocery_list(self.user)
+
+    @contextmanager
+    def without_sync_reads(self):
+        # Any GET that falls through to DRF fails the test
+        with mock.patch.object(RecipeViewSet, 'list', side_effect=AssertionError), \
+                mock.patch.object(RecipeViewSet, 'retrieve', side_effect=AssertionError), \
+                mock.patch.object(MyRecipeViewSet, 'list', side_effect=AssertionError), \
+                mock.patch.object(MyRecipeViewSet, 'retrieve', side_effect=AssertionError), \
+                mock.patch.object(GroceryListViewSet, 'list', side_effect=AssertionError), \
+                mock.patch.object(GroceryListViewSet, 'retrieve', side_effect=AssertionError):
+            yield
+
+    async def assertSameAsSync(self, url, **params):
+        expected = await sync_to_async(self.client.get)(url, params)
+        with self.without_sync_reads():
+            response = await self.async_client.get(url, params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response.get('ETag'), expected.get('ETag'))
+        return response
+
+    async def test_anonymous_recipe_reads(self):
+        await self.assertSameAsSync(reverse('recipe-list'))
+        await self.assertSameAsSync(reverse('recipe-list'), page_size=1)
+        await self.assertSameAsSync(reverse('recipe-detail', args=[self.recipe.pk]))
+        forbidden = await self.assertSameAsSync(reverse('recipe-detail', args=[self.private.pk]))
+        self.assertEqual(forbidden.status_code, 403)
+        missing = await self.assertSameAsSync(reverse('recipe-detail', args=[0]))
+        self.assertEqual(missing.status_code, 404)
+        denied = await self.assertSameAsSync(reverse('my-recipe-list'))
+        self.assertEqual(denied.status_code, 403)
+
+    async def test_authenticated_reads(self):
+        await sync_to_async(self.client.force_login)(self.user)
+        await self.async_client.aforce_login(self.user)
+        listing = await self.assertSameAsSync(reverse('recipe-list'))
+        self.assertIn(self.mine.pk, [recipe['id'] for recipe in listing.json()])
+        await self.assertSameAsSync(reverse('recipe-detail', args=[self.mine.pk]))
+        await self.assertSameAsSync(reverse('my-recipe-list'))
+        await self.assertSameAsSync(reverse('my-recipe-detail', args=[self.recipe.pk]))
+        other = await self.assertSameAsSync(reverse('my-recipe-detail', args=[self.private.pk]))
+        self.assertEqual(other.status_code, 404)
+        await self.assertSameAsSync(reverse('grocery-list-list'))
+        await self.assertSameAsSync(reverse('grocery-list-detail', args=[self.grocery_list.pk]))
+
+    async def test_revalidation_returns_304(self):
+        url = reverse('recipe-detail', args=[self.recipe.pk])
+        response = await self.async_client.get(url)
+        with self.without_sync_reads():
+            cached = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+        url = reverse('recipe-list')
+        response = await self.async_client.get(url)
+        cached = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+    async def test_writes_and_browsable_api_use_the_viewsets(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse('my-recipe-detail', args=[self.recipe.pk])
+        response = await self.async_client.patch(url, {'title': 'Crepes'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((await self.async_client.get(url)).json()['title'], 'Crepes')
+
+        response = await self.async_client.get(url, headers={'Accept': 'text/html'})
+        self.assertIn('text/html', response['Content-Type'])
+
+
+class DatabasePoolConfigTests(SimpleTestCase):
+
+    def test_pool_is_off_by_default(self):
+        self.assertIsNone(pool_options({}, threads=4))
+        self.assertIsNone(pool_options({'DB_POOL': '0', 'DB_CONN_MAX_AGE': '600'}, threads=4))
+
+    def test_pool_is_sized_from_thread_count(self):
+        options = pool_options({'DB_POOL': '1'}, threads=8)
+        self.assertEqual((options['min_size'], options['max_size']), (1, 8))
+        options = pool_options({'DB_POOL': '1', 'DB_POOL_MAX_SIZE': '3', 'DB_POOL_TIMEOUT': '0.5'}, threads=8)
+        self.assertEqual((options['max_size'], options['timeout']), (3, 0.5))
+
+    def test_misconfiguration_fails_fast(self):
+        for environ in [
+            {'DB_POOL_MAX_SIZE': '0'},
+            {'DB_POOL_MIN_SIZE': '5', 'DB_POOL_MAX_SIZE': '2'},
+            {'DB_POOL_TIMEOUT': '0'},
+            {'DB_POOL_MAX_SIZE': 'lots'},
+            {'DB_CONN_MAX_AGE': '60'},
+        ]:
+            with self.subTest(environ), self.assertRaises(ImproperlyConfigured):
+                pool_options({'DB_POOL': '1', **environ}, threads=4)
+
+    def test_capacity_check(self):
+        databases = {'default': {'OPTIONS': {'pool': {'max_size': 4}}}, 'other': {'OPTIONS': {}}}
+        check_pool_capacity(5, databases, limit=20)
+        with self.assertRaisesMessage(ImproperlyConfigured, '6 workers x DB_POOL_MAX_SIZE 4 = 24'):
+            check_pool_capacity(6, databases, limit=20)
+        with self.settings(DATABASE_MAX_CONNECTIONS=None):
+            check_pool_capacity(100, databases)
+
+    def test_metrics(self):
+        metrics = PoolMetrics()
+        metrics.record_checkout(0.01)
+        metrics.record_checkout(0.03)
+        metrics.record_timeout(5.0)
+        stats = metrics.as_dict()
+        self.assertEqual((stats['checkouts'], stats['timeouts'], stats['max_wait_seconds']), (2, 1, 0.03))
+        self.assertAlmostEqual(stats['wait_seconds_total'], 5.04)
+
+
+class HealthCheckTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        health_probe.configure()
+
+    def test_liveness_does_no_io(self):
+        with self.assertMaxQueries(0), mock.patch.object(health_probe, 'run_once') as run_once:
+            response = self.client.get(reverse('health-live'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'status': 'alive'})
+        run_once.assert_not_called()
+
+    def test_readiness_is_probed_once_per_interval(self):
+        with self.assertMaxQueries(1):
+            for _ in range(5):
+                response = self.client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'ready')
+        self.assertEqual(set(response.data['checks']), {'database', 'cache:responses'})
+        self.assertEqual(set(response.data['latency_ms']['database']), {'p50', 'p95', 'p99'})
+
+        # Without the background thread, a request after the interval probes again
+        with mock.patch('recipeApp.health.time.monotonic', return_value=health_probe._result[0] + 10):
+            with self.assertMaxQueries(1) as stats:
+                self.client.get(reverse('health-ready'))
+        self.assertEqual(stats.count, 1)
+
+    def test_failures_do_not_leak_error_messages(self):
+        with mock.patch.object(health_probe, '_check_database', side_effect=RuntimeError('password=hunter2')), \
+                self.assertLogs('recipeApp.health', 'WARNING'):
+            ready = self.client.get(reverse('health-ready'))
+            legacy = self.client.get(reverse('health-check'))
+        self.assertEqual(ready.status_code, 503)
+        self.assertEqual(ready.data['checks']['database'], {'status': 'error', 'error': 'RuntimeError'})
+        self.assertEqual(legacy.status_code, 503)
+        self.assertEqual(legacy.data['database'], 'disconnected')
+        self.assertNotIn('hunter2', ready.content.decode() + legacy.content.decode())
+
+    def test_stale_probe_is_not_ready(self):
+        health_probe.run_once()
+        with mock.patch.object(health_probe, '_needs_probe', return_value=False), \
+                mock.patch('recipeApp.health.time.monotonic', return_value=health_probe._result[0] + 60):
+            response = self.client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, 503)
+
+    def test_percentiles(self):
+        self.assertEqual(percentiles([]), {})
+        samples = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(percentiles(samples), {'p50': 51.0, 'p95': 96.0, 'p99': 100.0})
+
+
+class MetricsTests(QueryBudgetTestCase):
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_recorded_per_route(self):
+        user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.make_recipe(user)
+        labels = {'route': 'recipe-list', 'method': 'GET'}
+        before = {
+            'count': self.sample('pantrytostore_http_requests_total', status='200', **labels),
+            'queries': self.sample('pantrytostore_http_request_db_queries_sum', **labels),
+            'bytes': self.sample('pantrytostore_http_response_size_bytes_sum', **labels),
+            'serializer': self.sample('pantrytostore_http_request_serializer_duration_seconds_count', **labels),
+        }
+        response = self.client.get(reverse('recipe-list'))
+
+        self.assertEqual(self.sample('pantrytostore_http_requests_total', status='200', **labels), before['count'] + 1)
+        self.assertEqual(self.sample('pantrytostore_http_request_db_queries_sum', **labels), before['queries'] + 1)
+        self.assertEqual(self.sample('pantrytostore_http_response_size_bytes_sum', **labels),
+                         before['bytes'] + len(response.content))
+        self.assertEqual(
+            self.sample('pantrytostore_http_request_serializer_duration_seconds_count', **labels),
+            before['serializer'] + 1,
+        )
+        self.assertGreater(self.sample('pantrytostore_http_request_serializer_duration_seconds_sum', **labels), 0)
+
+    async def test_serializer_time_is_recorded_under_asgi(self):
+        user = await sync_to_async(User.objects.create_user)('cook', 'cook@example.com', 'secret-pass-123')
+        await sync_to_async(self.make_recipe)(user)
+        labels = {'route': 'recipe-list', 'method': 'GET'}
+        before = {
+            'count': self.sample('pantrytostore_http_request_serializer_duration_seconds_count', **labels),
+            'sum': self.sample('pantrytostore_http_request_serializer_duration_seconds_sum', **labels),
+        }
+        with mock.patch.object(RecipeViewSet, 'list', side_effect=AssertionError):
+            response = await self.async_client.get(reverse('recipe-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.sample('pantrytostore_http_request_serializer_duration_seconds_count', **labels),
+            before['count'] + 1,
+        )
+        self.assertGreater(
+            self.sample('pantrytostore_http_request_serializer_duration_seconds_sum', **labels), before['sum'],
+        )
+
+    def test_serializer_time_survives_copied_contexts(self):
+        recipe = self.make_recipe(User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123'))
+
+        def get_response(request):
+            # As in a task or an adapter thread: changes to the copy never come back
+            contextvars.copy_context().run(lambda: RecipeSerializer(recipe).data)
+            return HttpResponse()
+
+        labels = {'route': 'unmatched', 'method': 'GET'}
+        before = self.sample('pantrytostore_http_request_serializer_duration_seconds_sum', **labels)
+        MetricsMiddleware(get_response)(APIRequestFactory().get('/'))
+        self.assertGreater(self.sample('pantrytostore_http_request_serializer_duration_seconds_sum', **labels), before)
+
+    def test_unknown_paths_and_methods_share_series(self):
+        self.client.get('/api/does-not-exist/')
+        self.client.generic('PURGE', reverse('recipe-list'))
+        self.assertGreater(self.sample('pantrytostore_http_requests_total',
+                                       route='unmatched', method='GET', status='404'), 0)
+        self.assertGreater(self.sample('pantrytostore_http_requests_total',
+                                       route='recipe-list', method='OTHER', status='405'), 0)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('health-live'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('pantrytostore_http_request_duration_seconds_bucket{le="0.005",method="GET",route="health-live"}',
+                      response.content.decode())
+
+    def test_metrics_endpoint_refuses_other_peers(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5').status_code, 403)
+        # Relayed by a proxy on loopback: the peer address says nothing about the client
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_X_FORWARDED_FOR='203.0.113.5').status_code, 403)
+        with self.settings(METRICS={'ALLOWED_NETWORKS': ['10.0.0.0/8']}):
+            self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3').status_code, 200)
+
+    @override_settings(METRICS={'ALLOWED_NETWORKS': [], 'TOKEN': 'scrape-secret'})
+    def test_metrics_endpoint_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+
+class SyntheticDataTests(QueryBudgetTestCase):
+
+    def contents(self, prefix):
+        recipes = Recipe.objects.filter(created_by__username__startswith=f'{prefix}-').order_by('id')
+        return [
+            (recipe.created_by.username.split('-')[1], recipe.title, recipe.is_public,
+             [(i.name, i.unit, i.quantity) for i in recipe.ingredients.order_by('id')])
+            for recipe in recipes.select_related('created_by')
+        ]
+
+    def test_same_seed_generates_the_same_rows(self):
+        first = generate(20, seed=7, prefix='a', chunk_size=6)
+        second = generate(20, seed=7, prefix='b', chunk_size=6)
+        self.assertEqual(first.as_dict(), second.as_dict())
+        self.assertEqual(self.contents('a'), self.contents('b'))
+        generate(20, seed=8, prefix='c', chunk_size=6)
+        self.assertNotEqual(self.contents('a'), self.contents('c'))
+
+    def test_report_matches_the_database(self):
+        report = generate(30, share_ratio=0.5, prefix='s', chunk_size=8)
+        self.assertEqual(report.as_dict(), {
+            'users': User.objects.filter(username__startswith='s-').count(),
+            'recipes': Recipe.objects.count(),
+            'ingredients': Ingredient.objects.count(),
+            'grocery_lists': GroceryList.objects.count(),
+            'grocery_items': GroceryItem.objects.count(),
+            'shares': SharedGroceryList.objects.count(),
+        })
+        self.assertGreater(report.shares, 0)
+        self.assertFalse(SharedGroceryList.objects.filter(user=F('list__created_by')).exists())
+        self.assertTrue(self.client.login(username='s-0000029', password=DEFAULT_PASSWORD))
+
+    def test_command_refuses_an_existing_prefix(self):
+        out = StringIO()
+        call_command('generate_data', users=3, prefix='cmd', stdout=out)
+        self.assertIn('Generated 3 users', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_data', users=3, prefix='cmd', stdout=out)
+
+
+class FastSerializationTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123', first_name='Zoë')
+        for i in range(3):
+            self.make_recipe(self.user, is_public=bool(i % 2))
+        Recipe.objects.filter(pk=self.make_recipe(self.user).pk).update(description='Line\u2028separator')
+
+    def test_projection_matches_the_serializer(self):
+        queryset = recipe_list_queryset(Recipe.objects.all()).order_by('-created_at', '-id')
+        expected = RecipeListSerializer(list(queryset), many=True).data
+        self.assertEqual(recipe_list_projection.serialize(list(recipe_list_projection.project(queryset))), expected)
+
+    def test_list_responses_render_the_same_bytes(self):
+        self.client.force_login(self.user)
+        queryset = recipe_list_queryset(Recipe.objects.all()).order_by('-created_at', '-id')
+        expected = JSONRenderer().render(RecipeListSerializer(list(queryset), many=True).data)
+        for url in (reverse('recipe-list'), reverse('my-recipe-list')):
+            self.assertEqual(self.client.get(url).content, expected)
+        paginated = self.client.get(reverse('recipe-list'), {'page_size': 2})
+        self.assertEqual(json.loads(paginated.content)['results'], json.loads(expected)[:2])
+
+    def test_renderer_matches_the_stock_renderer(self):
+        data = {
+            'floats': [0.1, 2.5, 1e16, 1e-05, -0.0], 'big': 2 ** 70, 'text': 'Zoë \u2028 \u2029 😀',
+            'when': timezone.now(), 'day': timezone.now().date(), 'price': Decimal('1.10'), 'keys': {1: 'one'},
+            'lazy': NotAuthenticated.default_detail, 'items': (1, [2, {'three': None}]),
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json; indent=4'),
+                         JSONRenderer().render(data, 'application/json; indent=4'))
+
+    def test_nested_many_fields_cannot_be_projected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            Projection(RecipeSerializer).columns
+
+
+class SparseFieldsTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.recipe = self.make_recipe(self.user)
+        self.private = self.make_recipe(self.user, is_public=False)
+        self.grocery_list = self.make_grocery_list(self.user)
+        self.client.force_login(self.user)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        return response, ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def test_fields_narrow_the_response_and_the_query(self):
+        response, sql = self.get(reverse('recipe-list'), fields='id,title')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([list(recipe) for recipe in response.json()], [['id', 'title']] * 2)
+        self.assertNotIn('instructions', sql)
+        self.assertNotIn('JOIN', sql)
+
+        response, sql = self.get(reverse('my-recipe-detail', args=[self.recipe.pk]), fields='title,instructions')
+        self.assertEqual(response.json(), {'title': 'Pancakes', 'instructions': 'Mix and fry'})
+        self.assertNotIn('recipeApp_ingredient', sql)
+
+    def test_expand_adds_relations(self):
+        with self.assertMaxQueries(4):
+            response = self.client.get(reverse('recipe-list'), {'expand': 'ingredients'})
+        recipe = response.json()[0]
+        self.assertEqual(list(recipe), [*RecipeListSerializer.Meta.fields, 'ingredients'])
+        self.assertEqual(len(recipe['ingredients']), 3)
+
+        response = self.client.get(reverse('recipe-list'), {'fields': 'id', 'expand': 'created_by', 'page_size': 1})
+        self.assertEqual(response.json()['results'], [{'id': self.private.pk, 'created_by': {
+            'id': self.user.pk, 'username': 'cook', 'email': 'cook@example.com', 'first_name': '', 'last_name': '',
+        }}])
+
+    def test_grocery_lists(self):
+        response, sql = self.get(reverse('grocery-list-list'), fields='id,name')
+        self.assertEqual(response.json(), [{'id': self.grocery_list.pk, 'name': 'Weekly'}])
+        self.assertNotIn('recipeApp_groceryitem', sql)
+        response = self.client.get(reverse('grocery-list-detail', args=[self.grocery_list.pk]), {'fields': 'id', 'expand': 'items'})
+        self.assertEqual(list(response.json()), ['id', 'items'])
+        self.assertEqual(len(response.json()['items']), 3)
+
+    def test_visibility_still_applies(self):
+        self.client.logout()
+        response = self.client.get(reverse('recipe-detail', args=[self.private.pk]), {'fields': 'title'})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('recipe-search'), {'q': 'pancakes', 'fields': 'id'})
+        self.assertEqual(response.json()['results'], [{'id': self.recipe.pk}])
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get(reverse('recipe-list'), {'fields': 'id,secret', 'expand': 'title'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['fields'])
+        self.assertIn('title', response.json()['expand'])
+
+    async def test_async_views_hand_selections_to_the_viewsets(self):
+        url = reverse('recipe-detail', args=[self.recipe.pk])
+        response = await self.async_client.get(url, {'fields': 'id,title'})
+        self.assertEqual(response.json(), {'id': self.recipe.pk, 'title': 'Pancakes'})
+
+
+class RecordingBroker(InProcessBroker):
+    """In-process broker that also keeps everything published through it."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.published = []
+
+    def publish(self, list_id, events):
+        self.published.append((list_id, [event['type'] for event in events]))
+        super().publish(list_id, events)
+
+
+@override_settings(GROCERY_EVENTS={
+    **settings.GROCERY_EVENTS, 'BROKER': 'recipeApp.tests.RecordingBroker', 'HEARTBEAT': 0.05,
+})
+class GroceryListSharingTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.other = User.objects.create_user('other', 'other@example.com', 'secret-pass-123')
+        self.grocery_list = self.make_grocery_list(self.user)
+        self.detail_url = reverse('grocery-list-detail', args=[self.grocery_list.pk])
+        self.shares_url = reverse('grocery-list-shares', args=[self.grocery_list.pk])
+        self.events_url = reverse('grocery-list-events', args=[self.grocery_list.pk])
+        # A fresh broker for each test
+        grocery_list_events.configure()
+
+    def share(self, permissions):
+        self.client.force_login(self.user)
+        response = self.client.post(self.shares_url, {'username': 'other', 'permissions': permissions}, format='json')
+        self.client.force_login(self.other)
+        return response
+
+    def test_view_and_edit_permissions(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+
+        self.assertEqual(self.share('view').status_code, 201)
+        self.assertEqual([grocery_list['id'] for grocery_list in self.client.get(reverse('grocery-list-list')).json()],
+                         [self.grocery_list.pk])
+        self.assertEqual(self.client.get(self.detail_url).status_code, 200)
+        self.assertEqual(self.client.patch(self.detail_url, {'name': 'Mine now'}, format='json').status_code, 403)
+
+        self.assertEqual(self.share('edit').status_code, 200)
+        self.assertEqual(self.client.patch(self.detail_url, {'name': 'Ours'}, format='json').status_code, 200)
+        self.assertEqual(self.client.get(self.shares_url).status_code, 403)
+        self.assertEqual(self.client.delete(self.detail_url).status_code, 403)
+        self.assertEqual(SharedGroceryList.objects.get().permissions, 'edit')
+
+    def test_owner_cannot_share_with_themselves(self):
+        self.client.force_login(self.user)
+        response = self.client.post(self.shares_url, {'username': 'cook', 'permissions': 'edit'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('username', response.json())
+
+    def test_recipients_can_leave_a_list(self):
+        self.share('view')
+        unshare_url = reverse('grocery-list-unshare', args=[self.grocery_list.pk, self.user.pk])
+        self.assertEqual(self.client.delete(unshare_url).status_code, 403)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('grocery-list-unshare', args=[self.grocery_list.pk, self.other.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(grocery_list_events.broker.published, [(self.grocery_list.pk, ['revoked'])])
+        self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+
+    def test_writes_publish_item_deltas(self):
+        self.client.force_login(self.user)
+        items = self.client.get(self.detail_url).json()['items']
+        items[0]['quantity'] = 5
+        items[-1] = {'name': 'Lemon', 'unit': 'piece', 'quantity': 1}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.detail_url, {'name': 'Party', 'items': items}, format='json')
+            self.client.patch(self.detail_url, {'name': 'Party'}, format='json')
+            self.client.delete(self.detail_url)
+        self.assertEqual(grocery_list_events.broker.published, [
+            (self.grocery_list.pk, ['list', 'added', 'changed', 'removed']),
+            (self.grocery_list.pk, ['deleted']),
+        ])
+
+    def test_item_routes_write_only_the_items_they_name(self):
+        self.client.force_login(self.user)
+        items_url = reverse('grocery-list-items', args=[self.grocery_list.pk])
+        first, second, third = self.grocery_list.items.order_by('pk')
+        etag = self.client.get(self.detail_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('grocery-list-item', args=[self.grocery_list.pk, first.pk]),
+                                         {'checked': True}, format='json')
+            self.assertEqual(response.json()['checked'], True)
+            response = self.client.patch(items_url, [
+                {'id': third.pk, 'quantity': 9}, {'id': second.pk, 'quantity': second.quantity},
+            ], format='json')
+            self.assertEqual([item['id'] for item in response.json()], [third.pk])
+            response = self.client.post(items_url, {'name': 'Lemon', 'unit': 'piece', 'quantity': 1}, format='json')
+            self.assertEqual(response.status_code, 201)
+            response = self.client.delete(reverse('grocery-list-item', args=[self.grocery_list.pk, second.pk]))
+            self.assertEqual(response.status_code, 204)
+        self.assertEqual(grocery_list_events.broker.published, [
+            (self.grocery_list.pk, ['checked']),
+            (self.grocery_list.pk, ['changed']),
+            (self.grocery_list.pk, ['added']),
+            (self.grocery_list.pk, ['removed']),
+        ])
+        self.assertNotEqual(self.client.get(self.detail_url)['ETag'], etag)
+        self.assertEqual(Tombstone.objects.get().object_id, second.pk)
+        self.assertEqual(
+            sorted(self.grocery_list.items.values_list('name', 'quantity', 'checked')),
+            [('Lemon', 1, False), ('item 0', 1, True), ('item 2', 9, False)],
+        )
+
+        missing_url = reverse('grocery-list-item', args=[self.grocery_list.pk, second.pk])
+        self.assertEqual(self.client.patch(missing_url, {'checked': True}, format='json').status_code, 404)
+        self.assertEqual(self.client.delete(missing_url).status_code, 404)
+        self.assertEqual(self.client.patch(items_url, [{'quantity': 2}], format='json').status_code, 400)
+        response = self.client.patch(items_url, [{'id': first.pk, 'checked': False}, {'id': first.pk}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(self.grocery_list.items.get(pk=first.pk).checked)
+
+    def test_batch_item_update_keeps_concurrent_changes(self):
+        self.client.force_login(self.user)
+        first, second, third = self.grocery_list.items.order_by('pk')
+        bulk_update = GroceryItem.objects.bulk_update
+
+        def tick_first_meanwhile(objs, fields, **kwargs):
+            # Another request ticks the first item after this one read it
+            GroceryItem.objects.filter(pk=first.pk).update(checked=True)
+            return bulk_update(objs, fields, **kwargs)
+
+        with CaptureQueriesContext(connection) as queries, \
+                mock.patch.object(GroceryItem.objects, 'bulk_update', side_effect=tick_first_meanwhile):
+            response = self.client.patch(reverse('grocery-list-items', args=[self.grocery_list.pk]), [
+                {'id': first.pk, 'quantity': 5}, {'id': second.pk, 'checked': True}, {'id': third.pk, 'quantity': 7},
+            ], format='json')
+        self.assertEqual(response.status_code, 200)
+        statements = [query['sql'] for query in queries.captured_queries]
+        counter = next(i for i, sql in enumerate(statements) if 'recipeapp_changecounter' in sql.lower())
+        read = next(i for i, sql in enumerate(statements) if sql.startswith('SELECT') and 'recipeapp_groceryitem' in sql.lower())
+        self.assertLess(counter, read)
+        # The quantity change to the first item didn't write back its stale checked state
+        self.assertEqual(
+            list(self.grocery_list.items.order_by('pk').values_list('quantity', 'checked')),
+            [(5, True), (second.quantity, True), (7, False)],
+        )
+
+    def test_item_routes_need_an_edit_share(self):
+        item = self.grocery_list.items.first()
+        item_url = reverse('grocery-list-item', args=[self.grocery_list.pk, item.pk])
+        self.share('view')
+        self.assertEqual(self.client.patch(item_url, {'checked': True}, format='json').status_code, 403)
+        self.share('edit')
+        self.assertEqual(self.client.patch(item_url, {'checked': True}, format='json').status_code, 200)
+
+    def test_stream(self):
+        self.share('view')
+        response = self.client.get(self.events_url, headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        chunks = iter(response.streaming_content)
+        self.assertIn(b'event: ready\n', next(chunks))
+        self.assertEqual(next(chunks), b': heartbeat\n\n')
+
+        broker = grocery_list_events.broker
+        broker.publish(self.grocery_list.pk, [{'type': 'revoked', 'user': self.user.pk}])
+        broker.publish(self.grocery_list.pk, [{'type': 'removed', 'item': {'id': 1}}])
+        self.assertEqual(next(chunks), b'event: removed\ndata: {"type":"removed","item":{"id":1}}\n\n')
+        broker.publish(self.grocery_list.pk, [{'type': 'deleted', 'list': {'id': self.grocery_list.pk}}])
+        self.assertIn(b'event: deleted\n', next(chunks))
+        self.assertEqual(list(chunks), [])
+        self.assertEqual(broker.subscriber_count(self.grocery_list.pk), 0)
+
+    def test_streams_per_process_are_capped(self):
+        self.share('view')
+        with self.settings(GROCERY_EVENTS={**settings.GROCERY_EVENTS, 'HEARTBEAT': 0.05, 'MAX_THREAD_STREAMS': 1}):
+            first = self.client.get(self.events_url)
+            self.assertIn(b'event: ready\n', next(iter(first.streaming_content)))
+            busy = self.client.get(self.events_url)
+            self.assertEqual(busy.status_code, 503)
+            self.assertEqual(busy['Retry-After'], '3')
+            first.close()
+            second = self.client.get(self.events_url)
+            self.assertIn(b'event: ready\n', next(iter(second.streaming_content)))
+            second.close()
+
+    def test_several_workers_need_a_cross_process_broker(self):
+        check_event_broker(1)
+        with self.assertRaisesMessage(ImproperlyConfigured, 'Set REDIS_URL'):
+            check_event_broker(4)
+        check_event_broker(4, {'BROKER': 'recipeApp.events.RedisBroker'})
+
+    async def test_async_stream(self):
+        await sync_to_async(self.share)('view')
+        await self.async_client.aforce_login(self.other)
+        with mock.patch.object(GroceryListViewSet, 'events', side_effect=AssertionError):
+            response = await self.async_client.get(self.events_url)
+        chunks = aiter(response.streaming_content)
+        self.assertIn(b'"updated_at"', await anext(chunks))
+        grocery_list_events.broker.publish(self.grocery_list.pk, [{'type': 'revoked', 'user': self.other.pk}])
+        self.assertIn(b'event: revoked\n', await anext(chunks))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(chunks)
+        self.assertEqual(grocery_list_events.broker.subscriber_count(self.grocery_list.pk), 0)
+
+    def test_streams_fall_back_to_resync(self):
+        subscription = grocery_list_events.subscribe(self.grocery_list.pk, self.user.pk)
+        grocery_list_events.broker.publish(self.grocery_list.pk, [{'type': 'removed', 'item': {'id': 1}}] * 101)
+        self.assertEqual(subscription.wait(0), [{'type': 'resync'}])
+        subscription.close()
+
+
+class ChangeFeedTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook', 'cook@example.com', 'secret-pass-123')
+        self.other = User.objects.create_user('other', 'other@example.com', 'secret-pass-123')
+        self.recipe = self.make_recipe(self.user)
+        self.grocery_list = self.make_grocery_list(self.user)
+        self.make_recipe(self.other)
+        self.client.force_login(self.user)
+
+    def sync(self, since=None, status=200):
+        response = self.client.get(reverse('sync'), {} if since is None else {'since': since})
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def ids(self, feed):
+        return {key: [row['id'] for row in rows] for key, rows in feed.items() if key not in ('cursor', 'has_more', 'deleted')}
+
+    def sync_all(self, since=None):
+        """Follow has_more to the end; every page, then the ids of everything they sent, in order."""
+        pages = [self.sync(since)]
+        while pages[-1]['has_more']:
+            pages.append(self.sync(pages[-1]['cursor']))
+        sent = {key: [] for key in self.ids(pages[0])}
+        deleted = {key: [] for key in sent}
+        for page in pages:
+            for key, ids in self.ids(page).items():
+                sent[key] += ids
+            for key, ids in page['deleted'].items():
+                deleted[key] += ids
+        return pages, sent, deleted
+
+    def test_full_sync(self):
+        with self.assertMaxQueries(8):
+            feed = self.sync()
+        self.assertEqual(self.ids(feed), {
+            'recipes': [self.recipe.pk],
+            'ingredients': list(self.recipe.ingredients.values_list('pk', flat=True)),
+            'grocery_lists': [self.grocery_list.pk],
+            'grocery_items': list(self.grocery_list.items.values_list('pk', flat=True)),
+        })
+        self.assertNotIn('ingredients', feed['recipes'][0])
+        self.assertEqual(feed['ingredients'][0]['recipe'], self.recipe.pk)
+        self.assertEqual(feed['deleted'], {'recipes': [], 'ingredients': [], 'grocery_lists': [], 'grocery_items': []})
+
+    def test_incremental_sync_returns_changes_and_deletions(self):
+        cursor = self.sync()['cursor']
+        self.assertEqual(self.ids(self.sync(cursor)), dict.fromkeys(['recipes', 'ingredients', 'grocery_lists', 'grocery_items'], []))
+
+        ingredients = self.client.get(reverse('my-recipe-detail', args=[self.recipe.pk])).json()['ingredients']
+        ingredients[0]['quantity'] = 10
+        removed = ingredients.pop()
+        self.client.patch(reverse('my-recipe-detail', args=[self.recipe.pk]), {'ingredients': ingredients}, format='json')
+        self.client.delete(reverse('grocery-list-detail', args=[self.grocery_list.pk]))
+
+        feed = self.sync(cursor)
+        self.assertEqual(self.ids(feed), {
+            'recipes': [self.recipe.pk], 'ingredients': [ingredients[0]['id']], 'grocery_lists': [], 'grocery_items': [],
+        })
+        self.assertEqual(feed['deleted'], {
+            'recipes': [], 'ingredients': [removed['id']], 'grocery_lists': [self.grocery_list.pk], 'grocery_items': [],
+        })
+        self.assertEqual(self.sync(feed['cursor'])['deleted']['grocery_lists'], [])
+
+    def test_sharing_moves_lists_in_and_out_of_the_feed(self):
+        self.client.force_login(self.other)
+        cursor = self.sync()['cursor']
+        self.client.force_login(self.user)
+        shares_url = reverse('grocery-list-shares', args=[self.grocery_list.pk])
+        self.client.post(shares_url, {'username': 'other', 'permissions': 'view'}, format='json')
+
+        self.client.force_login(self.other)
+        feed = self.sync(cursor)
+        self.assertEqual(self.ids(feed)['grocery_lists'], [self.grocery_list.pk])
+        self.assertEqual(len(feed['grocery_items']), 3)
+
+        self.client.delete(reverse('grocery-list-unshare', args=[self.grocery_list.pk, self.other.pk]))
+        feed = self.sync(feed['cursor'])
+        self.assertEqual(feed['deleted']['grocery_lists'], [self.grocery_list.pk])
+
+        # Shared again before the client synced: the list is back, not deleted
+        self.client.force_login(self.user)
+        self.client.post(shares_url, {'username': 'other', 'permissions': 'edit'}, format='json')
+        self.client.delete(reverse('grocery-list-unshare', args=[self.grocery_list.pk, self.other.pk]))
+        self.client.post(shares_url, {'username': 'other', 'permissions': 'edit'}, format='json')
+        self.client.force_login(self.other)
+        feed = self.sync(feed['cursor'])
+        self.assertEqual(self.ids(feed)['grocery_lists'], [self.grocery_list.pk])
+        self.assertEqual(feed['deleted']['grocery_lists'], [])
+
+    def test_pages_cover_every_row_once(self):
+        full = self.sync()
+        self.assertFalse(full['has_more'])
+        cursor = full['cursor']
+        with self.settings(CHANGE_FEED={**settings.CHANGE_FEED, 'PAGE_SIZE': 2}):
+            pages, sent, deleted = self.sync_all()
+            # 1 recipe, 3 ingredients, 1 list and 3 items
+            self.assertEqual([len(sum(self.ids(page).values(), [])) for page in pages], [2, 2, 2, 2])
+            self.assertEqual(pages[-1]['cursor'], cursor)
+            self.assertEqual(sent, self.ids(full))
+
+            # Items that share a change_seq with a tombstone and with each other
+            self.client.post(reverse('grocery-list-items', args=[self.grocery_list.pk]),
+                             {'name': 'Milk', 'unit': 'l', 'quantity': 1}, format='json')
+            items = sorted(self.grocery_list.items.values_list('pk', flat=True))
+            self.client.delete(reverse('grocery-list-item', args=[self.grocery_list.pk, items[0]]))
+            self.client.patch(reverse('grocery-list-items', args=[self.grocery_list.pk]),
+                              [{'id': pk, 'checked': True} for pk in items[1:]], format='json')
+            self.client.patch(reverse('my-recipe-detail', args=[self.recipe.pk]), {'title': 'Renamed'}, format='json')
+            pages, sent, deleted = self.sync_all(cursor)
+        self.assertGreater(len(pages), 2)
+        self.assertEqual(sent['grocery_items'], items[1:])
+        self.assertEqual(sent['recipes'], [self.recipe.pk])
+        self.assertEqual(deleted['grocery_items'], [items[0]])
+        self.assertEqual(pages[-1]['cursor'], self.sync()['cursor'])
+        self.assertEqual(self.ids(self.sync(pages[-1]['cursor'])), dict.fromkeys(sent, []))
+
+    def test_paged_full_sync_sends_no_tombstones(self):
+        other_list = self.make_grocery_list(self.user)
+        self.client.delete(reverse('grocery-list-detail', args=[other_list.pk]))
+        item = self.grocery_list.items.first()
+        self.client.delete(reverse('grocery-list-item', args=[self.grocery_list.pk, item.pk]))
+        with self.settings(CHANGE_FEED={**settings.CHANGE_FEED, 'PAGE_SIZE': 2}):
+            first = self.sync()
+            self.assertTrue(first['cursor'].endswith('.full'))
+            # Compacting mid-pass doesn't expire a full sync's cursor
+            Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+            compact_tombstones()
+            pages, sent, deleted = self.sync_all(first['cursor'])
+        self.assertGreater(len(pages), 1)
+        self.assertEqual(first['deleted'], dict.fromkeys(sent, []))
+        self.assertEqual(deleted, dict.fromkeys(sent, []))
+        lists = self.ids(first)['grocery_lists'] + sent['grocery_lists']
+        self.assertEqual(lists, [self.grocery_list.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', 'the in-flight watermark is Postgres only')
+    def test_watermark_stops_below_writes_in_flight(self):
+        taken, release, seqs = threading.Event(), threading.Event(), []
+
+        def write():
+            with transaction.atomic():
+                seqs.append(next_change_seq())
+                taken.set()
+                release.wait(5)
+            connection.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            self.assertTrue(taken.wait(5))
+            later = next_change_seq()
+            self.assertLess(current_change_seq()[0], seqs[0])
+        finally:
+            release.set()
+            writer.join()
+        # The test's own transaction still holds ``later``
+        self.assertEqual(current_change_seq()[0], later - 1)
+
+    def test_bad_and_expired_cursors(self):
+        self.assertIn('error', self.sync('abc', status=400))
+        self.assertIn('error', self.sync(-1, status=400))
+        self.assertIn('error', self.sync('5.6.0.1', status=400))
+        self.assertIn('error', self.sync('5.1.9.1', status=400))
+        self.assertIn('error', self.sync('5.full', status=400))
+        cursor = int(self.sync()['cursor'])
+        self.sync(cursor + 1, status=410)
+
+        self.client.delete(reverse('my-recipe-detail', args=[self.recipe.pk]))
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        self.assertEqual(compact_tombstones(), 1)
+        self.sync(cursor, status=410)
+        self.assertEqual(self.sync(self.sync()['cursor'])['deleted']['recipes'], [])
+
+    def test_imports_enter_the_feed(self):
+        cursor = self.sync()['cursor']
+        line = json.dumps({'title': 'Soup', 'instructions': 'Boil', 'ingredients': [{'name': 'water', 'unit': 'l', 'quantity': 1}]})
+        self.client.post(reverse('my-recipe-import-ndjson'), line, content_type='application/x-ndjson')
+        feed = self.sync(cursor)
+        self.assertEqual([recipe['title'] for recipe in feed['recipes']], ['Soup'])
+        self.assertEqual([ingredient['name'] for ingredient in feed['ingredients']], ['water'])
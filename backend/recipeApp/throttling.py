@@ -0,0 +1,24 @@
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class AuthIPThrottle(SimpleRateThrottle):
+    """Limits auth attempts per client IP, checked before any password hashing."""
+    scope = 'auth_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class AuthUsernameThrottle(SimpleRateThrottle):
+    """Limits auth attempts per target username, however many IPs they come from."""
+    scope = 'auth_username'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not username or not isinstance(username, str):
+            return None
+        # Hashed so arbitrary usernames are safe as cache keys on every backend
+        ident = hashlib.md5(username.strip().lower().encode(), usedforsecurity=False).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -0,0 +1,104 @@
+"""
+Table-driven unit conversion for ingredient quantities.
+
+Every known unit maps to a dimension and a factor into that dimension's base
+unit (millilitres for volume, grams for mass). Units that aren't in the table
+("pieces", "cloves", "pinch") become their own dimension, so they only merge
+with the exact same unit.
+"""
+import re
+
+from .pantry import normalize_ingredient_name
+
+VOLUME = 'volume'
+MASS = 'mass'
+
+UNITS = {
+    VOLUME: {
+        1.0: ['ml', 'milliliter', 'millilitre', 'cc'],
+        10.0: ['cl', 'centiliter', 'centilitre'],
+        100.0: ['dl', 'deciliter', 'decilitre'],
+        1000.0: ['l', 'liter', 'litre'],
+        4.92892: ['tsp', 'teaspoon'],
+        14.7868: ['tbsp', 'tbs', 'tbl', 'tablespoon'],
+        29.5735: ['fl oz', 'floz', 'fluid ounce'],
+        236.588: ['cup'],
+        473.176: ['pint', 'pt'],
+        946.353: ['quart', 'qt'],
+        3785.41: ['gallon', 'gal'],
+    },
+    MASS: {
+        0.001: ['mg', 'milligram', 'milligramme'],
+        1.0: ['g', 'gr', 'gram', 'gramme'],
+        1000.0: ['kg', 'kilogram', 'kilogramme', 'kilo'],
+        28.3495: ['oz', 'ounce'],
+        453.592: ['lb', 'pound'],
+    },
+}
+
+# alias -> (dimension, factor to base unit)
+UNIT_TABLE = {
+    alias: (dimension, factor)
+    for dimension, factors in UNITS.items()
+    for factor, aliases in factors.items()
+    for alias in aliases
+}
+
+_UNIT_CLEAN_RE = re.compile(r'[.\s]+')
+
+
+def normalize_unit(unit):
+    """'Tbsp.' -> 'tbsp', 'Cups' -> 'cup', 'fl. oz' -> 'fl oz'."""
+    unit = _UNIT_CLEAN_RE.sub(' ', unit.strip().lower()).strip()
+    if unit in UNIT_TABLE:
+        return unit
+    if unit == 'lbs':
+        return 'lb'
+    return normalize_ingredient_name(unit)
+
+
+def unit_dimension(unit):
+    """Return (dimension, factor) for a unit; unknown units are their own dimension."""
+    unit = normalize_unit(unit)
+    return UNIT_TABLE.get(unit, (unit, 1.0))
+
+
+def convert(quantity, from_unit, to_unit):
+    from_dimension, from_factor = unit_dimension(from_unit)
+    to_dimension, to_factor = unit_dimension(to_unit)
+    if from_dimension != to_dimension:
+        raise ValueError(f'Cannot convert {from_unit!r} to {to_unit!r}')
+    return quantity * from_factor / to_factor
+
+
+def aggregate_ingredients(rows):
+    """
+    Merge ``(name, unit, quantity)`` rows that name the same ingredient in
+    compatible units.
+
+    Quantities are summed in the dimension's base unit and reported in the
+    unit of the first row seen for that ingredient, so a list that mixes
+    "1 cup" and "4 tbsp" of milk comes out as "1.25 cup". Returns a list of
+    ``(name, unit, quantity)`` in first-seen order.
+    """
+    return merge_compatible_units((normalize_ingredient_name(name), name, unit, quantity) for name, unit, quantity in rows)
+
+
+def merge_compatible_units(rows):
+    """
+    The same for ``(key, name, unit, quantity)`` rows, where rows with equal
+    ``key`` are the same ingredient.
+    """
+    totals = {}
+    for ingredient, name, unit, quantity in rows:
+        dimension, factor = unit_dimension(unit)
+        key = (ingredient, dimension)
+        entry = totals.get(key)
+        if entry is None:
+            totals[key] = [name, unit, factor, quantity * factor]
+        else:
+            entry[3] += quantity * factor
+    return [
+        (name, unit, round(base_total / factor, 3))
+        for name, unit, factor, base_total in totals.values()
+    ]
@@ -11,6 +11,8 @@ router.register(r'grocery-lists', views.GroceryListViewSet, basename='grocery-li
 urlpatterns = [
     # Health check endpoint
     path('health/', views.HealthCheckView.as_view(), name='health-check'),
+    path('health/live/', views.LivenessView.as_view(), name='health-live'),
+    path('health/ready/', views.ReadinessView.as_view(), name='health-ready'),
     
     # Auth endpoints
     path('auth/register/', views.RegisterView.as_view(), name='register'),
@@ -19,6 +21,9 @@ urlpatterns = [
     path('auth/user/', views.UserProfileView.as_view(), name='user-profile'),
     path('auth/csrf-token/', views.CSRFTokenView.as_view(), name='csrf-token'),
     
+    # Change feed for offline clients
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    
     # Include router URLs
     path('', include(router.urls)),
 ]
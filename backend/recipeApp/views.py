@@ -1,3 +1,5 @@
+from functools import partial
+
 from rest_framework import status, permissions, viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -6,17 +8,44 @@ from rest_framework import generics
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models import Q
 from django.middleware.csrf import get_token
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.db import connection
-from .models import Recipe, GroceryList
-from .serializers import RecipeSerializer, GroceryListSerializer, UserSerializer, RecipeListSerializer
+from .models import Recipe, Ingredient, GroceryList, GroceryItem, SharedGroceryList, Tombstone
+from .serializers import RecipeSerializer, GroceryListSerializer, UserSerializer, RecipeListSerializer, PantryMatchSerializer, GroceryListFromRecipesSerializer, SharedGroceryListSerializer, IngredientChangeSerializer, GroceryItemChangeSerializer, GroceryItemSerializer, RecipeBatchSerializer, RecipeBatchUpdateSerializer
+from .pagination import RecipeCursorPagination, RecipeSearchPagination
+from .search import search_recipes
+from .pantry import match_pantry, recipe_changed
+from .catalog import ingredient_catalog
+from .importer import NDJSONParser, import_recipes
+from .conditional import ConditionalGetMixin
+from .fieldsets import SparseFieldsMixin
+from .projections import Projection
+from .hashing import HashingBusy, hashing_gate
+from .throttling import AuthIPThrottle, AuthUsernameThrottle
+from .response_cache import ResponseCacheMixin
+from .exports import EXPORT_FORMATS, export_recipes, export_grocery_lists
+from .health import health_probe
+from .events import StreamsBusy, event_stream_response, grocery_list_events, release_connections
+from .sharing import GroceryListAccess, visible_grocery_lists
+from .grocery_items import MAX_BATCH_SIZE, add_items, remove_item, update_items
+from .recipe_batches import delete_recipes, update_recipes
+from .changes import (
+    SYNC_KINDS, after_position, current_change_seq, get_config as change_feed_config, list_audience, next_change_seq,
+    parse_sync_cursor, record_deletions, sync_cursor, touch_grocery_list,
+)
 
 # Authentication Views
+def hashing_busy_response():
+    """Returned when every password hashing slot stays busy for the whole queue timeout."""
+    return Response({'error': 'Too many sign-in attempts right now, please try again shortly'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [AuthIPThrottle]
     
     def post(self, request):
         username = request.data.get('username')
@@ -35,11 +64,13 @@ class RegisterView(APIView):
             return Response({'error': 'Email already exists'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        user = User.objects.create_user(
-            username=username,
-            email=email,
-            password=password
-        )
+        # Same as create_user, but only the hashing holds a hashing slot
+        user = User(username=User.normalize_username(username), email=User.objects.normalize_email(email))
+        try:
+            hashing_gate.run(user.set_password, password)
+        except HashingBusy:
+            return hashing_busy_response()
+        user.save()
         
         login(request, user)
         
@@ -50,6 +81,7 @@ class RegisterView(APIView):
 
 class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [AuthIPThrottle, AuthUsernameThrottle]
     
     def post(self, request):
         username = request.data.get('username')
@@ -59,7 +91,10 @@ class LoginView(APIView):
             return Response({'error': 'Username and password are required'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        user = authenticate(username=username, password=password)
+        try:
+            user = hashing_gate.run(authenticate, username=username, password=password)
+        except HashingBusy:
+            return hashing_busy_response()
         
         if user is not None:
             login(request, user)
@@ -90,23 +125,73 @@ class CSRFTokenView(APIView):
     def get(self, request):
         return Response({'csrfToken': get_token(request)})
 
+def recipe_list_queryset(queryset):
+    """Load only what RecipeListSerializer renders, with the author joined in."""
+    return queryset.select_related('created_by').only(
+        'id', 'title', 'description', 'created_at', 'updated_at', 'is_public',
+        *(f'created_by__{field}' for field in UserSerializer.Meta.fields),
+    )
+
+
+# Renders RecipeListSerializer's output straight from values_list() rows
+recipe_list_projection = Projection(RecipeListSerializer)
+
+
+def recipe_detail_queryset(queryset):
+    """Join the author and batch-load ingredients for RecipeSerializer."""
+    return queryset.select_related('created_by').prefetch_related('ingredients')
+
+class ExportFormatMixin:
+    """
+    ``?format=`` on the export actions names the file type, which DRF would
+    otherwise treat as a renderer override and answer with a 404.
+    """
+    
+    def perform_content_negotiation(self, request, force=False):
+        if self.action == 'export':
+            force = True
+        return super().perform_content_negotiation(request, force)
+    
+    def get_export_format(self, request):
+        export_format = request.query_params.get('format', 'ndjson').lower()
+        if export_format not in EXPORT_FORMATS:
+            return None
+        return export_format
+    
+    def export_format_error(self):
+        return Response({'error': f'Unsupported export format; use one of: {", ".join(EXPORT_FORMATS)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
 # Recipe ViewSet with public/private logic
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ResponseCacheMixin, SparseFieldsMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
+    pagination_class = RecipeCursorPagination
+    list_projection = recipe_list_projection
+    sparse_serializer_class = RecipeSerializer
+    # get_object's visibility and ownership checks
+    sparse_always_load = ('is_public', 'created_by')
     
     def get_queryset(self):
-        if self.action == 'list':
+        if self.action in ['list', 'search']:
             # Show public recipes + user's private recipes (if authenticated)
             if self.request.user.is_authenticated:
-                return Recipe.objects.filter(
+                queryset = Recipe.objects.filter(
                     Q(is_public=True) | Q(created_by=self.request.user)
-                ).order_by('-created_at')
+                )
             else:
-                return Recipe.objects.filter(is_public=True).order_by('-created_at')
-        return Recipe.objects.all()
+                queryset = Recipe.objects.filter(is_public=True)
+            return recipe_list_queryset(queryset).order_by('-created_at', '-id')
+        return recipe_detail_queryset(Recipe.objects.all())
+    
+    def get_conditional_queryset(self):
+        # Only public or owned recipes may be answered with a 304
+        visible = Q(is_public=True)
+        if self.request.user.is_authenticated:
+            visible |= Q(created_by=self.request.user)
+        return Recipe.objects.filter(visible)
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ['list', 'search']:
             return RecipeListSerializer
         return RecipeSerializer
     
@@ -120,32 +205,106 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
     
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        recipe_id = instance.pk
+        record_deletions('recipe', [recipe_id], [instance.created_by_id], next_change_seq())
+        instance.delete()
+        recipe_changed(recipe_id)
+    
     def get_object(self):
         obj = super().get_object()
         # For retrieve, update, delete - check permissions
         if self.action in ['retrieve']:
             # Allow access to public recipes or owned recipes
-            if obj.is_public or (self.request.user.is_authenticated and obj.created_by == self.request.user):
+            if obj.is_public or (self.request.user.is_authenticated and obj.created_by_id == self.request.user.id):
                 return obj
             else:
                 from rest_framework.exceptions import PermissionDenied
                 raise PermissionDenied("You don't have permission to access this recipe.")
         elif self.action in ['update', 'partial_update', 'destroy']:
             # Only allow owner to modify
-            if self.request.user.is_authenticated and obj.created_by == self.request.user:
+            if self.request.user.is_authenticated and obj.created_by_id == self.request.user.id:
                 return obj
             else:
                 from rest_framework.exceptions import PermissionDenied
                 raise PermissionDenied("You don't have permission to modify this recipe.")
         return obj
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked full-text search over title, description, instructions and ingredients."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Query parameter "q" is required'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        projection = self.get_list_projection()
+        queryset = search_recipes(self.filter_queryset(self.get_queryset()), query)
+        paginator = RecipeSearchPagination()
+        if projection is None:
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+        page = paginator.paginate_queryset(projection.project(queryset), request, view=self)
+        return paginator.get_paginated_response(projection.serialize(page))
+    
+    @action(detail=False, methods=['post'], url_path='pantry-match')
+    def pantry_match(self, request):
+        """Recipes ranked by how much of their ingredient list the pantry covers."""
+        params = PantryMatchSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        # Names nobody has used in a recipe yet can't match anything
+        on_hand = set(ingredient_catalog.lookup(params.validated_data['ingredients']).values()) - {None}
+        
+        matches = match_pantry(
+            on_hand,
+            user=request.user,
+            limit=params.validated_data['limit'],
+            offset=params.validated_data['offset'],
+            min_coverage=params.validated_data['min_coverage'],
+        )
+        
+        # Re-check visibility against the database in case this worker's index is behind
+        visible = Q(is_public=True)
+        if request.user.is_authenticated:
+            visible |= Q(created_by=request.user)
+        recipes = recipe_detail_queryset(Recipe.objects.filter(visible, pk__in=[m[0] for m in matches])).in_bulk()
+        
+        results = []
+        for recipe_id, matched, total in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            missing, seen = [], set(on_hand) | {None}
+            for ingredient in recipe.ingredients.all():
+                if ingredient.canonical_id not in seen:
+                    seen.add(ingredient.canonical_id)
+                    missing.append(ingredient.name)
+            results.append({
+                'recipe': RecipeListSerializer(recipe).data,
+                'coverage': round(matched / total, 4),
+                'matched': matched,
+                'total': total,
+                'missing': missing,
+            })
+        
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
 # My Recipes ViewSet (user's recipes only)
-class MyRecipeViewSet(viewsets.ModelViewSet):
+class MyRecipeViewSet(ExportFormatMixin, SparseFieldsMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    list_projection = recipe_list_projection
+    sparse_serializer_class = RecipeSerializer
     
     def get_queryset(self):
-        return Recipe.objects.filter(created_by=self.request.user).order_by('-created_at')
+        queryset = Recipe.objects.filter(created_by=self.request.user)
+        if self.action == 'list':
+            queryset = recipe_list_queryset(queryset)
+        else:
+            queryset = recipe_detail_queryset(queryset)
+        return queryset.order_by('-created_at', '-id')
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -154,20 +313,263 @@ class MyRecipeViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
+    
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        recipe_id = instance.pk
+        record_deletions('recipe', [recipe_id], [instance.created_by_id], next_change_seq())
+        instance.delete()
+        recipe_changed(recipe_id)
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[NDJSONParser])
+    def import_ndjson(self, request):
+        """
+        Bulk import recipes from an NDJSON body (one recipe object per line).
+        The body is streamed line by line rather than parsed up front.
+        """
+        stream = request.stream
+        report = import_recipes(stream if stream is not None else [], request.user)
+        response_status = status.HTTP_201_CREATED if report.created else status.HTTP_400_BAD_REQUEST
+        return Response(report.as_dict(), status=response_status)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream all of the user's recipes as NDJSON (default) or CSV."""
+        export_format = self.get_export_format(request)
+        if export_format is None:
+            return self.export_format_error()
+        return export_recipes(Recipe.objects.filter(created_by=request.user).order_by('id'), export_format)
+    
+    @action(detail=False, methods=['patch'], url_path='batch')
+    def batch_update(self, request):
+        """Apply the same field changes (e.g. is_public) to many recipes; reports each id."""
+        params = RecipeBatchUpdateSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        results = update_recipes(request.user, params.validated_data['ids'], params.validated_data['changes'])
+        return Response({'results': results}, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'], url_path='batch-delete')
+    def batch_delete(self, request):
+        """Delete many recipes at once; reports each id."""
+        params = RecipeBatchSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        results = delete_recipes(request.user, params.validated_data['ids'])
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
 # Grocery List ViewSet
-class GroceryListViewSet(viewsets.ModelViewSet):
+class GroceryListViewSet(ExportFormatMixin, SparseFieldsMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = GroceryListSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [GroceryListAccess]
+    sparse_serializer_class = GroceryListSerializer
     
     def get_queryset(self):
-        return GroceryList.objects.filter(created_by=self.request.user).order_by('-created_at')
+        queryset = visible_grocery_lists(self.request.user).select_related('created_by').order_by('-created_at')
+        if self.action in ('shares', 'unshare', 'events', 'items', 'item'):
+            # These never render the list's items
+            return queryset
+        return queryset.prefetch_related('items')
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
+    
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        list_id = instance.pk
+        record_deletions('grocery_list', [list_id], list_audience(instance), next_change_seq())
+        instance.delete()
+        grocery_list_events.publish(list_id, [{'type': 'deleted', 'list': {'id': list_id}}])
+    
+    def perform_content_negotiation(self, request, force=False):
+        if self.action == 'events':
+            # The event stream has no DRF renderer; any Accept header gets it
+            force = True
+        return super().perform_content_negotiation(request, force)
+    
+    @action(detail=True, methods=['get', 'post'])
+    def shares(self, request, pk=None):
+        """List who the list is shared with, or share it (again) with a user by username."""
+        grocery_list = self.get_object()
+        if request.method == 'GET':
+            shares = grocery_list.shared_with.select_related('user').order_by('user__username')
+            return Response(SharedGroceryListSerializer(shares, many=True).data)
+        
+        serializer = SharedGroceryListSerializer(data=request.data, context={'grocery_list': grocery_list})
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            seq = next_change_seq()
+            share, created = SharedGroceryList.objects.update_or_create(
+                list=grocery_list, user=serializer.validated_data['user'],
+                defaults={'permissions': serializer.validated_data['permissions']},
+            )
+            if created:
+                # The new reader's next sync must include the whole list
+                touch_grocery_list(grocery_list, seq)
+        return Response(SharedGroceryListSerializer(share).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['delete'], url_path=r'shares/(?P<user_id>\d+)')
+    def unshare(self, request, pk=None, user_id=None):
+        """Remove a user's share; the owner can remove anyone's, other users their own."""
+        grocery_list = self.get_object()
+        with transaction.atomic():
+            seq = next_change_seq()
+            deleted, _ = grocery_list.shared_with.filter(user_id=user_id).delete()
+            if not deleted:
+                return Response({'error': 'This list is not shared with that user'}, status=status.HTTP_404_NOT_FOUND)
+            # To the user who lost access, the list is as good as deleted
+            record_deletions('grocery_list', [grocery_list.pk], [int(user_id)], seq)
+        grocery_list_events.publish(grocery_list.pk, [{'type': 'revoked', 'user': int(user_id)}])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['get'])
+    def events(self, request, pk=None):
+        """Stream the list's changes as server-sent events (see events.py)."""
+        grocery_list = self.get_object()
+        ready = GroceryListSerializer(grocery_list, fields=['id', 'updated_at']).data
+        try:
+            release = grocery_list_events.reserve_thread()
+        except StreamsBusy:
+            retry_after = -(-grocery_list_events.config['RETRY_MS'] // 1000)
+            return Response({'error': 'Too many live streams right now, please try again shortly'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': str(retry_after)})
+        try:
+            subscription = grocery_list_events.subscribe(grocery_list.pk, request.user.id)
+        except Exception:
+            release()
+            raise
+        release_connections()
+        return event_stream_response(grocery_list_events.stream(subscription, ready, release))
+    
+    @action(detail=True, methods=['post', 'patch'])
+    def items(self, request, pk=None):
+        """
+        POST adds one item. PATCH takes a list of partial items, each with its
+        id, and answers with the items that changed.
+        """
+        grocery_list = self.get_object()
+        if request.method == 'POST':
+            serializer = GroceryItemSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            item, = add_items(grocery_list, [serializer.validated_data])
+            return Response(GroceryItemSerializer(item).data, status=status.HTTP_201_CREATED)
+        
+        if not isinstance(request.data, list) or len(request.data) > MAX_BATCH_SIZE:
+            return Response({'error': f'Send a list of at most {MAX_BATCH_SIZE} items'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = GroceryItemSerializer(data=request.data, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        if any('id' not in change for change in serializer.validated_data):
+            return Response({'error': 'Every item needs its id'}, status=status.HTTP_400_BAD_REQUEST)
+        changed = update_items(grocery_list, serializer.validated_data)
+        return Response(GroceryItemSerializer(changed, many=True).data)
+    
+    @action(detail=True, methods=['patch', 'delete'], url_path=r'items/(?P<item_id>\d+)')
+    def item(self, request, pk=None, item_id=None):
+        """Change or remove one item."""
+        grocery_list = self.get_object()
+        if request.method == 'DELETE':
+            if not remove_item(grocery_list, int(item_id)):
+                return Response({'error': 'Grocery item not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        serializer = GroceryItemSerializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        changed = update_items(grocery_list, [{**serializer.validated_data, 'id': int(item_id)}])
+        item = changed[0] if changed else grocery_list.items.get(pk=item_id)
+        return Response(GroceryItemSerializer(item).data)
+    
+    @action(detail=False, methods=['post'], url_path='from-recipes')
+    def from_recipes(self, request):
+        """Create one grocery list that merges the ingredients of several recipes."""
+        serializer = GroceryListFromRecipesSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        grocery_list = serializer.save(created_by=request.user)
+        grocery_list = self.get_queryset().get(pk=grocery_list.pk)
+        return Response(GroceryListSerializer(grocery_list).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream all of the user's grocery lists as NDJSON (default) or CSV."""
+        export_format = self.get_export_format(request)
+        if export_format is None:
+            return self.export_format_error()
+        return export_grocery_lists(GroceryList.objects.filter(created_by=request.user).order_by('id'), export_format)
 
 
-# Health Check View
+
+class SyncView(APIView):
+    """
+    What changed for the user since ``?since=<cursor>``: their recipes and
+    ingredients, the grocery lists they can see and those lists' items, the
+    ids of rows they can no longer see, and the cursor for the next call.
+    Without ``since`` it returns everything. One page at a time, with
+    ``has_more`` while there is more to fetch. See changes.py.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    recipe_fields = [name for name in RecipeSerializer.Meta.fields if name != 'ingredients']
+    grocery_list_fields = [name for name in GroceryListSerializer.Meta.fields if name != 'items']
+    
+    def get(self, request):
+        # Read the watermark first: rows committed while the rest runs are
+        # returned again next time rather than skipped
+        cursor, compacted_through = current_change_seq()
+        since = request.query_params.get('since')
+        until, position, full = cursor, None, since is None
+        if since is not None:
+            try:
+                until, position, full = parse_sync_cursor(since, cursor)
+            except ValueError:
+                return Response({'error': 'since must be a cursor returned by this endpoint'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            # A full sync sends no tombstones, so compacting them doesn't affect it
+            if not (full or compacted_through <= position[0]) or not position[0] <= until <= cursor:
+                return Response({'error': 'This cursor has expired; sync again without since'},
+                                status=status.HTTP_410_GONE)
+        
+        user = request.user
+        lists = visible_grocery_lists(user)
+        changed = {
+            'recipes': (Recipe.objects.filter(created_by=user).select_related('created_by'),
+                        partial(RecipeSerializer, fields=self.recipe_fields)),
+            'ingredients': (Ingredient.objects.filter(recipe__created_by=user), IngredientChangeSerializer),
+            'grocery_lists': (lists.select_related('created_by'),
+                              partial(GroceryListSerializer, fields=self.grocery_list_fields)),
+            'grocery_items': (GroceryItem.objects.filter(grocery_list__in=lists), GroceryItemChangeSerializer),
+        }
+        querysets = [queryset for queryset, serializer in changed.values()]
+        if not full:
+            querysets.append(Tombstone.objects.filter(user=user).only('change_seq', 'kind', 'object_id'))
+        
+        # The first page_size entries after the position, across all kinds
+        page_size = change_feed_config()['PAGE_SIZE']
+        entries = []
+        for kind, queryset in enumerate(querysets):
+            queryset = queryset.filter(change_seq__lte=until)
+            if position is not None:
+                queryset = queryset.filter(after_position(position, kind))
+            entries.extend((row.change_seq, kind, row.pk, row) for row in queryset.order_by('change_seq', 'pk')[:page_size + 1])
+        entries.sort(key=lambda entry: entry[:3])
+        has_more = len(entries) > page_size
+        entries = entries[:page_size]
+        
+        rows = {key: [] for key in SYNC_KINDS}
+        for seq, kind, pk, row in entries:
+            rows[SYNC_KINDS[kind]].append(row)
+        data = {'cursor': sync_cursor(until, entries[-1][:3] if has_more else None, full), 'has_more': has_more}
+        for key, (queryset, serializer) in changed.items():
+            data[key] = serializer(rows[key], many=True).data
+        deleted = {key: [] for key in changed}
+        for tombstone in rows['deleted']:
+            deleted[f'{tombstone.kind}s'].append(tombstone.object_id)
+        # A row deleted for this user and visible again since (a list
+        # unshared, then shared again) counts as changed
+        for key, ids in deleted.items():
+            current = {row['id'] for row in data[key]}
+            deleted[key] = sorted(set(ids) - current)
+        data['deleted'] = deleted
+        return Response(data)
+
+
+# Health Check Views
 class HealthCheckView(APIView):
     permission_classes = [permissions.AllowAny]
     
@@ -175,21 +577,36 @@ class HealthCheckView(APIView):
         """
         Health check endpoint for load balancer and monitoring
         """
-        try:
-            # Check database connection
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT 1")
-                cursor.fetchone()
-            
+        ready, report = health_probe.report()
+        if ready:
             return Response({
                 'status': 'healthy',
                 'database': 'connected',
                 'timestamp': request.META.get('HTTP_DATE', 'unknown')
             }, status=status.HTTP_200_OK)
-            
-        except Exception as e:
-            return Response({
-                'status': 'unhealthy',
-                'database': 'disconnected',
-                'error': str(e)
-            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({
+            'status': 'unhealthy',
+            'database': 'connected' if report['checks']['database']['status'] == 'ok' else 'disconnected',
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class LivenessView(APIView):
+    """The process is up and serving requests; touches no database, cache or session."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        return Response({'status': 'alive'})
+
+
+class ReadinessView(APIView):
+    """
+    Whether this process can serve traffic, from the cached background probe
+    (see recipeApp.health), with pool saturation and probe latency percentiles.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        ready, report = health_probe.report()
+        return Response(report, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -20,6 +20,7 @@ interface Recipe {
   is_public: boolean;
   created_by: User;
   created_at: string;
+  updated_at: string;
   ingredients: Ingredient[];
 }
 
@@ -36,9 +37,24 @@ interface RecipeList {
   description: string;
   created_by: User;
   created_at: string;
+  updated_at: string;
   is_public: boolean;
 }
 
+interface PantryMatch {
+  recipe: RecipeList;
+  coverage: number;
+  matched: number;
+  total: number;
+  missing: string[];
+}
+
+interface PaginatedResponse<T> {
+  next: string | null;
+  previous?: string | null;
+  results: T[];
+}
+
 class ApiService {
   private baseUrl: string;
   private csrfToken: string | null = null;
@@ -185,6 +201,18 @@ class ApiService {
     return this.makeRequest<Recipe[]>('/recipes/');
   }
 
+  async searchRecipes(query: string, page: number = 1): Promise<ApiResponse<PaginatedResponse<RecipeList>>> {
+    const params = new URLSearchParams({ q: query, page: String(page) });
+    return this.makeRequest<PaginatedResponse<RecipeList>>(`/recipes/search/?${params}`);
+  }
+
+  async matchPantry(ingredients: string[], limit: number = 20, minCoverage: number = 0): Promise<ApiResponse<{ results: PantryMatch[] }>> {
+    return this.makeRequest<{ results: PantryMatch[] }>('/recipes/pantry-match/', {
+      method: 'POST',
+      body: JSON.stringify({ ingredients, limit, min_coverage: minCoverage }),
+    });
+  }
+
   async getMyRecipes(): Promise<ApiResponse<Recipe[]>> {
     return this.makeRequest<Recipe[]>('/my-recipes/');
   }
@@ -193,7 +221,7 @@ class ApiService {
     return this.makeRequest<Recipe>(`/recipes/${id}/`);
   }
 
-  async createRecipe(recipe: Omit<Recipe, 'id' | 'created_by' | 'created_at'>): Promise<ApiResponse<Recipe>> {
+  async createRecipe(recipe: Omit<Recipe, 'id' | 'created_by' | 'created_at' | 'updated_at'>): Promise<ApiResponse<Recipe>> {
     return this.makeRequest<Recipe>('/recipes/', {
       method: 'POST',
       body: JSON.stringify(recipe),
@@ -225,6 +253,13 @@ class ApiService {
     });
   }
 
+  async createGroceryListFromRecipes(name: string, recipes: { id: number; multiplier?: number }[]): Promise<ApiResponse<any>> {
+    return this.makeRequest<any>('/grocery-lists/from-recipes/', {
+      method: 'POST',
+      body: JSON.stringify({ name, recipes }),
+    });
+  }
+
   async updateGroceryList(id: number, groceryList: any): Promise<ApiResponse<any>> {
     return this.makeRequest<any>(`/grocery-lists/${id}/`, {
       method: 'PUT',
@@ -243,4 +278,4 @@ class ApiService {
 export const apiService = new ApiService();
 
 // Export types for use in components
-export type { User, Recipe, Ingredient, RecipeList, ApiResponse }; 
\ No newline at end of file
+export type { User, Recipe, Ingredient, RecipeList, PaginatedResponse, PantryMatch, ApiResponse };
\ No newline at end of file
@@ -62,9 +62,10 @@ else:
     print('✅ Superuser already exists')
 " || echo "⚠️ Superuser creation skipped"
 
-# Start Django in background
+# Start Django in background (multi-worker gunicorn, see gunicorn.conf.py;
+# it also runs the periodic maintenance jobs)
 echo "🐍 Starting Django backend..."
-python3 manage.py runserver 0.0.0.0:8000 &
+gunicorn -c gunicorn.conf.py "${APP_MODULE:-backend.wsgi:application}" &
 DJANGO_PID=$!
 
 # Wait a moment for Django to start
@@ -78,13 +79,19 @@ NGINX_PID=$!
 # Function to handle shutdown
 shutdown() {
     echo "🛑 Shutting down services..."
-    kill $DJANGO_PID 2>/dev/null || true
-    kill $NGINX_PID 2>/dev/null || true
+    # Stop taking new connections, then let gunicorn drain in-flight requests
+    kill -QUIT $NGINX_PID 2>/dev/null || true
+    kill -TERM $DJANGO_PID 2>/dev/null || true
+    wait $DJANGO_PID 2>/dev/null || true
     exit 0
 }
 
-# Trap signals
-trap shutdown SIGTERM SIGINT
+# Trap signals; SIGHUP reloads gunicorn workers gracefully
+trap shutdown TERM INT
+trap 'kill -HUP $DJANGO_PID' HUP
 
-# Wait for either process to exit
-wait $NGINX_PID
\ No newline at end of file
+# Wait for nginx to exit. A trapped signal (HUP above) interrupts wait, and
+# set -e would otherwise end the script there, so keep waiting while it runs.
+while kill -0 $NGINX_PID 2>/dev/null; do
+    wait $NGINX_PID || true
+done